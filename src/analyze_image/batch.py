@@ -0,0 +1,306 @@
+import collections
+import contextlib
+import glob
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from analyze_image.loader import PIXEL_OUTPUTS, RAW_EXTENSIONS, read_image
+from analyze_image.shape_detector import ShapeDetector
+from analyze_image.tiling import TiledShapeDetector
+from analyze_image.pyramid import PyramidShapeDetector
+from analyze_image.writer import PNG_COMPRESSION, WRITER_THREADS, WRITE_QUEUE_DEPTH, AsyncImageWriter
+from utils.histogram import merge_histograms, plot_pixel_histograms, save_histograms
+from config.constants import ANALYZE_DIR, DEFAULT_OUTPUTS
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp', '.npy') + RAW_EXTENSIONS
+PREFETCH_DEPTH = 2
+DECODE_THREADS = 2
+
+def _is_image(path):
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+def collect_images(inputs):
+    images = []
+    seen = set()
+
+    for item in inputs:
+        item = str(item)
+
+        if os.path.isdir(item):
+            candidates = sorted(
+                os.path.join(item, name) for name in os.listdir(item)
+            )
+            candidates = [p for p in candidates if os.path.isfile(p) and _is_image(p)]
+        elif glob.has_magic(item):
+            candidates = sorted(
+                p for p in glob.glob(item, recursive=True)
+                if os.path.isfile(p) and _is_image(p)
+            )
+        else:
+            candidates = [item]
+
+        for path in candidates:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                images.append(path)
+
+    return images
+
+def assign_output_dirs(images, base_dir=ANALYZE_DIR):
+    used = set()
+    output_dirs = []
+
+    for path in images:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name = stem
+        suffix = 2
+        while name in used:
+            name = f"{stem}_{suffix}"
+            suffix += 1
+        used.add(name)
+        output_dirs.append(os.path.join(base_dir, name))
+
+    return output_dirs
+
+def _new_summary(image_path, output_dir):
+    return {
+        'image': image_path,
+        'output_dir': output_dir,
+        'objects': 0,
+        'groups': [],
+        'histogram': None,
+        'error': None,
+    }
+
+def create_detector(image_path, output_dir=ANALYZE_DIR, tile_size=None, pyramid_levels=None, **options):
+    # options are ShapeDetector keyword arguments, shared by all three detectors
+    if tile_size:
+        return TiledShapeDetector(image_path, output_dir, tile_size=tile_size, **options)
+    if pyramid_levels:
+        return PyramidShapeDetector(image_path, output_dir, levels=pyramid_levels, **options)
+    return ShapeDetector(image_path, output_dir, **options)
+
+def analyze_one(image_path, output_dir, ratio_threshold, grouping='running-mean', grouping_options=None,
+                scale_sample=None, detector_options=None, png_compression=PNG_COMPRESSION,
+                write_threads=WRITER_THREADS, write_queue=WRITE_QUEUE_DEPTH):
+    summary = _new_summary(image_path, output_dir)
+    detector_options = dict(detector_options or {})
+    # Without a writer shared across images, this image's outputs are encoded in the
+    # background while its analysis goes on
+    writer = detector_options.pop('writer', None)
+    if writer is None:
+        writer_context = AsyncImageWriter(png_compression, write_threads, write_queue)
+    else:
+        writer_context = contextlib.nullcontext(writer)
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), writer_context as writer:
+            detector = create_detector(image_path, output_dir, writer=writer, **detector_options)
+            result = detector.process(
+                ratio_threshold, grouping, scale_sample, **(grouping_options or {})
+            )
+    except Exception as e:
+        summary['error'] = str(e)
+        return summary
+
+    summary['histogram'] = detector.histograms
+    if result is None:
+        return summary
+
+    for stats in detector.statistics:
+        summary['objects'] += stats['count']
+        summary['groups'].append({
+            'count': stats['count'],
+            'avg_ratio': float(stats['avg_ratio']),
+            'min_ratio': float(stats['min_ratio']),
+            'max_ratio': float(stats['max_ratio']),
+        })
+
+    return summary
+
+def save_batch_summary(summaries, ratio_threshold, output_dir=ANALYZE_DIR):
+    output_path = os.path.join(output_dir, 'batch_summary.txt')
+    failed = [s for s in summaries if s['error'] is not None]
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write("BATCH SHAPE SIMILARITY SUMMARY\n")
+        f.write("=" * 80 + "\n")
+        f.write(f"\nRatio threshold: {ratio_threshold}\n")
+        f.write(f"Images analyzed: {len(summaries) - len(failed)}\n")
+        f.write(f"Images failed: {len(failed)}\n")
+        f.write(f"Total objects: {sum(s['objects'] for s in summaries)}\n")
+        f.write(f"Total groups: {sum(len(s['groups']) for s in summaries)}\n")
+
+        for summary in summaries:
+            f.write(f"\n{'=' * 80}\n")
+            f.write(f"IMAGE: {summary['image']}\n")
+            f.write(f"{'=' * 80}\n")
+
+            if summary['error'] is not None:
+                f.write(f"Error: {summary['error']}\n")
+                continue
+
+            f.write(f"Outputs: {summary['output_dir']}/\n")
+            f.write(f"Objects: {summary['objects']}\n")
+            f.write(f"Groups: {len(summary['groups'])}\n")
+            for group_idx, group in enumerate(summary['groups']):
+                f.write(f"  Group {group_idx + 1}: ")
+                f.write(f"count={group['count']}, ")
+                f.write(f"avg P²/A ratio={group['avg_ratio']:.2f}, ")
+                f.write(f"range=[{group['min_ratio']:.2f}, {group['max_ratio']:.2f}]\n")
+
+    print(f"Saved batch summary: {output_path}")
+
+def save_batch_histograms(summaries, outputs, output_dir=ANALYZE_DIR):
+    histograms = [s['histogram'] for s in summaries if s['histogram'] is not None]
+    if not histograms:
+        return
+
+    merged = merge_histograms(histograms)
+    if 'histogram_data' in outputs:
+        save_histograms(os.path.join(output_dir, 'batch_histograms.npz'), merged)
+    if 'histograms' in outputs:
+        plot_pixel_histograms(merged, output_dir, 'batch_histogram', 'Images')
+
+def _print_progress(summary, done, total, file=None):
+    if summary['error'] is not None:
+        status = f"FAILED ({summary['error']})"
+    else:
+        status = f"{summary['objects']} objects, {len(summary['groups'])} groups"
+    print(f"[{done}/{total}] {summary['image']}: {status}", file=file)
+
+def analyze_batch(images, ratio_threshold=2.0, workers=None, base_dir=ANALYZE_DIR, grouping='running-mean',
+                  grouping_options=None, scale_sample=None, png_compression=PNG_COMPRESSION,
+                  write_threads=WRITER_THREADS, write_queue=WRITE_QUEUE_DEPTH, detector_options=None):
+    detector_options = dict(detector_options or {})
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    output_dirs = assign_output_dirs(images, base_dir)
+
+    print("=" * 60)
+    print("BATCH SHAPE SIMILARITY DETECTION")
+    print("=" * 60)
+    print(f"Images: {len(images)}")
+    print(f"Workers: {workers}")
+    print(f"Ratio threshold: {ratio_threshold}")
+    print(f"Grouping method: {grouping}\n")
+
+    summaries = [None] * len(images)
+    done = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                analyze_one, path, output_dir, ratio_threshold, grouping, grouping_options, scale_sample,
+                detector_options, png_compression, write_threads, write_queue,
+            ): idx
+            for idx, (path, output_dir) in enumerate(zip(images, output_dirs))
+        }
+
+        for future in as_completed(futures):
+            idx = futures[future]
+            summary = future.result()
+            summaries[idx] = summary
+            done += 1
+            _print_progress(summary, done, len(images))
+
+    # Every worker only counts its own writes, so together they can overshoot the limit
+    cache = detector_options.get('cache')
+    if cache is not None:
+        cache.evict()
+
+    print()
+    save_batch_summary(summaries, ratio_threshold, base_dir)
+    save_batch_histograms(summaries, detector_options.get('outputs', DEFAULT_OUTPUTS), base_dir)
+
+    print("\n" + "=" * 60)
+    print("COMPLETED SUCCESSFULLY")
+    print(f"All outputs saved to: {base_dir}/")
+    print("=" * 60)
+
+    return summaries
+
+def analyze_pipelined(images, ratio_threshold=2.0, base_dir=ANALYZE_DIR, grouping='running-mean',
+                      grouping_options=None, scale_sample=None, png_compression=PNG_COMPRESSION,
+                      prefetch=PREFETCH_DEPTH, decode_threads=DECODE_THREADS, write_threads=WRITER_THREADS,
+                      write_queue=WRITE_QUEUE_DEPTH, detector_options=None):
+    detector_options = dict(detector_options or {})
+    outputs = detector_options.get('outputs', DEFAULT_OUTPUTS)
+    decode_args = tuple(detector_options.get(name, default) for name, default in (
+        ('decode', 'color'), ('reduce', 1), ('raw_shape', None)
+    ))
+    output_dirs = assign_output_dirs(images, base_dir)
+    # A cache hit without pixel outputs never decodes, so prefetching would only waste reads
+    needs_pixels = detector_options.get('cache') is None or bool(set(outputs) & PIXEL_OUTPUTS)
+
+    print("=" * 60)
+    print("BATCH SHAPE SIMILARITY DETECTION (PIPELINED)")
+    print("=" * 60)
+    print(f"Images: {len(images)}")
+    print(f"Prefetch: {prefetch} images on {decode_threads} decode threads")
+    print(f"Write queue: {write_queue} jobs on {write_threads} writer threads")
+    print(f"Ratio threshold: {ratio_threshold}")
+    print(f"Grouping method: {grouping}\n")
+
+    summaries = [None] * len(images)
+    write_futures = {}
+    writer = AsyncImageWriter(png_compression, write_threads, write_queue)
+    detector_options['writer'] = writer
+    console = sys.stdout
+
+    # Writer threads print while the next image is analyzed; all detector output goes to one sink
+    with ThreadPoolExecutor(max_workers=decode_threads, thread_name_prefix='decoder') as decoder, \
+            contextlib.redirect_stdout(io.StringIO()):
+        pending = collections.deque()
+        upcoming = iter(images)
+
+        def fill():
+            while len(pending) < prefetch:
+                path = next(upcoming, None)
+                if path is None:
+                    return
+                pending.append(decoder.submit(read_image, path, *decode_args) if needs_pixels else None)
+
+        fill()
+        for idx, (path, output_dir) in enumerate(zip(images, output_dirs)):
+            decoded = pending.popleft()
+            fill()
+
+            try:
+                image = decoded.result() if decoded is not None else None
+            except Exception as e:
+                summary = _new_summary(path, output_dir)
+                summary['error'] = str(e)
+            else:
+                summary = analyze_one(
+                    path, output_dir, ratio_threshold, grouping, grouping_options, scale_sample,
+                    dict(detector_options, image=image),
+                )
+                del image
+            write_futures[idx] = writer.collect()
+
+            summaries[idx] = summary
+            _print_progress(summary, idx + 1, len(images), console)
+
+        writer.close()
+
+    for idx, futures in write_futures.items():
+        errors = [str(f.exception()) for f in futures if f.exception() is not None]
+        if errors and summaries[idx]['error'] is None:
+            summaries[idx]['error'] = "; ".join(errors)
+            print(f"{summaries[idx]['image']}: FAILED ({summaries[idx]['error']})")
+
+    print()
+    save_batch_summary(summaries, ratio_threshold, base_dir)
+    save_batch_histograms(summaries, outputs, base_dir)
+
+    print("\n" + "=" * 60)
+    print("COMPLETED SUCCESSFULLY")
+    print(f"All outputs saved to: {base_dir}/")
+    print("=" * 60)
+
+    return summaries
@@ -0,0 +1,246 @@
+import contextlib
+import cv2
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from analyze_image.shape_detector import ShapeDetector, detect_edges, find_external_contours
+from analyze_image.features import extract_features
+from analyze_image.pyramid import (
+    PYRAMID_RATIO_TOLERANCE, PyramidShapeDetector, compare_detections, detect_edges_pyramid
+)
+from generate_image.generate_image import render_shapes
+from config.constants import BENCH_DIR
+
+BENCH_SIZES = (512, 2048, 8192, 16384)
+# Objects per 512x512 area, split evenly between circles, squares and triangles
+BENCH_DENSITIES = (5, 15)
+BENCH_STAGES = ('load', 'preprocess', 'find_contours', 'group', 'statistics', 'render', 'write')
+
+# Slowdowns smaller than this are timer noise, whatever their relative size
+MIN_REGRESSION_SECONDS = 0.01
+
+def bench_image(size, density, seed=0, image_dir=BENCH_DIR):
+    path = os.path.join(image_dir, 'images', f"{size}x{size}_d{density}_s{seed}.png")
+    if os.path.exists(path):
+        return path
+
+    objects = max(int(density * size * size / (512 * 512)), 3)
+    random.seed(seed)
+    np.random.seed(seed)
+    image, _ = render_shapes(size, size, objects // 3, objects // 3, objects - 2 * (objects // 3))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cv2.imwrite(path, image)
+    return path
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def time_stages(image_path, ratio_threshold=1.0, pyramid_levels=None, engine='canny'):
+    timings = {}
+    output_dir = tempfile.mkdtemp(prefix='bench_')
+
+    try:
+        start = time.perf_counter()
+        if pyramid_levels:
+            detector = PyramidShapeDetector(image_path, output_dir=output_dir, outputs=(), levels=pyramid_levels)
+        else:
+            detector = ShapeDetector(image_path, output_dir=output_dir, outputs=(), engine=engine)
+        timings['load'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, edges = detector.preprocess_image()
+        timings['preprocess'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        contours, areas = detector.find_contours(edges)
+        timings['find_contours'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        groups, _ = detector.group_by_similarity(contours, ratio_threshold, areas)
+        timings['group'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        statistics = [detector.calculate_group_statistics(group) for group in groups]
+        timings['statistics'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result_image = detector.visualize_results(groups, contours)
+        timings['render'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cv2.imwrite(os.path.join(output_dir, 'result_image.png'), result_image)
+        with contextlib.redirect_stdout(io.StringIO()):
+            detector.save_results_table(groups, statistics)
+        timings['write'] = time.perf_counter() - start
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return timings, len(contours), len(groups)
+
+def check_pyramid(image_path, levels):
+    gray = cv2.cvtColor(cv2.imread(image_path), cv2.COLOR_BGR2GRAY)
+    reference = extract_features(*find_external_contours(detect_edges(gray)))
+    candidate = extract_features(*find_external_contours(detect_edges_pyramid(gray, levels)[0]))
+
+    accuracy = compare_detections(reference, candidate)
+    accuracy['within_tolerance'] = (
+        accuracy['matched'] == accuracy['reference_objects'] == accuracy['objects'] and
+        accuracy['max_ratio_error'] <= PYRAMID_RATIO_TOLERANCE
+    )
+    return accuracy
+
+def run_case(image_path, repeat=3, ratio_threshold=1.0, pyramid_levels=None, engine='canny'):
+    # Runs in a fresh worker process, so the peak RSS belongs to this case alone
+    runs = [time_stages(image_path, ratio_threshold, pyramid_levels, engine) for _ in range(repeat)]
+
+    stages = {name: min(timings[name] for timings, _, _ in runs) for name in BENCH_STAGES}
+    _, contours, groups = runs[0]
+
+    result = {
+        'stages': stages,
+        'total': sum(stages.values()),
+        'contours': contours,
+        'groups': groups,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    if pyramid_levels:
+        result['accuracy'] = check_pyramid(image_path, pyramid_levels)
+
+    return result
+
+def run_benchmarks(sizes=BENCH_SIZES, densities=BENCH_DENSITIES, repeat=3, seed=0, image_dir=BENCH_DIR,
+                   pyramid_levels=None, engine='canny'):
+    detector = f"pyramid (levels {pyramid_levels})" if pyramid_levels else f"full ({engine})"
+
+    print("=" * 60)
+    print("STAGE BENCHMARK")
+    print("=" * 60)
+    print(f"Detector: {detector}")
+    print(f"Sizes: {', '.join(f'{size}x{size}' for size in sizes)}")
+    print(f"Densities: {', '.join(map(str, densities))} objects per 512x512")
+    print(f"Repeats: {repeat} (best time per stage is kept)\n")
+
+    cases = []
+    for size in sizes:
+        for density in densities:
+            name = f"{size}x{size}/d{density}"
+
+            start = time.perf_counter()
+            image_path = bench_image(size, density, seed, image_dir)
+            generate_time = time.perf_counter() - start
+
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                result = executor.submit(run_case, image_path, repeat, 1.0, pyramid_levels, engine).result()
+
+            result.update({
+                'name': name,
+                'width': size,
+                'height': size,
+                'density': density,
+                'image': image_path,
+                'generate': generate_time,
+            })
+            cases.append(result)
+
+            line = (
+                f"{name:<16} {result['contours']:>7d} objects  total {result['total']:8.3f}s  "
+                f"peak {result['peak_rss_mb']:8.1f} MB"
+            )
+            if 'accuracy' in result:
+                accuracy = result['accuracy']
+                line += (
+                    f"  matched {accuracy['matched']}/{accuracy['reference_objects']}, "
+                    f"max ratio error {accuracy['max_ratio_error'] * 100:.3f}%"
+                )
+                if not accuracy['within_tolerance']:
+                    line += "  OUT OF TOLERANCE"
+            print(line)
+
+    print()
+    print(format_stage_table(cases))
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'seed': seed,
+        'repeat': repeat,
+        'detector': detector,
+        'engine': engine,
+        'cases': cases,
+    }
+
+def format_stage_table(cases):
+    lines = [f"{'Case':<16}" + "".join(f"{name:>14}" for name in BENCH_STAGES) + f"{'Peak MB':>10}"]
+    for case in cases:
+        lines.append(
+            f"{case['name']:<16}"
+            + "".join(f"{case['stages'][name] * 1000:>12.1f}ms" for name in BENCH_STAGES)
+            + f"{case['peak_rss_mb']:>10.1f}"
+        )
+    return "\n".join(lines) + "\n"
+
+def save_results(results, output_path):
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved benchmark results: {output_path}")
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def compare_results(baseline, current, threshold=0.1):
+    baseline_cases = {case['name']: case for case in baseline['cases']}
+    rows = []
+
+    for case in current['cases']:
+        base = baseline_cases.get(case['name'])
+        if base is None:
+            continue
+
+        metrics = [(name, base['stages'].get(name), case['stages'].get(name)) for name in BENCH_STAGES]
+        metrics.append(('total', base['total'], case['total']))
+
+        for name, before, after in metrics:
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before > 0 else 0.0
+            regression = change > threshold and after - before >= MIN_REGRESSION_SECONDS
+            rows.append((case['name'], name, before, after, change, regression))
+
+        change = (case['peak_rss_mb'] - base['peak_rss_mb']) / base['peak_rss_mb']
+        rows.append((
+            case['name'], 'peak_rss_mb', base['peak_rss_mb'], case['peak_rss_mb'], change,
+            change > threshold,
+        ))
+
+    return rows
+
+def print_comparison(rows, threshold=0.1):
+    print("=" * 60)
+    print(f"COMPARISON (regression threshold: {threshold * 100:.0f}%)")
+    print("=" * 60)
+    print(f"{'Case':<16} {'Metric':<14} {'Baseline':>12} {'Current':>12} {'Change':>9}")
+
+    for case, metric, before, after, change, regression in rows:
+        flag = "  REGRESSION" if regression else ""
+        print(f"{case:<16} {metric:<14} {before:>12.4f} {after:>12.4f} {change * 100:>8.1f}%{flag}")
+
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"\nRegressions: {regressions}")
+    return regressions
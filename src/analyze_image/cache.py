@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import numpy as np
+from analyze_image.contours import PackedContours
+from analyze_image.features import SHAPE_DTYPE
+from config.constants import CACHE_DIR, CACHE_MAX_BYTES
+
+def hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+class AnalysisCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Running estimate of the directory size; None until the first scan
+        self._size = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key, kind):
+        return os.path.join(self.cache_dir, f"{key}.{kind}.npz")
+
+    def _load(self, key, kind):
+        path = self._path(key, kind)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            # Reads refresh the modification time, which is what eviction orders by
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        return arrays
+
+    def _save(self, key, kind, **arrays):
+        path = self._path(key, kind)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        replaced = _file_size(path)
+        os.replace(tmp_path, path)
+
+        # Only writes from this instance are counted, so other processes sharing the
+        # directory are picked up by the rescan once the estimate crosses the limit; until
+        # then N processes can hold up to N times the limit, and whoever started them
+        # calls evict() once they are done
+        if self._size is not None:
+            self._size += _file_size(path) - replaced
+        if self._size is None or self._size > self.max_bytes:
+            self.evict()
+
+    def load_contours(self, key):
+        arrays = self._load(key, 'contours')
+        if arrays is None:
+            return None
+
+        return PackedContours(arrays['points'], arrays['offsets']), arrays['areas']
+
+    def save_contours(self, key, contours, areas):
+        contours = PackedContours.pack(contours)
+        self._save(
+            key, 'contours', points=contours.points, offsets=contours.offsets,
+            areas=np.asarray(areas, dtype=np.float64),
+        )
+
+    def load_features(self, key):
+        arrays = self._load(key, 'features')
+        # Entries written with an older feature layout are recomputed
+        if arrays is None or arrays['features'].dtype != SHAPE_DTYPE:
+            return None
+        return arrays['features']
+
+    def save_features(self, key, features):
+        self._save(key, 'features', features=features)
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npz'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        self._size = total
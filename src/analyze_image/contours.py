@@ -0,0 +1,53 @@
+import numpy as np
+
+class PackedContours:
+    # All points live in one (N, 2) int32 buffer; object i owns rows offsets[i]:offsets[i + 1]
+    __slots__ = ('points', 'offsets')
+
+    def __init__(self, points, offsets):
+        self.points = points
+        self.offsets = offsets
+
+    @classmethod
+    def pack(cls, contours):
+        if isinstance(contours, cls):
+            return contours
+
+        offsets = np.zeros(len(contours) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(c) for c in contours])
+
+        if len(contours):
+            points = np.concatenate([c.reshape(-1, 2) for c in contours]).astype(np.int32, copy=False)
+        else:
+            points = np.empty((0, 2), dtype=np.int32)
+
+        return cls(points, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        # A view in the (n, 1, 2) layout OpenCV returns, so no points are copied
+        return self.points[self.offsets[idx]:self.offsets[idx + 1]].reshape(-1, 1, 2)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def take(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths)
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+
+        return PackedContours(self.points[positions], offsets)
+
+    @property
+    def nbytes(self):
+        return self.points.nbytes + self.offsets.nbytes
@@ -0,0 +1,92 @@
+import csv
+import json
+import os
+import numpy as np
+from analyze_image.contours import PackedContours
+
+EXPORT_FORMATS = ('text', 'jsonl', 'csv', 'npz')
+EXPORT_FIELDS = ('index', 'group', 'ratio', 'area', 'perimeter', 'x', 'y', 'w', 'h')
+
+# Rows are converted to Python objects this many at a time, so writing stays flat in memory
+EXPORT_CHUNK_SIZE = 4096
+
+def export_filename(format):
+    return 'results_table.txt' if format == 'text' else f"results.{format}"
+
+def iter_records(groups, contours=None, chunk_size=EXPORT_CHUNK_SIZE):
+    for group_idx, group in enumerate(groups):
+        for start in range(0, len(group), chunk_size):
+            chunk = group[start:start + chunk_size]
+            columns = [
+                [group_idx + 1] * len(chunk) if name == 'group' else chunk[name].tolist()
+                for name in EXPORT_FIELDS
+            ]
+
+            for values in zip(*columns):
+                record = dict(zip(EXPORT_FIELDS, values))
+                if contours is not None:
+                    record['contour'] = contours[record['index']].reshape(-1, 2).tolist()
+                yield record
+
+def write_jsonl(path, groups, contours=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in iter_records(groups, contours):
+            f.write(json.dumps(record) + "\n")
+
+def write_csv(path, groups, contours=None):
+    fields = EXPORT_FIELDS + (('contour',) if contours is not None else ())
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for record in iter_records(groups, contours):
+            if contours is not None:
+                # Flattened x,y pairs keep the cell a single CSV value
+                record['contour'] = " ".join(f"{x},{y}" for x, y in record['contour'])
+            writer.writerow(record)
+
+def write_npz(path, groups, contours=None):
+    count = sum(len(group) for group in groups)
+    arrays = {
+        'index': np.empty(count, dtype=np.int32),
+        'group': np.empty(count, dtype=np.int32),
+        'ratio': np.empty(count, dtype=np.float64),
+        'area': np.empty(count, dtype=np.float64),
+        'perimeter': np.empty(count, dtype=np.float64),
+        'bbox': np.empty((count, 4), dtype=np.int32),
+    }
+
+    start = 0
+    for group_idx, group in enumerate(groups):
+        end = start + len(group)
+        arrays['index'][start:end] = group['index']
+        arrays['group'][start:end] = group_idx + 1
+        arrays['ratio'][start:end] = group['ratio']
+        arrays['area'][start:end] = group['area']
+        arrays['perimeter'][start:end] = group['perimeter']
+        for column, name in enumerate(('x', 'y', 'w', 'h')):
+            arrays['bbox'][start:end, column] = group[name]
+        start = end
+
+    if contours is not None:
+        # Same packed layout as the analysis cache, reordered to match the rows
+        packed = PackedContours.pack(contours).take(arrays['index'])
+        arrays['contour_points'] = packed.points
+        arrays['contour_offsets'] = packed.offsets
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+
+EXPORT_WRITERS = {
+    'jsonl': write_jsonl,
+    'csv': write_csv,
+    'npz': write_npz,
+}
+
+def export_results(path, format, groups, contours=None):
+    if format not in EXPORT_WRITERS:
+        raise ValueError(f"Unknown export format: {format}")
+
+    EXPORT_WRITERS[format](path, groups, contours)
@@ -0,0 +1,116 @@
+import cv2
+import numpy as np
+
+SHAPE_DTYPE = np.dtype([
+    ('index', np.int32),
+    ('group', np.int32),
+    ('area', np.float64),
+    ('perimeter', np.float64),
+    ('ratio', np.float64),
+    ('x', np.int32),
+    ('y', np.int32),
+    ('w', np.int32),
+    ('h', np.int32),
+    ('hu', np.float64, (7,)),
+    ('solidity', np.float64),
+    ('convexity', np.float64),
+    ('extent', np.float64),
+    ('vertices', np.int32),
+])
+
+# Hu moments below this magnitude are numerical noise (e.g. the higher moments of
+# symmetric shapes), so their logarithm is clipped here
+HU_FLOOR = 1e-6
+APPROX_EPSILON = 0.02
+
+def extract_features(contours, areas=None, descriptors=False):
+    count = len(contours)
+    features = np.zeros(count, dtype=SHAPE_DTYPE)
+
+    features['index'] = np.arange(count)
+    features['group'] = -1
+
+    if areas is None:
+        features['area'] = [cv2.contourArea(c) for c in contours]
+    else:
+        features['area'] = areas
+
+    if count:
+        features['perimeter'] = [cv2.arcLength(c, True) for c in contours]
+        bboxes = np.array([cv2.boundingRect(c) for c in contours], dtype=np.int32)
+        features['x'] = bboxes[:, 0]
+        features['y'] = bboxes[:, 1]
+        features['w'] = bboxes[:, 2]
+        features['h'] = bboxes[:, 3]
+
+    valid = (features['area'] != 0) & (features['perimeter'] != 0)
+    features = features[valid]
+    features['ratio'] = features['perimeter'] ** 2 / features['area']
+
+    if descriptors:
+        extract_descriptors(features, contours)
+
+    return features
+
+def extract_descriptors(features, contours):
+    # Hulls, moments and polygon fits cost far more than the ratio, so they are only
+    # measured for descriptor grouping and the shape index
+    if len(features) == 0:
+        return features
+
+    measures = [
+        _measure_descriptors(contours[idx], perimeter)
+        for idx, perimeter in zip(features['index'].tolist(), features['perimeter'].tolist())
+    ]
+    hu, hull_areas, hull_perimeters, vertices = zip(*measures)
+
+    features['hu'] = np.array(hu)
+    features['vertices'] = vertices
+
+    hull_areas = np.array(hull_areas)
+    hull_perimeters = np.array(hull_perimeters)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features['solidity'] = np.where(hull_areas > 0, features['area'] / hull_areas, 0.0)
+        features['convexity'] = np.where(features['perimeter'] > 0, hull_perimeters / features['perimeter'], 0.0)
+        features['extent'] = features['area'] / np.maximum(features['w'] * features['h'], 1)
+
+    return features
+
+def _measure_descriptors(contour, perimeter):
+    hull = cv2.convexHull(contour)
+    approx = cv2.approxPolyDP(contour, APPROX_EPSILON * perimeter, True)
+
+    return (
+        cv2.HuMoments(cv2.moments(contour)).ravel(),
+        cv2.contourArea(hull),
+        cv2.arcLength(hull, True),
+        len(approx),
+    )
+
+def descriptor_matrix(features):
+    log_hu = np.log10(np.maximum(np.abs(features['hu']), HU_FLOOR))
+
+    return np.column_stack([
+        np.log(features['ratio']),
+        log_hu,
+        features['solidity'],
+        features['convexity'],
+        features['extent'],
+        np.log(np.maximum(features['vertices'], 1)),
+    ])
+
+def standardize(vectors, mean=None, std=None):
+    if mean is None:
+        mean = vectors.mean(axis=0)
+    if std is None:
+        std = vectors.std(axis=0)
+        std[std == 0] = 1.0
+    return (vectors - mean) / std, mean, std
+
+def split_groups(features):
+    if len(features) == 0:
+        return []
+
+    bounds = np.flatnonzero(np.diff(features['group'])) + 1
+    bounds = [0] + bounds.tolist() + [len(features)]
+    return [features[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
@@ -0,0 +1,240 @@
+import cv2
+import math
+import numpy as np
+
+def _labels_from_bounds(bounds, count):
+    labels = np.zeros(count, dtype=np.int32)
+    labels[bounds[1:-1]] = 1
+    return np.cumsum(labels, dtype=np.int32)
+
+def group_running_mean(ratios, threshold):
+    # Same greedy rule as before: a shape joins the current group while it stays within
+    # threshold of the group mean. Means come from a prefix sum and each group is scanned
+    # in doubling chunks, so the whole pass is linear after sorting. Prefix-sum means are
+    # off by a few ulps, so every shape that could be a break is checked again with
+    # np.mean over the group, which keeps the groups identical to the plain loop.
+    count = len(ratios)
+    cumsum = np.concatenate(([0.0], np.cumsum(ratios)))
+    cumsum_abs = np.concatenate(([0.0], np.cumsum(np.abs(ratios))))
+    # Bound on the rounding error of a prefix-sum mean and of np.mean itself
+    error_scale = 4 * (count + 1) * np.finfo(np.float64).eps
+
+    bounds = [0]
+    start = 0
+    while start < count:
+        end = start + 1
+        step = 64
+
+        while end < count:
+            stop = min(end + step, count)
+            idx = np.arange(end, stop)
+            means = (cumsum[idx] - cumsum[start]) / (idx - start)
+            tolerance = error_scale * (cumsum_abs[idx] / (idx - start) + np.abs(ratios[idx]))
+            suspects = idx[np.abs(ratios[idx] - means) > threshold - tolerance]
+
+            split = next(
+                (i for i in suspects.tolist() if abs(ratios[i] - np.mean(ratios[start:i])) > threshold), None
+            )
+            if split is not None:
+                end = split
+                break
+
+            end = stop
+            step *= 2
+
+        bounds.append(end)
+        start = end
+
+    return _labels_from_bounds(bounds, count)
+
+def group_gaps(ratios, threshold):
+    labels = np.zeros(len(ratios), dtype=np.int32)
+    labels[1:] = np.cumsum(np.diff(ratios) > threshold)
+    return labels
+
+def _segment_costs(cumsum, cumsum_sq, starts, end):
+    # Sum of squared deviations of ratios[start:end] for every start
+    n = end - starts
+    total = cumsum[end] - cumsum[starts]
+    return (cumsum_sq[end] - cumsum_sq[starts]) - total * total / n
+
+def _k_segments_layer(cost, cumsum, cumsum_sq, k, dtype):
+    # Minimum cost of splitting ratios[:mid + 1] into k + 1 segments for every mid, and
+    # where the last segment starts
+    count = len(cost)
+    new_cost = np.full(count, np.inf)
+    splits = np.zeros(count, dtype=dtype)
+    lo, hi = np.array([k]), np.array([count - 1])
+    opt_lo, opt_hi = np.array([k - 1]), np.array([count - 1])
+
+    # Each level of the recursion is solved for all of its midpoints at once
+    while len(lo):
+        mid = (lo + hi) // 2
+        first = opt_lo
+        lengths = np.minimum(mid - 1, opt_hi) - first + 1
+
+        node = np.repeat(np.arange(len(mid)), lengths)
+        offsets = np.cumsum(lengths) - lengths
+        candidates = first[node] + np.arange(len(node)) - offsets[node]
+
+        values = cost[candidates] + _segment_costs(cumsum, cumsum_sq, candidates + 1, mid[node] + 1)
+        best_values = np.minimum.reduceat(values, offsets)
+        is_best = np.flatnonzero(values == best_values[node])
+        best = candidates[is_best[np.unique(node[is_best], return_index=True)[1]]]
+
+        new_cost[mid] = best_values
+        splits[mid] = best + 1
+
+        lo, hi = np.concatenate((lo, mid + 1)), np.concatenate((mid - 1, hi))
+        opt_lo, opt_hi = np.concatenate((opt_lo, best)), np.concatenate((best, opt_hi))
+        active = lo <= hi
+        lo, hi, opt_lo, opt_hi = lo[active], hi[active], opt_lo[active], opt_hi[active]
+
+    return new_cost, splits
+
+def group_k_segments(ratios, n_groups):
+    # Optimal 1D k-segmentation (minimum within-group sum of squares) by dynamic
+    # programming with the divide-and-conquer optimization, O(k n log n). Keeping the
+    # split points of every layer would take O(k n) memory, so only the cost row of every
+    # sqrt(k)-th layer is kept and the split points of one block of layers at a time are
+    # recomputed while tracing the segments back: O(n sqrt(k)) memory for twice the work.
+    count = len(ratios)
+    n_groups = max(1, min(n_groups, count))
+    dtype = np.min_scalar_type(count)
+
+    cumsum = np.concatenate(([0.0], np.cumsum(ratios)))
+    cumsum_sq = np.concatenate(([0.0], np.cumsum(ratios * ratios)))
+
+    cost = _segment_costs(cumsum, cumsum_sq, np.zeros(count, dtype=np.int64), np.arange(1, count + 1))
+    block = max(1, math.isqrt(n_groups - 1))
+    checkpoints = []
+
+    for k in range(1, n_groups):
+        if (k - 1) % block == 0:
+            checkpoints.append(cost)
+        cost, _ = _k_segments_layer(cost, cumsum, cumsum_sq, k, dtype)
+
+    bounds = [count]
+    end = count - 1
+    for index in range(len(checkpoints) - 1, -1, -1):
+        first = index * block + 1
+        cost = checkpoints.pop()
+        splits = []
+        for k in range(first, min(first + block, n_groups)):
+            cost, layer_splits = _k_segments_layer(cost, cumsum, cumsum_sq, k, dtype)
+            splits.append(layer_splits)
+
+        for layer_splits in reversed(splits):
+            start = int(layer_splits[end])
+            bounds.append(start)
+            end = start - 1
+    bounds.append(0)
+
+    return _labels_from_bounds(bounds[::-1], count)
+
+def group_density(ratios, threshold, min_samples=3):
+    # DBSCAN in one dimension with eps = threshold. On sorted ratios clusters are runs of
+    # core points, border points join the nearest core neighbour and noise points become
+    # single-shape groups, so every shape is still assigned.
+    count = len(ratios)
+    neighbours = (
+        np.searchsorted(ratios, ratios + threshold, side='right') -
+        np.searchsorted(ratios, ratios - threshold, side='left')
+    )
+    core = np.flatnonzero(neighbours >= min_samples)
+
+    if len(core) == 0:
+        return np.arange(count, dtype=np.int32)
+
+    core_labels = np.zeros(len(core), dtype=np.int64)
+    core_labels[1:] = np.cumsum(np.diff(ratios[core]) > threshold)
+
+    positions = np.arange(count)
+    right = np.clip(np.searchsorted(core, positions), 0, len(core) - 1)
+    left = np.clip(right - 1, 0, len(core) - 1)
+    left_dist = np.abs(ratios - ratios[core[left]])
+    right_dist = np.abs(ratios[core[right]] - ratios)
+    nearest = np.where(left_dist <= right_dist, left, right)
+    distance = np.minimum(left_dist, right_dist)
+
+    cluster = np.where(distance <= threshold, core_labels[nearest], -1)
+
+    # Every change of cluster, and every noise point, starts a new group
+    starts = np.ones(count, dtype=bool)
+    starts[1:] = (cluster[1:] != cluster[:-1]) | (cluster[1:] == -1)
+    return np.cumsum(starts, dtype=np.int32) - 1
+
+def build_kd_tree(vectors, trees=4):
+    return cv2.flann_Index(np.ascontiguousarray(vectors, dtype=np.float32), dict(algorithm=1, trees=trees))
+
+def knn_search(tree, queries, k, checks=128):
+    indices, distances = tree.knnSearch(
+        np.ascontiguousarray(queries, dtype=np.float32), k, params=dict(checks=checks)
+    )
+    # FLANN reports squared L2 distances
+    return indices, np.sqrt(distances)
+
+def connected_components(count, rows, cols):
+    labels = np.arange(count)
+
+    while True:
+        linked = np.minimum(labels[rows], labels[cols])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, rows, linked)
+        np.minimum.at(new_labels, cols, linked)
+        new_labels = new_labels[new_labels]
+
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+def group_descriptors(vectors, threshold, neighbours=16):
+    # Shapes are linked when they are within threshold of each other in the standardized
+    # descriptor space (KD-tree k-NN search), and groups are the connected components.
+    # Groups are numbered in order of their smallest row, so on ratio-sorted input they
+    # come out ordered by their lowest ratio like the 1D engines.
+    count = len(vectors)
+    if count < 2:
+        return np.zeros(count, dtype=np.int32)
+
+    k = min(neighbours, count)
+    indices, distances = knn_search(build_kd_tree(vectors), vectors, k)
+
+    rows = np.repeat(np.arange(count), k)
+    cols = indices.ravel()
+    linked = (distances.ravel() <= threshold) & (cols >= 0)
+    components = connected_components(count, rows[linked], cols[linked])
+
+    _, first, labels = np.unique(components, return_index=True, return_inverse=True)
+    order = np.argsort(np.argsort(first))
+    return order[labels].astype(np.int32)
+
+RATIO_GROUPING_METHODS = ('running-mean', 'gap', 'kseg', 'density')
+GROUPING_METHODS = RATIO_GROUPING_METHODS + ('descriptor',)
+# Keyword options each method accepts on top of the threshold, all positive integers
+GROUPING_OPTIONS = {
+    'running-mean': (),
+    'gap': (),
+    'kseg': ('n_groups',),
+    'density': ('min_samples',),
+    'descriptor': ('neighbours',),
+}
+
+def group_ratios(ratios, threshold, method='running-mean', n_groups=None, min_samples=3):
+    ratios = np.asarray(ratios, dtype=np.float64)
+
+    if len(ratios) == 0:
+        return np.zeros(0, dtype=np.int32)
+
+    if method == 'running-mean':
+        return group_running_mean(ratios, threshold)
+    if method == 'gap':
+        return group_gaps(ratios, threshold)
+    if method == 'kseg':
+        if n_groups is None:
+            n_groups = int(group_running_mean(ratios, threshold)[-1]) + 1
+        return group_k_segments(ratios, n_groups)
+    if method == 'density':
+        return group_density(ratios, threshold, min_samples)
+
+    raise ValueError(f"Unknown grouping method: {method}")
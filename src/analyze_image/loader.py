@@ -0,0 +1,70 @@
+import cv2
+import os
+import numpy as np
+
+DECODE_MODES = ('color', 'gray')
+REDUCE_FACTORS = (1, 2, 4, 8)
+RAW_EXTENSIONS = ('.raw', '.bin')
+# Outputs drawn from the decoded pixels; they need a decode even on a cache hit and the full resolution
+PIXEL_OUTPUTS = {'histograms', 'histogram_data', 'edges', 'result_image', 'labels', 'visualization'}
+
+_DECODE_FLAGS = {
+    ('color', 1): cv2.IMREAD_COLOR,
+    ('gray', 1): cv2.IMREAD_GRAYSCALE,
+    ('color', 2): cv2.IMREAD_REDUCED_COLOR_2,
+    ('gray', 2): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    ('color', 4): cv2.IMREAD_REDUCED_COLOR_4,
+    ('gray', 4): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    ('color', 8): cv2.IMREAD_REDUCED_COLOR_8,
+    ('gray', 8): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+def parse_raw_shape(value):
+    # HEIGHTxWIDTH for gray frames, HEIGHTxWIDTHx3 for BGR frames
+    try:
+        shape = tuple(int(part) for part in value.lower().split('x'))
+    except ValueError:
+        shape = ()
+    if len(shape) not in (2, 3) or min(shape) < 1 or (len(shape) == 3 and shape[2] != 3):
+        raise ValueError(f"Invalid raw shape: {value} (expected HEIGHTxWIDTH or HEIGHTxWIDTHx3)")
+    return shape
+
+def load_raw(path, shape):
+    if shape is None:
+        raise ValueError(f"Raw image needs a shape: {path}")
+    if os.path.getsize(path) != np.prod(shape):
+        raise ValueError(f"Raw image {path} does not hold {'x'.join(map(str, shape))} bytes")
+    return np.memmap(path, dtype=np.uint8, mode='r', shape=shape)
+
+def read_image(source, decode='color', reduce=1, raw_shape=None):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        image = cv2.imdecode(np.frombuffer(source, dtype=np.uint8), _DECODE_FLAGS[decode, reduce])
+        if image is None:
+            raise ValueError("Cannot decode image data")
+        return image
+
+    if not isinstance(source, np.ndarray):
+        extension = os.path.splitext(str(source))[1].lower()
+        if extension == '.npy':
+            source = np.load(source, mmap_mode='r')
+        elif extension in RAW_EXTENSIONS:
+            source = load_raw(source, raw_shape)
+        else:
+            image = cv2.imread(str(source), _DECODE_FLAGS[decode, reduce])
+            if image is None:
+                raise ValueError(f"Cannot load image: {source}")
+            return image
+
+    # Arrays and memory maps are handed on as they are; only a requested conversion copies
+    image = source
+    if decode == 'gray':
+        image = to_gray(image)
+    if reduce > 1:
+        image = cv2.resize(image, None, fx=1 / reduce, fy=1 / reduce, interpolation=cv2.INTER_AREA)
+    return image
+
+def to_gray(image):
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+def to_color(image):
+    return image if image.ndim == 3 else cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
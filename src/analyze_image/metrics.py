@@ -0,0 +1,162 @@
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+
+METRICS_FORMATS = ('jsonl', 'prometheus')
+
+class PipelineMetrics:
+    def __init__(self, format='jsonl', trace_memory=False, profile=False):
+        self.format = format
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.image_path = None
+        self.stages = {}
+        self.counters = {}
+        self._started = None
+        self._profiler = None
+
+    def __getstate__(self):
+        # Only the configuration travels to worker processes
+        state = self.__dict__.copy()
+        state['_profiler'] = None
+        return state
+
+    def start(self, image_path):
+        self.image_path = str(image_path)
+        self.stages = {}
+        self.counters = {}
+        self._started = time.perf_counter()
+
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, {'seconds': 0.0})
+            stage['seconds'] += time.perf_counter() - start
+
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                stage['allocated_bytes'] = stage.get('allocated_bytes', 0) + current - before
+                stage['peak_bytes'] = max(stage.get('peak_bytes', 0), peak - before)
+
+    def count(self, name, value):
+        self.counters[name] = int(value)
+
+    def record(self):
+        record = {
+            'image': self.image_path,
+            'timestamp': time.time(),
+            'total_seconds': time.perf_counter() - self._started,
+            'stages': self.stages,
+            'counters': self.counters,
+            'peak_rss_bytes': peak_rss_bytes(),
+        }
+        if self.trace_memory:
+            record['traced_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        return record
+
+    def finish(self, output_dir):
+        if self._started is None:
+            return None
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            profile_path = os.path.join(output_dir, 'profile.prof')
+            self._profiler.dump_stats(profile_path)
+            self._profiler = None
+            print(f"Saved profile: profile.prof")
+            pstats.Stats(profile_path).sort_stats('cumulative').print_stats(15)
+
+        record = self.record()
+        if self.trace_memory:
+            tracemalloc.stop()
+        self._started = None
+
+        if self.format == 'prometheus':
+            write_prometheus(os.path.join(output_dir, 'metrics.prom'), record)
+            print(f"Saved metrics: metrics.prom")
+        else:
+            write_jsonl(os.path.join(output_dir, 'metrics.jsonl'), record)
+            print(f"Saved metrics: metrics.jsonl")
+
+        return record
+
+    def abort(self):
+        # Ends a failed run without a record; a profiler left enabled would break the next start()
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started = None
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def write_jsonl(path, record):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def write_prometheus(path, record):
+    image = _label(record['image'])
+    lines = [
+        "# HELP shape_detector_stage_seconds Duration of a pipeline stage.",
+        "# TYPE shape_detector_stage_seconds gauge",
+    ]
+    for name, stage in record['stages'].items():
+        lines.append(f'shape_detector_stage_seconds{{image="{image}",stage="{name}"}} {stage["seconds"]:.6f}')
+
+    if any('allocated_bytes' in stage for stage in record['stages'].values()):
+        lines += [
+            "# HELP shape_detector_stage_allocated_bytes Net bytes allocated by a pipeline stage.",
+            "# TYPE shape_detector_stage_allocated_bytes gauge",
+        ]
+        for name, stage in record['stages'].items():
+            lines.append(
+                f'shape_detector_stage_allocated_bytes{{image="{image}",stage="{name}"}} {stage["allocated_bytes"]}'
+            )
+
+    lines += [
+        "# HELP shape_detector_count Object counts of the last run.",
+        "# TYPE shape_detector_count gauge",
+    ]
+    for name, value in record['counters'].items():
+        lines.append(f'shape_detector_count{{image="{image}",name="{name}"}} {value}')
+
+    lines += [
+        "# HELP shape_detector_total_seconds Duration of the whole run.",
+        "# TYPE shape_detector_total_seconds gauge",
+        f'shape_detector_total_seconds{{image="{image}"}} {record["total_seconds"]:.6f}',
+        "# HELP shape_detector_peak_rss_bytes Peak resident memory of the process.",
+        "# TYPE shape_detector_peak_rss_bytes gauge",
+        f'shape_detector_peak_rss_bytes{{image="{image}"}} {record["peak_rss_bytes"]}',
+    ]
+
+    # Written atomically so a scraper never reads a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
@@ -0,0 +1,108 @@
+import cv2
+import numpy as np
+from analyze_image.shape_detector import ShapeDetector, detect_edges
+from analyze_image.tiling import TILE_OVERLAP, _edges_in_region, _merge_regions
+from config.constants import (
+    ANALYZE_DIR, DEFAULT_OUTPUTS, CANNY_LOW_THRESHOLD, CANNY_HIGH_THRESHOLD, MIN_CONTOUR_AREA
+)
+
+PYRAMID_LEVELS = 2
+# Full-resolution margin around every candidate; covers coarse bounding box rounding
+PYRAMID_PADDING = 8
+COARSE_BLUR_KERNEL_SIZE = 3
+# Above this share of the image the regions cost more than one full-frame pass
+PYRAMID_MAX_COVERAGE = 0.5
+# Largest relative P²/A difference to the full-resolution path that bench accepts
+PYRAMID_RATIO_TOLERANCE = 0.01
+
+def coarse_regions(gray, levels=PYRAMID_LEVELS, padding=PYRAMID_PADDING, min_area=MIN_CONTOUR_AREA):
+    height, width = gray.shape[:2]
+    scale = 2 ** levels
+
+    coarse = gray
+    for _ in range(levels):
+        coarse = cv2.pyrDown(coarse)
+
+    # A light blur is enough here; the 9x9 kernel would wash out small objects at this scale
+    blurred = cv2.GaussianBlur(coarse, (COARSE_BLUR_KERNEL_SIZE, COARSE_BLUR_KERNEL_SIZE), 0)
+    edges = cv2.Canny(blurred, CANNY_LOW_THRESHOLD, CANNY_HIGH_THRESHOLD)
+    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8))
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(edges, connectivity=8)
+    x, y, w, h = (stats[1:, column] for column in range(4))
+
+    # Bounding boxes are generous on purpose: an object can only be lost here, never later
+    keep = (w + 2) * (h + 2) * scale * scale > min_area
+    x0 = np.clip((x[keep] - 1) * scale - padding, 0, width)
+    y0 = np.clip((y[keep] - 1) * scale - padding, 0, height)
+    x1 = np.clip((x[keep] + w[keep] + 1) * scale + padding, 0, width)
+    y1 = np.clip((y[keep] + h[keep] + 1) * scale + padding, 0, height)
+
+    return _merge_regions(zip(x0.tolist(), y0.tolist(), x1.tolist(), y1.tolist()))
+
+def detect_edges_pyramid(gray, levels=PYRAMID_LEVELS, padding=PYRAMID_PADDING, overlap=TILE_OVERLAP):
+    height, width = gray.shape[:2]
+    regions = coarse_regions(gray, levels, padding)
+
+    covered = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+    if covered > PYRAMID_MAX_COVERAGE * width * height:
+        return detect_edges(gray), [(0, 0, width, height)]
+
+    # Pixels outside every region stay empty, so the usual contour search runs unchanged
+    edges = np.zeros((height, width), dtype=np.uint8)
+    for x0, y0, x1, y1 in regions:
+        edges[y0:y1, x0:x1] = _edges_in_region(gray, (x0, y0, x1, y1), overlap)
+
+    return edges, regions
+
+def compare_detections(reference, candidate):
+    # Objects are matched by identical bounding boxes; anything else counts as missed
+    boxes = {
+        (x, y, w, h): ratio
+        for x, y, w, h, ratio in zip(
+            candidate['x'].tolist(), candidate['y'].tolist(), candidate['w'].tolist(),
+            candidate['h'].tolist(), candidate['ratio'].tolist(),
+        )
+    }
+
+    errors = []
+    for x, y, w, h, ratio in zip(
+        reference['x'].tolist(), reference['y'].tolist(), reference['w'].tolist(),
+        reference['h'].tolist(), reference['ratio'].tolist(),
+    ):
+        match = boxes.get((x, y, w, h))
+        if match is not None:
+            errors.append(abs(match - ratio) / ratio)
+
+    return {
+        'reference_objects': len(reference),
+        'objects': len(candidate),
+        'matched': len(errors),
+        'max_ratio_error': max(errors, default=0.0),
+    }
+
+class PyramidShapeDetector(ShapeDetector):
+    def __init__(self, image_path, output_dir=ANALYZE_DIR, outputs=DEFAULT_OUTPUTS, levels=PYRAMID_LEVELS, **options):
+        if options.get('engine', 'canny') != 'canny':
+            raise ValueError("Pyramid detection only supports the canny engine")
+
+        self.levels = levels
+        super().__init__(image_path, output_dir, outputs, **options)
+
+    def detection_params(self):
+        params = super().detection_params()
+        params.update(
+            detector='pyramid', levels=self.levels, padding=PYRAMID_PADDING,
+            coarse_blur_kernel_size=COARSE_BLUR_KERNEL_SIZE, max_coverage=PYRAMID_MAX_COVERAGE,
+            overlap=TILE_OVERLAP,
+        )
+        return params
+
+    def preprocess_image(self):
+        gray = self.gray_image()
+        edges, regions = detect_edges_pyramid(gray, self.levels)
+
+        self._count('pyramid_regions', len(regions))
+        self._count('pyramid_pixels', sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions))
+
+        return gray, edges
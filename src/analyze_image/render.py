@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+from analyze_image.contours import PackedContours
+from analyze_image.loader import to_color
+
+GROUP_COLORS = [
+    (255, 0, 0),
+    (0, 255, 0),
+    (0, 0, 255),
+    (255, 255, 0),
+    (255, 0, 255),
+    (0, 255, 255),
+    (255, 128, 0),
+    (128, 0, 255),
+    (0, 255, 128),
+    (255, 0, 128),
+]
+# A 15x12 inch figure at 150 dpi leaves about this many pixels per panel
+PANEL_SIZE = 1200
+
+def fit_scale(shape, max_size=None):
+    if max_size is None:
+        return 1.0
+    return min(1.0, max_size / max(shape[:2]))
+
+def resize(image, scale, interpolation=cv2.INTER_AREA):
+    if scale >= 1.0:
+        return image
+    height, width = image.shape[:2]
+    size = (max(round(width * scale), 1), max(round(height * scale), 1))
+    return cv2.resize(image, size, interpolation=interpolation)
+
+def scale_contours(contours, scale):
+    contours = PackedContours.pack(contours)
+    if scale >= 1.0:
+        return contours
+    return PackedContours(np.round(contours.points * scale).astype(np.int32), contours.offsets)
+
+def draw_groups(image, groups, contours, colors=GROUP_COLORS):
+    # One fill per group; objects never overlap, so this matches drawing them one by one
+    for group_idx, group in enumerate(groups):
+        color = colors[group_idx % len(colors)]
+        cv2.drawContours(image, [contours[idx] for idx in group['index']], -1, color, -1)
+    return image
+
+def render_groups(image, groups, contours, max_size=None):
+    scale = fit_scale(image.shape, max_size)
+    canvas = to_color(resize(image, scale))
+    if canvas is image:
+        canvas = image.copy()
+    return draw_groups(canvas, groups, scale_contours(contours, scale))
+
+def label_mask(shape, groups, contours, max_size=None):
+    scale = fit_scale(shape, max_size)
+    height, width = shape[:2]
+    if scale < 1.0:
+        height, width = max(round(height * scale), 1), max(round(width * scale), 1)
+
+    # Group numbers start at 1; 0 is background
+    labels = np.zeros((height, width), dtype=np.uint8 if len(groups) < 256 else np.uint16)
+    contours = scale_contours(contours, scale)
+    for group_idx, group in enumerate(groups):
+        cv2.drawContours(labels, [contours[idx] for idx in group['index']], -1, group_idx + 1, -1)
+    return labels
+
+def label_palette(colors=GROUP_COLORS):
+    palette = np.zeros((256, 1, 3), dtype=np.uint8)
+    for label in range(1, 256):
+        palette[label, 0] = colors[(label - 1) % len(colors)]
+    return palette
+
+def compose_labels(image, labels, palette=None):
+    if palette is None:
+        palette = label_palette()
+
+    if labels.dtype != np.uint8:
+        # Colors repeat every len(GROUP_COLORS) groups, so wrapping keeps each label's color
+        labels = np.where(labels > 0, (labels - 1) % len(GROUP_COLORS) + 1, 0).astype(np.uint8)
+
+    result = to_color(image)
+    if result is image:
+        result = image.copy()
+    cv2.copyTo(cv2.applyColorMap(labels, palette), labels, result)
+    return result
+
+def iter_tiles(image, labels, tile_size):
+    palette = label_palette()
+    height, width = labels.shape[:2]
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            window = (slice(y, y + tile_size), slice(x, x + tile_size))
+            yield y, x, compose_labels(image[window], labels[window], palette)
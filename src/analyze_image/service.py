@@ -0,0 +1,305 @@
+import cv2
+import json
+import os
+import signal
+import socket
+import threading
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from analyze_image.loader import DECODE_MODES, REDUCE_FACTORS, read_image, to_gray
+from analyze_image.shape_detector import (
+    DETECTION_ENGINES, ShapeDetector, detect_edges, find_external_contours, segment_foreground
+)
+from analyze_image.grouping import GROUPING_METHODS, GROUPING_OPTIONS
+
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8765
+SERVE_QUEUE_SIZE = 16
+SERVE_TIMEOUT = 60.0
+SERVE_MAX_BYTES = 64 * 1024 * 1024
+
+def _warm_worker():
+    # Runs in every worker process at startup, so the first request does not pay for thread pools
+    # and lazily initialized OpenCV state
+    cv2.setNumThreads(1)
+    detect_edges(np.zeros((64, 64), dtype=np.uint8))
+
+def analyze_job(data=None, path=None, ratio_threshold=1.0, grouping='running-mean', grouping_options=None,
+                engine='canny', decode='color', reduce=1):
+    start = time.perf_counter()
+    gray = to_gray(read_image(data if data is not None else path, decode, reduce))
+
+    mask = segment_foreground(gray) if engine == 'components' else detect_edges(gray)
+    contours, areas = find_external_contours(mask, scale=reduce)
+    groups, features = ShapeDetector.group_by_similarity(
+        contours, ratio_threshold, areas, grouping, **(grouping_options or {})
+    )
+
+    result = {
+        'image': None if path is None else str(path),
+        'width': gray.shape[1],
+        'height': gray.shape[0],
+        'reduce': reduce,
+        'objects': len(features),
+        'groups': [],
+    }
+    for group in groups:
+        stats = ShapeDetector.calculate_group_statistics(group)
+        result['groups'].append({
+            'count': int(stats['count']),
+            'avg_ratio': float(stats['avg_ratio']),
+            'min_ratio': float(stats['min_ratio']),
+            'max_ratio': float(stats['max_ratio']),
+            'std_ratio': float(stats['std_ratio']),
+            'avg_area': float(stats['avg_area']),
+            'objects': group['index'].tolist(),
+        })
+
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+class JobRejected(Exception):
+    pass
+
+class AnalysisService:
+    def __init__(self, workers=None, queue_size=SERVE_QUEUE_SIZE, timeout=SERVE_TIMEOUT):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.executor = None
+        # Running plus waiting jobs; further requests are turned away instead of queued
+        self.slots = threading.BoundedSemaphore(self.workers + queue_size)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        # Worker processes are started on demand, so one job per worker spawns them all now
+        for future in [self.executor.submit(_warm_worker) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def _release(self, future):
+        with self.lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self.slots.release()
+
+    def submit(self, **job):
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.rejected += 1
+            raise JobRejected("Service is at capacity, retry later")
+
+        with self.lock:
+            self.in_flight += 1
+        future = self.executor.submit(analyze_job, **job)
+        future.add_done_callback(self._release)
+        return future
+
+    def status(self):
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    server_version = "ShapeDetector"
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def _send_json(self, status, payload, headers=()):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/health':
+            self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+            return
+        self._send_json(200, {'status': 'ok', **self.server.service.status()})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/analyze':
+            self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > SERVE_MAX_BYTES:
+            self.close_connection = True
+            self._send_json(413, {'error': f"Request body exceeds {SERVE_MAX_BYTES} bytes"})
+            return
+        body = self.rfile.read(length)
+
+        try:
+            job = self._parse_job(url, body)
+            future = self.server.service.submit(**job)
+        except JobRejected as e:
+            self._send_json(503, {'error': str(e)}, [('Retry-After', '1')])
+            return
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+
+        try:
+            result = future.result(timeout=self.server.service.timeout)
+        except FutureTimeoutError:
+            self._send_json(504, {'error': "Analysis timed out"})
+            return
+        except ValueError as e:
+            self._send_json(422, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+
+        self._send_json(200, result)
+
+    def _parse_job(self, url, body):
+        if self.headers.get('Content-Type', '').split(';')[0].strip() == 'application/json':
+            # {"path": "...", "threshold": 1.0, "grouping": "running-mean", "options": {...}}
+            try:
+                params = json.loads(body or b'{}')
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON: {e}")
+            if not isinstance(params, dict) or 'path' not in params:
+                raise ValueError("JSON requests need a \"path\" field")
+            data, path = None, params['path']
+        else:
+            # Raw image bytes, with parameters in the query string
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            if not body:
+                raise ValueError("Request body is empty")
+            data, path = body, None
+
+        grouping = params.get('grouping', 'running-mean')
+        if grouping not in GROUPING_METHODS:
+            raise ValueError(f"Unknown grouping method: {grouping}")
+        engine = params.get('engine', 'canny')
+        if engine not in DETECTION_ENGINES:
+            raise ValueError(f"Unknown detection engine: {engine}")
+        decode = params.get('decode', 'color')
+        if decode not in DECODE_MODES:
+            raise ValueError(f"Unknown decode mode: {decode}")
+        try:
+            reduce = int(params.get('reduce', 1))
+        except (TypeError, ValueError):
+            reduce = None
+        if reduce not in REDUCE_FACTORS:
+            raise ValueError(f"Invalid reduce factor: {params.get('reduce')}")
+        options = params.get('options') or {}
+        if isinstance(options, str):
+            try:
+                options = json.loads(options)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid options: {e}")
+        if not isinstance(options, dict):
+            raise ValueError("\"options\" must be an object")
+        allowed = GROUPING_OPTIONS[grouping]
+        unknown = sorted(name for name in options if name not in allowed)
+        if unknown:
+            raise ValueError(
+                f"Unknown options for {grouping} grouping: {', '.join(unknown)} "
+                f"(allowed: {', '.join(allowed) or 'none'})"
+            )
+        for name, value in options.items():
+            if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+                raise ValueError(f"Option {name} must be a positive integer")
+
+        try:
+            ratio_threshold = float(params.get('threshold', 1.0))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid threshold: {params.get('threshold')}")
+
+        return {
+            'data': data,
+            'path': path,
+            'ratio_threshold': ratio_threshold,
+            'grouping': grouping,
+            'grouping_options': options,
+            'engine': engine,
+            'decode': decode,
+            'reduce': reduce,
+        }
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class AnalysisHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, verbose=False):
+        self.service = service
+        self.verbose = verbose
+        super().__init__(address, AnalysisRequestHandler)
+
+class UnixAnalysisHTTPServer(AnalysisHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        # HTTPServer.server_bind expects a (host, port) address
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super(ThreadingHTTPServer, self).server_bind()
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+def serve(host=SERVE_HOST, port=SERVE_PORT, socket_path=None, workers=None, queue_size=SERVE_QUEUE_SIZE,
+          timeout=SERVE_TIMEOUT, verbose=False):
+    print("=" * 60)
+    print("SHAPE SIMILARITY ANALYSIS SERVICE")
+    print("=" * 60)
+
+    service = AnalysisService(workers, queue_size, timeout)
+    print(f"Starting {service.workers} workers...")
+    service.start()
+    print("Workers ready")
+    print(f"Queue size: {queue_size}")
+
+    if socket_path is not None:
+        server = UnixAnalysisHTTPServer(str(socket_path), service, verbose)
+        print(f"Listening on unix:{socket_path}")
+    else:
+        server = AnalysisHTTPServer((host, port), service, verbose)
+        print(f"Listening on http://{host}:{server.server_port}")
+    print("POST /analyze (image bytes, or JSON with a path), GET /health; Ctrl+C to stop")
+
+    # shutdown() waits for serve_forever, so it cannot run on the main thread
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\nShutting down...")
+        server.server_close()
+        service.shutdown()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+    status = service.status()
+    print(f"Completed jobs: {status['completed']}, rejected: {status['rejected']}")
@@ -1,148 +1,305 @@
+import contextlib
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
 import os
-from utils.histogram import plot_histogram, plot_ratio_histogram
-from config.constants import ANALYZE_DIR
+from analyze_image.features import (
+    descriptor_matrix, extract_descriptors, extract_features, split_groups, standardize
+)
+from analyze_image.grouping import group_descriptors, group_ratios
+from analyze_image.statistics import scale_statistics, sample_scale_ratios
+from analyze_image.cache import cache_key, hash_file
+from analyze_image.contours import PackedContours
+from analyze_image.export import export_filename, export_results
+from analyze_image.loader import PIXEL_OUTPUTS, read_image, to_color, to_gray
+from analyze_image.render import (
+    PANEL_SIZE, draw_groups, fit_scale, iter_tiles, label_mask, render_groups, resize, scale_contours
+)
+from analyze_image.writer import ImageWriter
+from utils.histogram import (
+    compute_histograms, plot_pixel_histograms, plot_ratio_histogram, ratio_histogram, save_histograms
+)
+from utils.plotting import new_figure
+from config.constants import (
+    ANALYZE_DIR, ANALYZE_OUTPUTS, DEFAULT_OUTPUTS, BLUR_KERNEL_SIZE, CANNY_LOW_THRESHOLD, CANNY_HIGH_THRESHOLD,
+    CLOSE_KERNEL_SIZE, FOREGROUND_THRESHOLD, MIN_CONTOUR_AREA
+)
+
+DETECTION_ENGINES = ('canny', 'components')
+
+def detect_edges(gray):
+    blurred = cv2.GaussianBlur(gray, (BLUR_KERNEL_SIZE, BLUR_KERNEL_SIZE), 0)
+    edges = cv2.Canny(blurred, CANNY_LOW_THRESHOLD, CANNY_HIGH_THRESHOLD)
+
+    kernel = np.ones((CLOSE_KERNEL_SIZE, CLOSE_KERNEL_SIZE), np.uint8)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+
+    return edges
+
+def _ignore_count(name, value):
+    pass
+
+def estimate_background(gray):
+    border = np.concatenate((gray[0], gray[-1], gray[:, 0], gray[:, -1]))
+    return int(np.median(border))
+
+def segment_foreground(gray):
+    # Flat-colored objects on a uniform background need no blur or edge detection
+    mask = cv2.absdiff(gray, estimate_background(gray))
+    cv2.threshold(mask, FOREGROUND_THRESHOLD, 255, cv2.THRESH_BINARY, dst=mask)
+    return mask
+
+def find_external_contours(edges, min_area=MIN_CONTOUR_AREA, count=_ignore_count, scale=1):
+    # Only outermost contours are kept, so the hierarchy is neither built nor walked
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    areas = np.array([cv2.contourArea(c) for c in contours], dtype=np.float64)
+    keep = np.flatnonzero(areas > min_area / scale ** 2)
+
+    count('contours_found', len(contours))
+    count('contours_kept', len(keep))
+    packed = PackedContours.pack([contours[idx] for idx in keep])
+    if scale > 1:
+        # Edges found on a reduced decode are reported in full-resolution pixels
+        packed = PackedContours(packed.points * scale, packed.offsets)
+    count('contour_bytes', packed.nbytes)
+    return packed, areas[keep] * scale ** 2
 
 class ShapeDetector:
-    def __init__(self, image_path):
-        self.original_image = cv2.imread(image_path)
-        if self.original_image is None:
+    TITLE = "SHAPE SIMILARITY DETECTION"
+    OUTPUTS = ANALYZE_OUTPUTS
+
+    @classmethod
+    def supported_outputs(cls, reduce=1):
+        # Pixel outputs of a reduced decode would be drawn at the wrong scale
+        return tuple(name for name in cls.OUTPUTS if reduce == 1 or name not in PIXEL_OUTPUTS)
+
+    @classmethod
+    def default_outputs(cls, reduce=1):
+        return tuple(name for name in cls.supported_outputs(reduce) if name in DEFAULT_OUTPUTS)
+
+    def __init__(self, image_path, output_dir=ANALYZE_DIR, outputs=DEFAULT_OUTPUTS, cache=None, index=None,
+                 metrics=None, export_format='text', export_contours=False, engine='canny', image=None,
+                 writer=None, render_size=None, render_tiles=None, decode='color', reduce=1, raw_shape=None):
+        if not os.path.isfile(image_path):
             raise ValueError(f"Cannot load image: {image_path}")
+        unsupported = [name for name in outputs if name not in self.supported_outputs(reduce)]
+        if unsupported:
+            raise ValueError(f"Outputs not supported in this mode: {', '.join(unsupported)}")
+
+        self.image_path = image_path
+        self.original_image = None
+        self.output_dir = output_dir
+        self.outputs = set(outputs)
+        self.cache = cache
+        self.index = index
+        self.metrics = metrics
+        self.export_format = export_format
+        self.export_contours = export_contours
+        self.engine = engine
+        self.writer = writer or ImageWriter()
+        self.render_size = render_size
+        self.render_tiles = render_tiles
+        self.decode = decode
+        self.reduce = reduce
+        self.raw_shape = raw_shape
+        self.statistics = []
+        self.histograms = None
+        self._image_hash = None
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        if self.metrics is not None:
+            self.metrics.start(image_path)
+
+        if image is not None:
+            self.set_image(image)
+
+        # Decoding is deferred when a cache may make it unnecessary
+        if self.cache is None:
+            try:
+                with self._stage('load'):
+                    self.load_image()
+            except BaseException:
+                self._abort_metrics()
+                raise
+
+    def _stage(self, name):
+        if self.metrics is None:
+            return contextlib.nullcontext()
+        return self.metrics.stage(name)
+
+    def _count(self, name, value):
+        if self.metrics is not None:
+            self.metrics.count(name, value)
+
+    def _finish_metrics(self):
+        if self.metrics is not None:
+            self.metrics.finish(self.output_dir)
+
+    def _abort_metrics(self):
+        if self.metrics is not None:
+            self.metrics.abort()
+
+    def load_image(self):
+        if self.original_image is None:
+            self.set_image(read_image(self.image_path, self.decode, self.reduce, self.raw_shape))
 
-        self.image = self.original_image.copy()
-        self.height, self.width = self.image.shape[:2]
-        self.output_dir = ANALYZE_DIR
+        return self.original_image
 
-    def preprocess_image(self):
-        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (9, 9), 0)
-        edges = cv2.Canny(blurred, 50, 120)
+    def set_image(self, image):
+        if not isinstance(image, np.ndarray):
+            image = read_image(image, self.decode, self.reduce)
 
-        kernel = np.ones((3, 3), np.uint8)
-        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+        # Nothing draws on the input, so it is kept once and only copied for the result image
+        self.original_image = image
+        self.height, self.width = image.shape[:2]
 
-        return gray, edges
+    def detection_params(self):
+        if self.engine == 'components':
+            params = {
+                'detector': 'full',
+                'engine': 'components',
+                'foreground_threshold': FOREGROUND_THRESHOLD,
+                'min_contour_area': MIN_CONTOUR_AREA,
+            }
+        else:
+            params = {
+                'detector': 'full',
+                'engine': 'canny',
+                'blur_kernel_size': BLUR_KERNEL_SIZE,
+                'canny_thresholds': (CANNY_LOW_THRESHOLD, CANNY_HIGH_THRESHOLD),
+                'close_kernel_size': CLOSE_KERNEL_SIZE,
+                'min_contour_area': MIN_CONTOUR_AREA,
+            }
 
-    def find_contours(self, edges):
-        contours, hierarchy = cv2.findContours(
-            edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE
-        )
+        # Gray and reduced decodes give slightly different pixels and raw files depend on their shape,
+        # so they get their own entries
+        if self.decode != 'color':
+            params['decode'] = self.decode
+        if self.reduce > 1:
+            params['reduce'] = self.reduce
+        if self.raw_shape is not None:
+            params['raw_shape'] = self.raw_shape
+        return params
 
-        external_contours = []
-        for idx, h in enumerate(hierarchy[0]):
-            if h[3] == -1:
-                if cv2.contourArea(contours[idx]) > 300:
-                    external_contours.append(contours[idx])
+    def image_hash(self):
+        if self._image_hash is None:
+            self._image_hash = hash_file(self.image_path)
+        return self._image_hash
 
-        return external_contours
+    def contour_cache_key(self):
+        return cache_key(self.image_hash(), self.detection_params())
 
-    def calculate_ratio(self, contour):
-        area = cv2.contourArea(contour)
-        perimeter = cv2.arcLength(contour, True)
+    def extract_contours(self):
+        if self.cache is not None:
+            key = self.contour_cache_key()
+            cached = self.cache.load_contours(key)
+            if cached is not None:
+                return cached
 
-        if perimeter == 0 or area == 0:
-            return None
+        _, edges = self.preprocess_image()
+        contours, areas = self.find_contours(edges)
 
-        ratio = (perimeter ** 2) / area
-        return ratio
+        if self.cache is not None:
+            self.cache.save_contours(key, contours, areas)
 
-    def group_by_similarity(self, contours, ratio_threshold=2.0):
-        shape_info = []
+        return contours, areas
 
-        for idx, contour in enumerate(contours):
-            ratio = self.calculate_ratio(contour)
-            if ratio is not None:
-                shape_info.append({
-                    'index': idx,
-                    'ratio': ratio,
-                    'area': cv2.contourArea(contour),
-                    'perimeter': cv2.arcLength(contour, True),
-                    'contour': contour
-                })
+    def load_cached(self, ratio_threshold, grouping, grouping_options):
+        extraction_key = self.contour_cache_key()
+        grouping_key = cache_key(extraction_key, ratio_threshold, grouping, grouping_options)
+        self.cache_keys = (extraction_key, grouping_key)
 
-        if not shape_info:
-            return [], []
+        cached = self.cache.load_contours(extraction_key)
+        if cached is None:
+            return None, None, None
 
-        shape_info.sort(key=lambda x: x['ratio'])
+        contours, areas = cached
+        return contours, areas, self.cache.load_features(grouping_key)
 
-        groups = []
-        current_group = [shape_info[0]]
+    def gray_image(self):
+        return to_gray(self.load_image())
 
-        for i in range(1, len(shape_info)):
-            avg_ratio = np.mean([s['ratio'] for s in current_group])
+    def preprocess_image(self):
+        gray = self.gray_image()
+        if self.engine == 'components':
+            return gray, segment_foreground(gray)
 
-            if abs(shape_info[i]['ratio'] - avg_ratio) <= ratio_threshold:
-                current_group.append(shape_info[i])
-            else:
-                groups.append(current_group)
-                current_group = [shape_info[i]]
+        edges = detect_edges(gray)
+
+        return gray, edges
+
+    def find_contours(self, edges):
+        return find_external_contours(edges, count=self._count, scale=self.reduce)
+
+    def pixel_histograms(self, gray):
+        return compute_histograms(self.original_image, gray)
+
+    @staticmethod
+    def group_by_similarity(contours, ratio_threshold=2.0, areas=None, method='running-mean', descriptors=False,
+                            **options):
+        features = extract_features(contours, areas, descriptors or method == 'descriptor')
+
+        if len(features) == 0:
+            return [], features
 
-        groups.append(current_group)
+        features = features[np.argsort(features['ratio'], kind='stable')]
 
-        return groups, shape_info
+        if method == 'descriptor':
+            vectors, _, _ = standardize(descriptor_matrix(features))
+            features['group'] = group_descriptors(vectors, ratio_threshold, **options)
+            # Groups must be contiguous; the stable sort keeps them ordered by ratio inside
+            features = features[np.argsort(features['group'], kind='stable')]
+        else:
+            features['group'] = group_ratios(features['ratio'], ratio_threshold, method, **options)
+
+        return split_groups(features), features
+
+    @staticmethod
+    def calculate_group_statistics(group, scale_sample=None):
+        ratios = group['ratio']
+        areas = group['area']
 
-    def calculate_group_statistics(self, group):
         if len(group) < 2:
             return {
                 'count': len(group),
-                'avg_ratio': group[0]['ratio'],
-                'min_ratio': group[0]['ratio'],
-                'max_ratio': group[0]['ratio'],
+                'avg_ratio': ratios[0],
+                'min_ratio': ratios[0],
+                'max_ratio': ratios[0],
                 'std_ratio': 0.0,
-                'avg_area': group[0]['area'],
-                'scale_ratios': []
+                'avg_area': areas[0],
             }
 
-        ratios = [s['ratio'] for s in group]
-        areas = [s['area'] for s in group]
-
-        scale_ratios = []
-        for i in range(len(group)):
-            for j in range(i + 1, len(group)):
-                scale = np.sqrt(max(group[i]['area'], group[j]['area']) / min(group[i]['area'], group[j]['area']))
-                scale_ratios.append(scale)
-
-        return {
+        stats = {
             'count': len(group),
             'avg_ratio': np.mean(ratios),
             'min_ratio': np.min(ratios),
             'max_ratio': np.max(ratios),
             'std_ratio': np.std(ratios),
             'avg_area': np.mean(areas),
-            'scale_ratios': scale_ratios,
-            'avg_scale': np.mean(scale_ratios) if scale_ratios else 1.0,
-            'min_scale': np.min(scale_ratios) if scale_ratios else 1.0,
-            'max_scale': np.max(scale_ratios) if scale_ratios else 1.0
         }
+        stats.update(scale_statistics(areas))
+
+        if scale_sample:
+            stats['median_scale'] = float(np.median(sample_scale_ratios(areas, scale_sample)))
 
-    def visualize_results(self, groups):
-        result_image = self.original_image.copy()
+        return stats
 
-        colors = [
-            (255, 0, 0),
-            (0, 255, 0),
-            (0, 0, 255),
-            (255, 255, 0),
-            (255, 0, 255),
-            (0, 255, 255),
-            (255, 128, 0),
-            (128, 0, 255),
-            (0, 255, 128),
-            (255, 0, 128),
-        ]
+    def group_statistics(self, groups, scale_sample=None):
+        self.statistics = [self.calculate_group_statistics(g, scale_sample) for g in groups]
+        return self.statistics
 
-        for group_idx, group in enumerate(groups):
-            color = colors[group_idx % len(colors)]
+    def visualize_results(self, groups, contours):
+        return render_groups(self.load_image(), groups, contours, self.render_size)
 
-            for shape in group:
-                contour = shape['contour']
-                cv2.drawContours(result_image, [contour], -1, color, -1)
+    def write_tiles(self, labels):
+        tiles_dir = os.path.join(self.output_dir, 'result_tiles')
+        os.makedirs(tiles_dir, exist_ok=True)
+        for y, x, tile in iter_tiles(self.load_image(), labels, self.render_tiles):
+            self.writer.write_image(os.path.join(tiles_dir, f'tile_y{y}_x{x}.png'), tile)
 
-        return result_image
+    def save_results_table(self, groups, statistics=None):
+        if statistics is None:
+            statistics = self.group_statistics(groups)
 
-    def save_results_table(self, groups):
         output_path = os.path.join(self.output_dir, 'results_table.txt')
 
         with open(output_path, 'w', encoding='utf-8') as f:
@@ -151,9 +308,7 @@ class ShapeDetector:
             f.write("=" * 80 + "\n")
             f.write(f"\nTotal groups found: {len(groups)}\n")
 
-            for group_idx, group in enumerate(groups):
-                stats = self.calculate_group_statistics(group)
-
+            for group_idx, (group, stats) in enumerate(zip(groups, statistics)):
                 f.write(f"\n{'=' * 80}\n")
                 f.write(f"GROUP {group_idx + 1}:\n")
                 f.write(f"{'=' * 80}\n")
@@ -169,6 +324,8 @@ class ShapeDetector:
                     f.write(f"  Average scale: {stats['avg_scale']:.2f}x\n")
                     f.write(f"  Min scale: {stats['min_scale']:.2f}x\n")
                     f.write(f"  Max scale: {stats['max_scale']:.2f}x\n")
+                    if 'median_scale' in stats:
+                        f.write(f"  Median scale (sampled): {stats['median_scale']:.2f}x\n")
 
                 f.write(f"\nDetailed object data:\n")
                 for shape in group:
@@ -179,37 +336,176 @@ class ShapeDetector:
 
         print(f"Saved results table: results_table.txt")
 
-    def process(self, ratio_threshold=2.0):
-        print("=" * 60)
-        print("SHAPE SIMILARITY DETECTION")
-        print("=" * 60)
-        print(f"Ratio threshold: {ratio_threshold}")
+    def save_results(self, groups, statistics=None, contours=None):
+        if self.export_format == 'text':
+            self.save_results_table(groups, statistics)
+            return
 
-        print("\n1. Preprocessing...")
-        gray, edges = self.preprocess_image()
+        filename = export_filename(self.export_format)
+        export_results(
+            os.path.join(self.output_dir, filename), self.export_format, groups,
+            contours if self.export_contours else None,
+        )
+        print(f"Saved results: {filename}")
 
-        print("2. Generating histograms...")
-        plot_histogram(self.original_image, 'Original Image - Normalized Histogram', 'histogram_original.png')
-        plot_histogram(gray, 'Grayscale Image - Normalized Histogram', 'histogram_grayscale.png')
+    def process(self, ratio_threshold=2.0, grouping='running-mean', scale_sample=None, **grouping_options):
+        try:
+            return self._process(ratio_threshold, grouping, scale_sample, **grouping_options)
+        finally:
+            # Finished runs have already written their record; this only cleans up failed ones
+            self._abort_metrics()
 
-        print("3. Detecting contours...")
-        contours = self.find_contours(edges)
+    def _process(self, ratio_threshold, grouping, scale_sample, **grouping_options):
+        print("=" * 60)
+        print(self.TITLE)
+        print("=" * 60)
+        print(f"Ratio threshold: {ratio_threshold}")
+        print(f"Grouping method: {grouping}")
+        self._print_settings()
+
+        contours = areas = features = None
+        if self.cache is not None:
+            with self._stage('cache_lookup'):
+                contours, areas, features = self.load_cached(ratio_threshold, grouping, grouping_options)
+            self._count('cache_hit', contours is not None)
+            if contours is not None:
+                print(f"\nLoaded {len(contours)} contours from cache")
+
+        # A cache hit only needs the edge pipeline for the outputs that show it; histograms
+        # only need the gray plane
+        gray = edges = None
+        needs_edges = contours is None or self.outputs & {'edges', 'visualization'}
+        if needs_edges or self.outputs & {'histograms', 'histogram_data'}:
+            print("\n1. Preprocessing...")
+            with self._stage('preprocess'):
+                if needs_edges:
+                    gray, edges = self.preprocess_image()
+                else:
+                    gray = self.gray_image()
+
+        if self.outputs & {'histograms', 'histogram_data'}:
+            print("2. Computing histograms...")
+            with self._stage('histograms'):
+                self.histograms = self.pixel_histograms(gray)
+            if 'histograms' in self.outputs:
+                self.writer.submit(plot_pixel_histograms, self.histograms, self.output_dir)
+
+        if contours is None:
+            print("3. Detecting contours...")
+            with self._stage('find_contours'):
+                contours, areas = self.find_contours(edges)
+                if self.cache is not None:
+                    self.cache.save_contours(self.cache_keys[0], contours, areas)
+
+        # Full-size planes are only kept while an output still shows them
+        if 'visualization' not in self.outputs:
+            gray = None
+            if 'edges' not in self.outputs:
+                edges = None
 
         if len(contours) == 0:
             print("No objects found!")
+            self._count('objects', 0)
+            self._finish_metrics()
             return
 
         print("4. Grouping similar shapes...")
-        groups, shape_info = self.group_by_similarity(contours, ratio_threshold)
-        plot_ratio_histogram(shape_info, groups, self.output_dir)
+        with self._stage('group'):
+            if features is None:
+                groups, features = self.group_by_similarity(
+                    contours, ratio_threshold, areas, grouping, self.index is not None, **grouping_options
+                )
+                if self.cache is not None:
+                    self.cache.save_features(self.cache_keys[1], features)
+            else:
+                groups = split_groups(features)
+                if self.index is not None and grouping != 'descriptor':
+                    # Cached features may come from a run that never measured the signatures
+                    extract_descriptors(features, contours)
+        self._count('objects', len(features))
+        self._count('groups', len(groups))
+
+        if self.index is not None:
+            with self._stage('index'):
+                self.index.add_image(self.image_path, self.image_hash(), features)
+
+        if self.outputs & {'ratio_histogram', 'histogram_data'}:
+            with self._stage('ratio_histogram'):
+                ratio_hist = ratio_histogram(features, groups)
+            if 'ratio_histogram' in self.outputs:
+                self.writer.submit(plot_ratio_histogram, ratio_hist, self.output_dir)
+            if 'histogram_data' in self.outputs:
+                self.writer.submit(
+                    save_histograms, os.path.join(self.output_dir, 'histograms.npz'), self.histograms, ratio_hist
+                )
+
+        with self._stage('statistics'):
+            statistics = self.group_statistics(groups, scale_sample)
+        if 'groups' in self.outputs:
+            self._print_results(groups, statistics)
+
+        result_image = labels = None
+        if self.outputs & {'result_image', 'labels', 'edges', 'visualization'}:
+            print("\n5. Generating visualization...")
+
+        tiled_result = 'result_image' in self.outputs and self.render_tiles
+        if 'labels' in self.outputs or tiled_result:
+            # Tiles are composed from the labels, so the full image is never colored at once
+            with self._stage('render'):
+                labels = label_mask(
+                    self.load_image().shape, groups, contours, None if tiled_result else self.render_size
+                )
+
+        if tiled_result:
+            with self._stage('write'):
+                self.write_tiles(labels)
+            print(f"Saved result tiles: result_tiles/")
+        elif 'result_image' in self.outputs:
+            with self._stage('render'):
+                result_image = self.visualize_results(groups, contours)
+            with self._stage('write'):
+                self.writer.write_image(os.path.join(self.output_dir, 'result_image.png'), result_image)
+            print(f"Saved result image: result_image.png")
+
+        if 'labels' in self.outputs:
+            with self._stage('write'):
+                self.writer.write_image(os.path.join(self.output_dir, 'labels.png'), labels)
+            print(f"Saved label mask: labels.png")
+
+        if 'edges' in self.outputs:
+            with self._stage('write'):
+                edges = resize(edges, fit_scale(edges.shape, self.render_size))
+                self.writer.write_image(os.path.join(self.output_dir, 'edges.png'), edges)
+            print(f"Saved edges image: edges.png")
+
+        if 'visualization' in self.outputs:
+            with self._stage('visualization'):
+                self._display_results(groups, contours, edges, gray)
+
+        if 'table' in self.outputs:
+            print("\n6. Saving results table...")
+            with self._stage('write'):
+                self.writer.submit(self.save_results, groups, statistics, contours)
+
+        self._finish_metrics()
+
+        print("\n" + "=" * 60)
+        print("COMPLETED SUCCESSFULLY")
+        print(f"All outputs saved to: {self.output_dir}/")
+        print("=" * 60)
+
+        return result_image, groups
 
+    def _print_settings(self):
+        pass
+
+    def _print_results(self, groups, statistics):
         print("\n" + "=" * 60)
         print("RESULTS")
         print("=" * 60)
         print(f"Total groups: {len(groups)}")
 
-        for group_idx, group in enumerate(groups):
-            stats = self.calculate_group_statistics(group)
+        for group_idx, (group, stats) in enumerate(zip(groups, statistics)):
             print(f"\nGROUP {group_idx + 1}:")
             print(f"  Count: {stats['count']}")
             print(f"  Avg P²/A ratio: {stats['avg_ratio']:.2f}")
@@ -217,31 +513,18 @@ class ShapeDetector:
             if len(group) > 1:
                 print(f"  Avg scale: {stats['avg_scale']:.2f}x")
 
-        print("\n5. Generating visualization...")
-        result_image = self.visualize_results(groups)
-
-        cv2.imwrite(os.path.join(self.output_dir, 'result_image.png'), result_image)
-        print(f"Saved result image: result_image.png")
-
-        cv2.imwrite(os.path.join(self.output_dir, 'edges.png'), edges)
-        print(f"Saved edges image: edges.png")
-
-        self._display_results(result_image, edges, gray)
+    def _display_results(self, groups, contours, edges, gray):
+        # Panels are drawn at the size they take up in the figure, whatever the input size
+        scale = fit_scale(self.original_image.shape, PANEL_SIZE)
+        original = to_color(resize(self.original_image, scale))
+        result_image = draw_groups(original.copy(), groups, scale_contours(contours, scale))
+        gray = resize(gray, scale)
+        edges = resize(edges, fit_scale(edges.shape, PANEL_SIZE))
 
-        print("\n6. Saving results table...")
-        self.save_results_table(groups)
+        fig = new_figure(figsize=(15, 12))
+        axes = fig.subplots(2, 2)
 
-        print("\n" + "=" * 60)
-        print("COMPLETED SUCCESSFULLY")
-        print(f"All outputs saved to: {self.output_dir}/")
-        print("=" * 60)
-
-        return result_image, groups
-
-    def _display_results(self, result_image, edges, gray):
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-
-        axes[0, 0].imshow(cv2.cvtColor(self.original_image, cv2.COLOR_BGR2RGB))
+        axes[0, 0].imshow(cv2.cvtColor(original, cv2.COLOR_BGR2RGB))
         axes[0, 0].set_title('Original Image (Input)', fontsize=14)
         axes[0, 0].axis('off')
 
@@ -250,14 +533,15 @@ class ShapeDetector:
         axes[0, 1].axis('off')
 
         axes[1, 0].imshow(edges, cmap='gray')
-        axes[1, 0].set_title('Detected Edges (Canny)', fontsize=14)
+        axes[1, 0].set_title(
+            'Foreground Mask' if self.engine == 'components' else 'Detected Edges (Canny)', fontsize=14
+        )
         axes[1, 0].axis('off')
 
         axes[1, 1].imshow(cv2.cvtColor(result_image, cv2.COLOR_BGR2RGB))
         axes[1, 1].set_title('Grouped Similar Shapes', fontsize=14)
         axes[1, 1].axis('off')
 
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.output_dir, 'visualization.png'), dpi=150, bbox_inches='tight')
+        fig.tight_layout()
+        fig.savefig(os.path.join(self.output_dir, 'visualization.png'), dpi=150, bbox_inches='tight')
         print(f"Saved visualization: visualization.png")
-        plt.close()
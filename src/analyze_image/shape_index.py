@@ -0,0 +1,272 @@
+import cv2
+import glob
+import os
+import sqlite3
+import time
+import numpy as np
+from analyze_image.features import descriptor_matrix, standardize
+from analyze_image.grouping import build_kd_tree, knn_search
+from config.constants import INDEX_DIR
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    hash TEXT NOT NULL,
+    analyzed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shapes (
+    id INTEGER PRIMARY KEY,
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    object_index INTEGER NOT NULL,
+    group_index INTEGER NOT NULL,
+    ratio REAL NOT NULL,
+    area REAL NOT NULL,
+    perimeter REAL NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    w INTEGER NOT NULL,
+    h INTEGER NOT NULL,
+    descriptor BLOB
+);
+CREATE INDEX IF NOT EXISTS shapes_image ON shapes(image_id);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0);
+"""
+
+SHAPE_COLUMNS = (
+    'id', 'path', 'object_index', 'group_index', 'ratio', 'area', 'perimeter', 'x', 'y', 'w', 'h'
+)
+
+class ShapeIndex:
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        self.db_path = os.path.join(index_dir, 'shapes.sqlite')
+        self._connection = None
+        self._sidecar = None
+        self._descriptor_sidecar = None
+
+    def __getstate__(self):
+        # Connections and memory maps stay in the process that opened them
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_sidecar'] = None
+        state['_descriptor_sidecar'] = None
+        return state
+
+    def connect(self):
+        if self._connection is None:
+            os.makedirs(self.index_dir, exist_ok=True)
+            self._connection = sqlite3.connect(self.db_path, timeout=60)
+            self._connection.execute("PRAGMA foreign_keys = ON")
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.executescript(SCHEMA)
+
+            # Indexes created before descriptors were stored lack the column
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(shapes)")]
+            if 'descriptor' not in columns:
+                self._connection.execute("ALTER TABLE shapes ADD COLUMN descriptor BLOB")
+        return self._connection
+
+    def revision(self):
+        row = self.connect().execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return row[0]
+
+    def add_image(self, image_path, image_hash, features):
+        path = os.path.abspath(str(image_path))
+        connection = self.connect()
+
+        with connection:
+            connection.execute("DELETE FROM images WHERE path = ?", (path,))
+            image_id = connection.execute(
+                "INSERT INTO images (path, hash, analyzed_at) VALUES (?, ?, ?)",
+                (path, image_hash, time.time()),
+            ).lastrowid
+
+            rows = zip(
+                [image_id] * len(features),
+                features['index'].tolist(),
+                features['group'].tolist(),
+                features['ratio'].tolist(),
+                features['area'].tolist(),
+                features['perimeter'].tolist(),
+                features['x'].tolist(),
+                features['y'].tolist(),
+                features['w'].tolist(),
+                features['h'].tolist(),
+                [row.tobytes() for row in descriptor_matrix(features).astype(np.float64)],
+            )
+            connection.executemany(
+                "INSERT INTO shapes (image_id, object_index, group_index, ratio, area, perimeter, x, y, w, h, "
+                "descriptor) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+
+    def _sidecar_paths(self, revision):
+        return (
+            os.path.join(self.index_dir, f"ratios.{revision}.npy"),
+            os.path.join(self.index_dir, f"ids.{revision}.npy"),
+        )
+
+    def build_sidecar(self, revision):
+        ratios_path, ids_path = self._sidecar_paths(revision)
+
+        rows = self.connect().execute("SELECT ratio, id FROM shapes ORDER BY ratio, id").fetchall()
+        data = np.array(rows, dtype=np.float64).reshape(-1, 2)
+
+        for path, array in ((ratios_path, data[:, 0]), (ids_path, data[:, 1].astype(np.int64))):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+
+        for path in glob.glob(os.path.join(self.index_dir, "ratios.*.npy")) + \
+                glob.glob(os.path.join(self.index_dir, "ids.*.npy")):
+            if path not in (ratios_path, ids_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def sorted_ratios(self):
+        # Sorted ratio column and matching shape ids, rebuilt lazily after the database changes
+        revision = self.revision()
+        if self._sidecar is not None and self._sidecar[0] == revision:
+            return self._sidecar[1], self._sidecar[2]
+
+        ratios_path, ids_path = self._sidecar_paths(revision)
+        if not (os.path.exists(ratios_path) and os.path.exists(ids_path)):
+            self.build_sidecar(revision)
+
+        ratios = np.load(ratios_path, mmap_mode='r')
+        ids = np.load(ids_path, mmap_mode='r')
+        self._sidecar = (revision, ratios, ids)
+        return ratios, ids
+
+    def nearest(self, ratio, k=10, exclude_id=None):
+        ratios, ids = self.sorted_ratios()
+        extra = 1 if exclude_id is not None else 0
+
+        # The k nearest values of a sorted array lie within k positions of the insertion point
+        pos = int(np.searchsorted(ratios, ratio))
+        lo, hi = max(pos - k - extra, 0), min(pos + k + extra, len(ratios))
+        window = np.asarray(ratios[lo:hi])
+        order = np.argsort(np.abs(window - ratio), kind='stable')
+
+        result = []
+        for offset in order:
+            shape_id = int(ids[lo + offset])
+            if shape_id == exclude_id:
+                continue
+            result.append(shape_id)
+            if len(result) == k:
+                break
+
+        return result
+
+    def _descriptor_paths(self, revision):
+        return (
+            os.path.join(self.index_dir, f"descriptors.{revision}.npy"),
+            os.path.join(self.index_dir, f"descriptor_ids.{revision}.npy"),
+            os.path.join(self.index_dir, f"descriptors.{revision}.flann"),
+        )
+
+    def build_descriptor_sidecar(self, revision):
+        paths = self._descriptor_paths(revision)
+        descriptors_path, ids_path, tree_path = paths
+
+        rows = self.connect().execute(
+            "SELECT id, descriptor FROM shapes WHERE descriptor IS NOT NULL ORDER BY id"
+        ).fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        descriptors = np.array([np.frombuffer(row[1], dtype=np.float64) for row in rows])
+
+        # Signatures are compared after scaling every component by its spread in the corpus
+        if len(rows):
+            vectors, _, _ = standardize(descriptors)
+        else:
+            vectors = np.empty((0, 0))
+        vectors = vectors.astype(np.float32)
+
+        for path, array in ((descriptors_path, vectors), (ids_path, ids)):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+
+        if len(rows):
+            tmp_path = f"{tree_path}.{os.getpid()}.tmp"
+            build_kd_tree(vectors).save(tmp_path)
+            os.replace(tmp_path, tree_path)
+
+        for path in glob.glob(os.path.join(self.index_dir, "descriptor*.*")):
+            if path not in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def descriptor_tree(self):
+        # Standardized signatures, their shape ids and a KD-tree over them, rebuilt lazily
+        revision = self.revision()
+        if self._descriptor_sidecar is not None and self._descriptor_sidecar[0] == revision:
+            return self._descriptor_sidecar[1:]
+
+        descriptors_path, ids_path, tree_path = self._descriptor_paths(revision)
+        if not (os.path.exists(descriptors_path) and os.path.exists(ids_path)):
+            self.build_descriptor_sidecar(revision)
+
+        vectors = np.load(descriptors_path)
+        ids = np.load(ids_path, mmap_mode='r')
+
+        tree = None
+        if len(vectors):
+            tree = cv2.flann_Index()
+            if not (os.path.exists(tree_path) and tree.load(vectors, tree_path)):
+                tree = build_kd_tree(vectors)
+
+        self._descriptor_sidecar = (revision, vectors, ids, tree)
+        return vectors, ids, tree
+
+    def nearest_descriptor(self, shape_id, k=10):
+        vectors, ids, tree = self.descriptor_tree()
+
+        row = int(np.searchsorted(ids, shape_id))
+        if tree is None or row == len(ids) or ids[row] != shape_id:
+            return []
+
+        count = min(k + 1, len(ids))
+        indices, _ = knn_search(tree, vectors[row:row + 1], count)
+        return [int(ids[i]) for i in indices[0] if i >= 0 and int(ids[i]) != shape_id][:k]
+
+    def fetch(self, shape_ids):
+        if not shape_ids:
+            return []
+
+        placeholders = ",".join("?" * len(shape_ids))
+        rows = self.connect().execute(
+            "SELECT shapes.id, images.path, object_index, group_index, ratio, area, perimeter, x, y, w, h "
+            f"FROM shapes JOIN images ON images.id = shapes.image_id WHERE shapes.id IN ({placeholders})",
+            shape_ids,
+        ).fetchall()
+
+        by_id = {row[0]: dict(zip(SHAPE_COLUMNS, row)) for row in rows}
+        return [by_id[shape_id] for shape_id in shape_ids if shape_id in by_id]
+
+    def find_shape(self, image_path, object_index):
+        row = self.connect().execute(
+            "SELECT shapes.id, shapes.ratio FROM shapes JOIN images ON images.id = shapes.image_id "
+            "WHERE images.path = ? AND object_index = ?",
+            (os.path.abspath(str(image_path)), object_index),
+        ).fetchone()
+        return row
+
+    def count(self):
+        connection = self.connect()
+        images = connection.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+        shapes = connection.execute("SELECT COUNT(*) FROM shapes").fetchone()[0]
+        return images, shapes
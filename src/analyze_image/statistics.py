@@ -0,0 +1,40 @@
+import numpy as np
+
+def scale_statistics(areas):
+    # The scale between two shapes is sqrt(max area / min area). With linear sizes
+    # s = sqrt(area) sorted ascending, every pair (i < j) has scale s[j] / s[i], so:
+    #   min  - smallest ratio of neighbouring sizes
+    #   max  - s[-1] / s[0]
+    #   mean - sum_j s[j] * sum_{i<j} 1/s[i], divided by the number of pairs
+    sizes = np.sort(np.sqrt(np.asarray(areas, dtype=np.float64)))
+    count = len(sizes)
+
+    if count < 2:
+        return {'avg_scale': 1.0, 'min_scale': 1.0, 'max_scale': 1.0}
+
+    inverse_prefix = np.cumsum(1.0 / sizes)[:-1]
+    pairs = count * (count - 1) / 2
+
+    return {
+        'avg_scale': float(np.dot(sizes[1:], inverse_prefix) / pairs),
+        'min_scale': float(np.min(sizes[1:] / sizes[:-1])),
+        'max_scale': float(sizes[-1] / sizes[0]),
+    }
+
+def sample_scale_ratios(areas, sample_size=10000, seed=0):
+    areas = np.asarray(areas, dtype=np.float64)
+    count = len(areas)
+    pairs = count * (count - 1) // 2
+
+    if pairs == 0:
+        return np.empty(0)
+
+    if pairs <= sample_size:
+        i, j = np.triu_indices(count, k=1)
+    else:
+        rng = np.random.default_rng(seed)
+        i = rng.integers(0, count, sample_size)
+        j = rng.integers(0, count - 1, sample_size)
+        j[j >= i] += 1
+
+    return np.sqrt(np.maximum(areas[i], areas[j]) / np.minimum(areas[i], areas[j]))
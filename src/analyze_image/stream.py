@@ -0,0 +1,253 @@
+import cv2
+import json
+import os
+import time
+import numpy as np
+from analyze_image.features import extract_features
+from analyze_image.grouping import group_running_mean
+from analyze_image.shape_detector import find_external_contours
+from config.constants import (
+    ANALYZE_DIR, BLUR_KERNEL_SIZE, CANNY_LOW_THRESHOLD, CANNY_HIGH_THRESHOLD, CLOSE_KERNEL_SIZE
+)
+
+STREAM_MAX_DISTANCE = 40.0
+STREAM_RATIO_TOLERANCE = 0.15
+STREAM_MAX_MISSED = 5
+
+def open_capture(source):
+    # Digits select a camera device, anything else is a file or stream URL
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else str(source))
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video: {source}")
+    return capture
+
+class ShapeTracker:
+    def __init__(self, ratio_threshold, max_distance=STREAM_MAX_DISTANCE,
+                 ratio_tolerance=STREAM_RATIO_TOLERANCE, max_missed=STREAM_MAX_MISSED):
+        self.ratio_threshold = ratio_threshold
+        self.max_distance = max_distance
+        self.ratio_tolerance = ratio_tolerance
+        self.max_missed = max_missed
+
+        self.track_ids = np.empty(0, dtype=np.int64)
+        self.centers = np.empty((0, 2))
+        self.ratios = np.empty(0)
+        self.groups = np.empty(0, dtype=np.int64)
+        self.missed = np.empty(0, dtype=np.int64)
+        self.next_track = 0
+
+        # Running sums per group id, so joining and leaving shapes update the means in O(1).
+        # Ids of groups whose last shape left are handed to new groups, so the arrays stay
+        # as long as the most groups that were ever live at once
+        self.group_sums = np.empty(0)
+        self.group_counts = np.empty(0, dtype=np.int64)
+
+    def match(self, centers, ratios):
+        # Mutual nearest neighbours within the distance and ratio gates
+        detection_to_track = np.full(len(centers), -1, dtype=np.int64)
+        if len(centers) == 0 or len(self.track_ids) == 0:
+            return detection_to_track
+
+        distances = np.linalg.norm(centers[:, None, :] - self.centers[None, :, :], axis=2)
+        ratio_change = np.abs(ratios[:, None] - self.ratios[None, :]) / self.ratios[None, :]
+        distances[(distances > self.max_distance) | (ratio_change > self.ratio_tolerance)] = np.inf
+
+        nearest_track = np.argmin(distances, axis=1)
+        nearest_detection = np.argmin(distances, axis=0)
+        detections = np.arange(len(centers))
+        mutual = (
+            (nearest_detection[nearest_track] == detections) &
+            np.isfinite(distances[detections, nearest_track])
+        )
+        detection_to_track[mutual] = nearest_track[mutual]
+        return detection_to_track
+
+    def _assign_groups(self, ratios):
+        groups = np.full(len(ratios), -1, dtype=np.int64)
+        active = np.flatnonzero(self.group_counts > 0)
+
+        if len(active):
+            means = self.group_sums[active] / self.group_counts[active]
+            differences = np.abs(ratios[:, None] - means[None, :])
+            closest = np.argmin(differences, axis=1)
+            joins = differences[np.arange(len(ratios)), closest] <= self.ratio_threshold
+            groups[joins] = active[closest[joins]]
+
+        # Shapes that fit no existing group are grouped among themselves as in analyze
+        unassigned = np.flatnonzero(groups < 0)
+        if len(unassigned):
+            order = unassigned[np.argsort(ratios[unassigned], kind='stable')]
+            labels = group_running_mean(ratios[order], self.ratio_threshold)
+
+            new_groups = int(labels[-1]) + 1
+            slots = np.flatnonzero(self.group_counts == 0)[:new_groups]
+            grow = new_groups - len(slots)
+            if grow:
+                slots = np.concatenate((slots, np.arange(len(self.group_counts), len(self.group_counts) + grow)))
+                self.group_sums = np.concatenate((self.group_sums, np.zeros(grow)))
+                self.group_counts = np.concatenate((self.group_counts, np.zeros(grow, dtype=np.int64)))
+            # Clears the rounding left over from the shapes that emptied a reused slot
+            self.group_sums[slots] = 0.0
+            groups[order] = slots[labels]
+
+        return groups
+
+    def update(self, features):
+        centers = np.column_stack((
+            features['x'] + features['w'] / 2,
+            features['y'] + features['h'] / 2,
+        ))
+        ratios = features['ratio'].astype(np.float64)
+
+        detection_to_track = self.match(centers, ratios)
+        matched = np.flatnonzero(detection_to_track >= 0)
+        tracks = detection_to_track[matched]
+
+        # Matched shapes keep their group; its mean follows their current ratio
+        np.add.at(self.group_sums, self.groups[tracks], ratios[matched] - self.ratios[tracks])
+        self.centers[tracks] = centers[matched]
+        self.ratios[tracks] = ratios[matched]
+        self.missed += 1
+        self.missed[tracks] = 0
+
+        track_ids = np.empty(len(features), dtype=np.int64)
+        groups = np.empty(len(features), dtype=np.int64)
+        track_ids[matched] = self.track_ids[tracks]
+        groups[matched] = self.groups[tracks]
+
+        new = np.flatnonzero(detection_to_track < 0)
+        if len(new):
+            new_groups = self._assign_groups(ratios[new])
+            np.add.at(self.group_sums, new_groups, ratios[new])
+            np.add.at(self.group_counts, new_groups, 1)
+
+            new_ids = np.arange(self.next_track, self.next_track + len(new))
+            self.next_track += len(new)
+            track_ids[new] = new_ids
+            groups[new] = new_groups
+
+            self.track_ids = np.concatenate((self.track_ids, new_ids))
+            self.centers = np.concatenate((self.centers, centers[new]))
+            self.ratios = np.concatenate((self.ratios, ratios[new]))
+            self.groups = np.concatenate((self.groups, new_groups))
+            self.missed = np.concatenate((self.missed, np.zeros(len(new), dtype=np.int64)))
+
+        expired = self.missed > self.max_missed
+        if expired.any():
+            np.subtract.at(self.group_sums, self.groups[expired], self.ratios[expired])
+            np.subtract.at(self.group_counts, self.groups[expired], 1)
+            keep = ~expired
+            self.track_ids = self.track_ids[keep]
+            self.centers = self.centers[keep]
+            self.ratios = self.ratios[keep]
+            self.groups = self.groups[keep]
+            self.missed = self.missed[keep]
+
+        return track_ids, groups, len(new)
+
+    def active_groups(self):
+        active = np.flatnonzero(self.group_counts > 0)
+        return active, self.group_counts[active], self.group_sums[active] / self.group_counts[active]
+
+class StreamAnalyzer:
+    def __init__(self, source, output_dir=ANALYZE_DIR, tracker=None, max_frames=None):
+        self.source = source
+        self.output_dir = output_dir
+        self.tracker = tracker or ShapeTracker(1.0)
+        self.max_frames = max_frames
+        self.kernel = np.ones((CLOSE_KERNEL_SIZE, CLOSE_KERNEL_SIZE), np.uint8)
+        self.frame = None
+        self.gray = self.blurred = self.edges = self.closed = None
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def _allocate(self, shape):
+        height, width = shape[:2]
+        self.gray = np.empty((height, width), dtype=np.uint8)
+        self.blurred = np.empty_like(self.gray)
+        self.edges = np.empty_like(self.gray)
+        self.closed = np.empty_like(self.gray)
+
+    def detect(self, frame):
+        # Same pipeline as detect_edges, written into buffers that live across frames
+        if self.gray is None or self.gray.shape != frame.shape[:2]:
+            self._allocate(frame.shape)
+
+        if frame.ndim == 3:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        else:
+            np.copyto(self.gray, frame)
+        cv2.GaussianBlur(self.gray, (BLUR_KERNEL_SIZE, BLUR_KERNEL_SIZE), 0, dst=self.blurred)
+        cv2.Canny(self.blurred, CANNY_LOW_THRESHOLD, CANNY_HIGH_THRESHOLD, edges=self.edges)
+        cv2.morphologyEx(self.edges, cv2.MORPH_CLOSE, self.kernel, dst=self.closed)
+
+        return find_external_contours(self.closed)
+
+    def process_frame(self, frame):
+        contours, areas = self.detect(frame)
+        features = extract_features(contours, areas)
+        track_ids, groups, new_tracks = self.tracker.update(features)
+        return features, track_ids, groups, new_tracks
+
+    def run(self, capture=None):
+        print("=" * 60)
+        print("SHAPE SIMILARITY DETECTION (STREAM)")
+        print("=" * 60)
+        print(f"Source: {self.source}")
+        print(f"Ratio threshold: {self.tracker.ratio_threshold}")
+
+        if capture is None:
+            capture = open_capture(self.source)
+        output_path = os.path.join(self.output_dir, 'stream.jsonl')
+        frames = 0
+        busy = 0.0
+        start = time.perf_counter()
+
+        try:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                while self.max_frames is None or frames < self.max_frames:
+                    ok, frame = capture.read(self.frame)
+                    if not ok:
+                        break
+                    self.frame = frame
+
+                    frame_start = time.perf_counter()
+                    features, _, _, new_tracks = self.process_frame(frame)
+                    seconds = time.perf_counter() - frame_start
+                    busy += seconds
+
+                    group_ids, counts, means = self.tracker.active_groups()
+                    f.write(json.dumps({
+                        'frame': frames,
+                        'objects': len(features),
+                        'new_tracks': new_tracks,
+                        'tracks': len(self.tracker.track_ids),
+                        'seconds': seconds,
+                        'groups': [
+                            {'id': int(g), 'count': int(c), 'avg_ratio': float(m)}
+                            for g, c, m in zip(group_ids, counts, means)
+                        ],
+                    }) + "\n")
+                    frames += 1
+        finally:
+            capture.release()
+
+        elapsed = time.perf_counter() - start
+        group_ids, counts, means = self.tracker.active_groups()
+
+        print(f"\nFrames: {frames}")
+        if frames:
+            print(f"Analysis: {busy / frames * 1000:.2f} ms/frame ({frames / max(busy, 1e-9):.1f} fps)")
+            print(f"Wall clock incl. decode: {frames / max(elapsed, 1e-9):.1f} fps")
+        print(f"Tracks started: {self.tracker.next_track}")
+        print(f"Active groups: {len(group_ids)}")
+        for g, c, m in zip(group_ids, counts, means):
+            print(f"  Group {g + 1}: count={c}, avg P²/A ratio={m:.2f}")
+
+        print(f"Saved per-frame results: stream.jsonl")
+
+        print("\n" + "=" * 60)
+        print("COMPLETED SUCCESSFULLY")
+        print(f"All outputs saved to: {self.output_dir}/")
+        print("=" * 60)
+
+        return frames
@@ -0,0 +1,174 @@
+import os
+import numpy as np
+from analyze_image.features import extract_features
+from analyze_image.grouping import group_ratios, group_running_mean
+from config.constants import ANALYZE_DIR
+
+def summarize_labels(ratios, labels):
+    counts = np.bincount(labels)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+
+    sums = np.bincount(labels, weights=ratios)
+    means = sums / counts
+    squared_deviation = np.bincount(labels, weights=(ratios - means[labels]) ** 2)
+
+    return {
+        'groups': len(counts),
+        'singletons': int(np.sum(counts == 1)),
+        'largest': int(counts.max()),
+        'avg_size': float(counts.mean()),
+        'max_span': float(np.max(ratios[ends - 1] - ratios[starts])),
+        'pooled_std': float(np.sqrt(squared_deviation.sum() / len(ratios))),
+    }
+
+def _nearest_larger(ranks):
+    # For every gap, the closest gap on each side with a larger rank (-1 and len(ranks)
+    # when there is none). Pointers jump over runs of smaller gaps, so they only ever
+    # skip gaps that are smaller than their own, like the stack-based scan.
+    count = len(ranks)
+    # Positions are shifted by one, with sentinels larger than every rank at both ends
+    keys = np.concatenate(([count], ranks, [count]))
+    bounds = []
+
+    for step in (-1, 1):
+        pointer = np.clip(np.arange(count + 2) + step, 0, count + 1)
+        active = np.arange(1, count + 1)
+        while len(active):
+            active = active[keys[pointer[active]] < keys[active]]
+            pointer[active] = pointer[pointer[active]]
+        bounds.append(pointer[1:count + 1] - 1)
+
+    return bounds[0], bounds[1]
+
+def sweep_gaps(ratios, thresholds):
+    # Raising the threshold only merges neighbouring gap groups, one gap at a time in order
+    # of size, so a single sort of the gaps gives the groups for every threshold: each gap
+    # joins the run of positions bounded by the nearest larger gaps on either side.
+    count = len(ratios)
+    gaps = np.diff(ratios)
+    order = np.argsort(gaps, kind='stable')
+    ranks = np.empty(len(gaps), dtype=np.int64)
+    ranks[order] = np.arange(len(gaps))
+
+    left, right = _nearest_larger(ranks)
+    starts, ends = (left + 1)[order], right[order]
+    sorted_gaps = gaps[order]
+
+    # Merging groups of sizes a and b adds a*b/(a+b) * (mean_a - mean_b)^2 to the
+    # within-group sum of squares, which never goes negative from rounding
+    cumsum = np.concatenate(([0.0], np.cumsum(ratios - ratios.mean())))
+    left_size, right_size = order - starts + 1, ends - order
+    left_mean = (cumsum[order + 1] - cumsum[starts]) / left_size
+    right_mean = (cumsum[ends + 1] - cumsum[order + 1]) / right_size
+    merge_cost = left_size * right_size / (left_size + right_size) * (left_mean - right_mean) ** 2
+
+    sizes = np.maximum.accumulate(np.concatenate(([1], ends - starts + 1)))
+    spans = np.maximum.accumulate(np.concatenate(([0.0], ratios[ends] - ratios[starts])))
+    deviation = np.cumsum(np.concatenate(([0.0], merge_cost)))
+
+    # A shape stays on its own while both of its neighbouring gaps are split
+    isolation = np.full(count, np.inf)
+    isolation[1:] = gaps
+    isolation[:-1] = np.minimum(isolation[:-1], gaps)
+    isolation.sort()
+
+    rows = []
+    for threshold in thresholds:
+        merged = int(np.searchsorted(sorted_gaps, threshold, side='right'))
+        groups = count - merged
+        rows.append({
+            'threshold': threshold,
+            'groups': groups,
+            'singletons': count - int(np.searchsorted(isolation, threshold, side='right')),
+            'largest': int(sizes[merged]),
+            'avg_size': count / groups,
+            'max_span': float(spans[merged]),
+            'pooled_std': float(np.sqrt(deviation[merged] / count)),
+        })
+
+    return rows
+
+def sweep_thresholds(ratios, thresholds, method='running-mean', **options):
+    ratios = np.sort(np.asarray(ratios, dtype=np.float64), kind='stable')
+    if method == 'gap' and len(ratios):
+        return sweep_gaps(ratios, thresholds)
+
+    # Only gap groups are nested across thresholds. A larger threshold can move a running-mean
+    # or density break rather than drop it, so those regroup the sorted ratios once per
+    # threshold; kseg only depends on the threshold through the group count
+    summaries = {}
+    rows = []
+
+    for threshold in thresholds:
+        key_options = options
+        if method == 'kseg' and len(ratios) and options.get('n_groups') is None:
+            key_options = dict(options, n_groups=int(group_running_mean(ratios, threshold)[-1]) + 1)
+        key = key_options.get('n_groups') if method == 'kseg' else threshold
+
+        if key not in summaries:
+            labels = group_ratios(ratios, threshold, method, **key_options)
+            summaries[key] = summarize_labels(ratios, labels)
+
+        row = {'threshold': threshold}
+        row.update(summaries[key])
+        rows.append(row)
+
+    return rows
+
+def save_sweep_table(rows, image_path, method, object_count, output_dir=ANALYZE_DIR):
+    output_path = os.path.join(output_dir, 'threshold_sweep.txt')
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write("THRESHOLD SWEEP\n")
+        f.write("=" * 80 + "\n")
+        f.write(f"\nImage: {image_path}\n")
+        f.write(f"Grouping method: {method}\n")
+        f.write(f"Objects: {object_count}\n\n")
+        f.write(format_sweep_table(rows))
+
+    print(f"Saved threshold sweep: threshold_sweep.txt")
+
+def format_sweep_table(rows):
+    lines = [
+        f"{'Threshold':>10} {'Groups':>7} {'Singletons':>10} {'Largest':>8} "
+        f"{'Avg size':>9} {'Max span':>9} {'Pooled std':>11}"
+    ]
+    for row in rows:
+        lines.append(
+            f"{row['threshold']:>10.3f} {row['groups']:>7d} {row['singletons']:>10d} "
+            f"{row['largest']:>8d} {row['avg_size']:>9.1f} {row['max_span']:>9.2f} "
+            f"{row['pooled_std']:>11.3f}"
+        )
+    return "\n".join(lines) + "\n"
+
+def sweep_image(detector, thresholds, method='running-mean', **options):
+    print("=" * 60)
+    print("THRESHOLD SWEEP")
+    print("=" * 60)
+    print(f"Thresholds: {len(thresholds)} ({min(thresholds)} - {max(thresholds)})")
+    print(f"Grouping method: {method}")
+
+    print("\n1. Extracting contours...")
+    contours, areas = detector.extract_contours()
+
+    print("2. Computing shape features...")
+    features = extract_features(contours, areas)
+
+    if len(features) == 0:
+        print("No objects found!")
+        return []
+
+    print(f"3. Grouping {len(features)} objects for every threshold...\n")
+    rows = sweep_thresholds(features['ratio'], thresholds, method, **options)
+
+    print(format_sweep_table(rows))
+    save_sweep_table(rows, detector.image_path, method, len(features), detector.output_dir)
+
+    print("\n" + "=" * 60)
+    print("COMPLETED SUCCESSFULLY")
+    print(f"All outputs saved to: {detector.output_dir}/")
+    print("=" * 60)
+
+    return rows
@@ -0,0 +1,252 @@
+import cv2
+import numpy as np
+import os
+from analyze_image.contours import PackedContours
+from analyze_image.loader import RAW_EXTENSIONS, read_image, to_gray
+from analyze_image.shape_detector import ShapeDetector, _ignore_count, detect_edges
+from utils.histogram import compute_histograms, merge_histograms
+from config.constants import ANALYZE_DIR, BLUR_KERNEL_SIZE, CLOSE_KERNEL_SIZE, MIN_CONTOUR_AREA
+
+# Blur radius + Sobel and non-maximum suppression in Canny + dilate/erode of the close
+KERNEL_REACH = BLUR_KERNEL_SIZE // 2 + 2 + 2 * (CLOSE_KERNEL_SIZE // 2)
+# Extra context so that Canny hysteresis chains usually resolve inside the window
+TILE_OVERLAP = 4 * KERNEL_REACH
+TILED_OUTPUTS = ('groups', 'table', 'histograms', 'histogram_data', 'ratio_histogram')
+
+def load_gray_source(image_path, histograms=True, decode='color', raw_shape=None):
+    extension = os.path.splitext(str(image_path))[1].lower()
+    if extension == '.npy' or extension in RAW_EXTENSIONS:
+        # Memory-mapped; tiles are read and converted one window at a time
+        return read_image(image_path, raw_shape=raw_shape), None
+
+    image = read_image(image_path, decode)
+    gray = to_gray(image)
+    # The color planes are dropped after this, so their histograms are taken now
+    return gray, compute_histograms(image, gray) if histograms else None
+
+def _read_window(source, x0, y0, x1, y1):
+    window = np.ascontiguousarray(source[y0:y1, x0:x1])
+    if window.ndim == 3:
+        window = cv2.cvtColor(window, cv2.COLOR_BGR2GRAY)
+    return window
+
+def _edges_in_region(source, region, overlap):
+    height, width = source.shape[:2]
+    x0, y0, x1, y1 = region
+
+    wx0, wy0 = max(x0 - overlap, 0), max(y0 - overlap, 0)
+    wx1, wy1 = min(x1 + overlap, width), min(y1 + overlap, height)
+
+    edges = detect_edges(_read_window(source, wx0, wy0, wx1, wy1))
+    return edges[y0 - wy0:y1 - wy0, x0 - wx0:x1 - wx0]
+
+def _top_level_contours(edges, offset):
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+    return list(contours)
+
+def _touches_border(bbox, region, image_size):
+    x, y, w, h = bbox
+    x0, y0, x1, y1 = region
+    width, height = image_size
+
+    return (
+        (x <= x0 and x0 > 0) or
+        (y <= y0 and y0 > 0) or
+        (x + w >= x1 and x1 < width) or
+        (y + h >= y1 and y1 < height)
+    )
+
+def _touching_components(boxes):
+    # Sweep in x0 order; only boxes whose x range still reaches the sweep line can touch the next one
+    parent = list(range(len(boxes)))
+
+    def find(idx):
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    active = []
+    for idx in sorted(range(len(boxes)), key=lambda i: boxes[i][0]):
+        x0, y0, x1, y1 = boxes[idx]
+        active = [j for j in active if boxes[j][2] >= x0]
+        for j in active:
+            if boxes[j][1] <= y1 and y0 <= boxes[j][3]:
+                parent[find(j)] = find(idx)
+        active.append(idx)
+
+    return [find(idx) for idx in range(len(boxes))]
+
+def _merge_regions(boxes):
+    # Union of boxes that touch or overlap. One sweep joins every chain of touching boxes,
+    # but a merged bounding box can reach boxes that none of its members touched, so the
+    # sweep repeats on the merged boxes until they are apart. Each repeat has fewer boxes;
+    # scattered candidates settle in one or two passes, while a staircase of n boxes whose
+    # merges keep uncovering the next step can take O(n) passes, O(n²) in total
+    boxes = [tuple(b) for b in boxes]
+
+    while True:
+        merged = {}
+        for box, root in zip(boxes, _touching_components(boxes)):
+            other = merged.get(root, box)
+            merged[root] = (
+                min(other[0], box[0]), min(other[1], box[1]), max(other[2], box[2]), max(other[3], box[3])
+            )
+        if len(merged) == len(boxes):
+            return sorted(boxes, key=lambda b: (b[1], b[0]))
+        boxes = list(merged.values())
+
+def _owned_by_tile(bbox, tile_size, image_size):
+    x, y, w, h = bbox
+    width, height = image_size
+    tx0, ty0 = (x // tile_size) * tile_size, (y // tile_size) * tile_size
+    region = (tx0, ty0, min(tx0 + tile_size, width), min(ty0 + tile_size, height))
+
+    return (
+        x + w <= region[2] and y + h <= region[3] and
+        not _touches_border(bbox, region, image_size)
+    )
+
+def _nested_mask(contours, outer):
+    nested = np.zeros(len(contours), dtype=bool)
+    if not outer:
+        return nested
+
+    outer_boxes = np.array([cv2.boundingRect(c) for c in outer])
+    ox0, oy0 = outer_boxes[:, 0], outer_boxes[:, 1]
+    ox1, oy1 = ox0 + outer_boxes[:, 2], oy0 + outer_boxes[:, 3]
+
+    for idx, contour in enumerate(contours):
+        x, y, w, h = cv2.boundingRect(contour)
+        inside = np.flatnonzero(
+            (ox0 <= x) & (oy0 <= y) & (ox1 >= x + w) & (oy1 >= y + h) &
+            ((ox1 - ox0) * (oy1 - oy0) > w * h)
+        )
+
+        point = tuple(float(v) for v in contour[0][0])
+        nested[idx] = any(cv2.pointPolygonTest(outer[i], point, False) > 0 for i in inside)
+
+    return nested
+
+def find_contours_tiled(source, tile_size=2048, overlap=TILE_OVERLAP, min_area=MIN_CONTOUR_AREA,
+                        count=_ignore_count):
+    height, width = source.shape[:2]
+    image_size = (width, height)
+
+    contours = []
+    seam_boxes = []
+
+    for ty in range(0, height, tile_size):
+        for tx in range(0, width, tile_size):
+            region = (tx, ty, min(tx + tile_size, width), min(ty + tile_size, height))
+            edges = _edges_in_region(source, region, overlap)
+
+            for contour in _top_level_contours(edges, (tx, ty)):
+                bbox = cv2.boundingRect(contour)
+                if _touches_border(bbox, region, image_size):
+                    x, y, w, h = bbox
+                    seam_boxes.append((x, y, x + w, y + h))
+                else:
+                    contours.append(contour)
+
+    stitched = []
+    seen = set()
+    for region in _merge_regions(seam_boxes):
+        # Grow the window until no stitched contour is cut by its border
+        x0, y0, x1, y1 = region
+        while True:
+            x0, y0 = max(x0 - 2, 0), max(y0 - 2, 0)
+            x1, y1 = min(x1 + 2, width), min(y1 + 2, height)
+
+            edges = _edges_in_region(source, (x0, y0, x1, y1), overlap)
+            pieces = [
+                c for c in _top_level_contours(edges, (x0, y0))
+                if not _owned_by_tile(cv2.boundingRect(c), tile_size, image_size)
+            ]
+            cut = [
+                cv2.boundingRect(c) for c in pieces
+                if _touches_border(cv2.boundingRect(c), (x0, y0, x1, y1), image_size)
+            ]
+            if not cut:
+                break
+
+            x0 = min([x0] + [x for x, _, _, _ in cut])
+            y0 = min([y0] + [y for _, y, _, _ in cut])
+            x1 = max([x1] + [x + w for x, _, w, _ in cut])
+            y1 = max([y1] + [y + h for _, y, _, h in cut])
+
+        for contour in pieces:
+            key = (cv2.boundingRect(contour), len(contour))
+            if key not in seen:
+                seen.add(key)
+                stitched.append(contour)
+
+    candidates = contours + stitched
+    areas = np.array([cv2.contourArea(c) for c in candidates])
+    keep = areas > min_area
+
+    # A seam-crossing object can enclose contours that looked top-level inside one tile
+    outer = [c for c, k in zip(stitched, keep[len(contours):]) if k]
+    keep &= ~_nested_mask(candidates, outer)
+
+    count('contours_found', len(candidates))
+    count('contours_kept', int(keep.sum()))
+    order = sorted(np.flatnonzero(keep), key=lambda i: cv2.boundingRect(candidates[i])[1::-1])
+    return PackedContours.pack([candidates[i] for i in order]), areas[order]
+
+class TiledShapeDetector(ShapeDetector):
+    TITLE = "SHAPE SIMILARITY DETECTION (TILED)"
+    # Full-size renderings would need the whole color image in memory
+    OUTPUTS = TILED_OUTPUTS
+
+    def __init__(self, image_path, output_dir=ANALYZE_DIR, outputs=None, tile_size=2048, **options):
+        if options.get('engine', 'canny') != 'canny':
+            raise ValueError("Tiled detection only supports the canny engine")
+        if options.get('reduce', 1) != 1 or options.get('image') is not None:
+            raise ValueError("Tiled detection reads the source itself and cannot use a reduced or decoded image")
+        if tile_size < TILE_OVERLAP:
+            raise ValueError(f"Tile size must be at least the {TILE_OVERLAP} pixel overlap")
+
+        self.source = None
+        self.source_hist = None
+        self.tile_size = tile_size
+        super().__init__(image_path, output_dir, self.default_outputs() if outputs is None else outputs, **options)
+
+    def load_image(self):
+        if self.source is None:
+            self.source, self.source_hist = load_gray_source(
+                self.image_path, bool(self.outputs & {'histograms', 'histogram_data'}), self.decode, self.raw_shape
+            )
+            self.height, self.width = self.source.shape[:2]
+
+        return self.source
+
+    def detection_params(self):
+        params = super().detection_params()
+        params.update(detector='tiled', tile_size=self.tile_size, overlap=TILE_OVERLAP)
+        return params
+
+    def pixel_histograms(self, gray=None):
+        self.load_image()
+        if self.source_hist is not None:
+            return self.source_hist
+
+        # Memory-mapped sources are read strip by strip; counts of the strips add up exactly
+        return merge_histograms(
+            compute_histograms(np.ascontiguousarray(self.source[ty:ty + self.tile_size]))
+            for ty in range(0, self.height, self.tile_size)
+        )
+
+    def gray_image(self):
+        # Histograms read the source strip by strip, so no full gray plane is built
+        return None
+
+    def preprocess_image(self):
+        # Edges are produced tile by tile inside find_contours
+        return None, None
+
+    def find_contours(self, edges=None):
+        return find_contours_tiled(self.load_image(), self.tile_size, count=self._count)
+
+    def _print_settings(self):
+        print(f"Tile size: {self.tile_size}, overlap: {TILE_OVERLAP}")
@@ -0,0 +1,63 @@
+import cv2
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# None keeps OpenCV's own PNG settings; 0-9 trades file size for encoding time
+PNG_COMPRESSION = None
+WRITER_THREADS = 2
+WRITE_QUEUE_DEPTH = 4
+
+class ImageWriter:
+    def __init__(self, png_compression=PNG_COMPRESSION):
+        self.png_compression = png_compression
+
+    def write_image(self, path, image):
+        params = [] if self.png_compression is None else [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        if not cv2.imwrite(str(path), image, params):
+            raise ValueError(f"Cannot write image: {path}")
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+class AsyncImageWriter(ImageWriter):
+    def __init__(self, png_compression=PNG_COMPRESSION, threads=WRITER_THREADS, queue_depth=WRITE_QUEUE_DEPTH):
+        super().__init__(png_compression)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='writer')
+        # Analysis blocks here once queue_depth writes are pending, so memory stays bounded
+        self.slots = threading.BoundedSemaphore(queue_depth)
+        self.futures = []
+
+    def __getstate__(self):
+        raise TypeError("AsyncImageWriter cannot be sent to another process")
+
+    def submit(self, fn, *args):
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        self.futures.append(future)
+        return future
+
+    def write_image(self, path, image):
+        # cv2 releases the GIL while encoding, so this overlaps with the next analysis
+        return self.submit(super().write_image, path, image)
+
+    def collect(self):
+        futures, self.futures = self.futures, []
+        return futures
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Waits for the pending writes; the first failed one is raised unless the body failed
+        self.close()
+        if exc_type is None:
+            for future in self.collect():
+                future.result()
@@ -1,11 +1,93 @@
 import argparse
 from pathlib import Path
 
-from commands.commands import analyze_cmd, generate_cmd
+from commands.commands import analyze_cmd, bench_cmd, generate_cmd, sweep_cmd, query_cmd, stream_cmd, serve_cmd
+from analyze_image.grouping import GROUPING_METHODS, RATIO_GROUPING_METHODS
+from analyze_image.benchmark import BENCH_DENSITIES, BENCH_SIZES
+from analyze_image.metrics import METRICS_FORMATS
+from analyze_image.export import EXPORT_FORMATS
+from analyze_image.shape_detector import DETECTION_ENGINES
+from analyze_image.stream import STREAM_MAX_DISTANCE, STREAM_MAX_MISSED, STREAM_RATIO_TOLERANCE
+from analyze_image.batch import DECODE_THREADS, PREFETCH_DEPTH
+from analyze_image.tiling import TILE_OVERLAP
+from analyze_image.loader import DECODE_MODES, REDUCE_FACTORS, parse_raw_shape
+from analyze_image.writer import WRITER_THREADS, WRITE_QUEUE_DEPTH
+from analyze_image.service import SERVE_HOST, SERVE_PORT, SERVE_QUEUE_SIZE, SERVE_TIMEOUT
+from config.constants import ANALYZE_OUTPUTS, CACHE_MAX_BYTES
+
+def parse_outputs(value: str) -> tuple[str, ...]:
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    if names == ["all"]:
+        return ANALYZE_OUTPUTS
+    if names == ["none"]:
+        return ()
+
+    unknown = [name for name in names if name not in ANALYZE_OUTPUTS]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown output(s): {', '.join(unknown)} "
+            f"(choose from: {', '.join(ANALYZE_OUTPUTS)}, all, none)"
+        )
+
+    return tuple(names)
+
+def parse_thresholds(value: str) -> list[float]:
+    try:
+        if ":" in value:
+            start, stop, step = (float(part) for part in value.split(":"))
+            if step <= 0 or stop < start:
+                raise ValueError
+            count = int((stop - start) / step + 1e-9) + 1
+            return [round(start + i * step, 10) for i in range(count)]
+
+        return sorted(float(part) for part in value.split(",") if part.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid thresholds: {value} (use start:stop:step or a comma-separated list)"
+        )
+
+def parse_int_list(value: str) -> list[int]:
+    try:
+        values = [int(part) for part in value.split(",") if part.strip()]
+        if not values or min(values) <= 0:
+            raise ValueError
+        return values
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid list: {value} (use comma-separated positive integers)")
+
+def parse_positive_int(value: str) -> int:
+    try:
+        number = int(value)
+        if number <= 0:
+            raise ValueError
+        return number
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid value: {value} (use a positive integer)")
+
+def parse_tile_size(value: str) -> int:
+    tile_size = parse_positive_int(value)
+    # Smaller tiles would be mostly overlap and put nearly every object on a seam
+    if tile_size < TILE_OVERLAP:
+        raise argparse.ArgumentTypeError(f"invalid tile size: {value} (use at least {TILE_OVERLAP} pixels)")
+    return tile_size
+
+def parse_shape(value: str) -> tuple[int, ...]:
+    try:
+        return parse_raw_shape(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Tool for analyzing images and generating sample images.",
+        fromfile_prefix_chars="@",
+    )
+
+    common_parser = argparse.ArgumentParser(add_help=False)
+    common_parser.add_argument(
+        "--no-interactive",
+        action="store_true",
+        help="Exit when done instead of waiting for Enter.",
     )
 
     subparsers = parser.add_subparsers(
@@ -18,12 +100,18 @@ def build_parser() -> argparse.ArgumentParser:
     analyze_parser = subparsers.add_parser(
         "analyze",
         help="Analyze an existing image file.",
+        parents=[common_parser],
         description="Analyze an existing image file and optionally write a report.",
     )
     analyze_parser.add_argument(
         "-i", "--input",
         type=Path,
-        help="Path to the input image file.",
+        nargs="+",
+        required=True,
+        help=(
+            "Input image files, directories or glob patterns. "
+            "Use @list.txt to read paths from a file, one per line."
+        ),
     )
     analyze_parser.add_argument(
         "--threshold",
@@ -31,12 +119,548 @@ def build_parser() -> argparse.ArgumentParser:
         default=1.0,
         help="Threshold for creating groups.",
     )
+    analyze_parser.add_argument(
+        "--grouping",
+        choices=GROUPING_METHODS,
+        default="running-mean",
+        help=(
+            "Grouping algorithm for P²/A ratios: running-mean (greedy, default), "
+            "gap (split where neighbouring ratios differ by more than the threshold), "
+            "kseg (optimal 1D k-segmentation), density (1D DBSCAN with eps = threshold) or "
+            "descriptor (link shapes whose standardized multi-descriptor signatures lie within "
+            "the threshold of each other)."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--groups",
+        type=int,
+        default=None,
+        help="Number of groups for --grouping kseg (default: as many as running-mean finds).",
+    )
+    analyze_parser.add_argument(
+        "--min-samples",
+        type=int,
+        default=3,
+        help="Minimum neighbours of a core shape for --grouping density (default: 3).",
+    )
+    analyze_parser.add_argument(
+        "--neighbours",
+        type=int,
+        default=16,
+        help="Nearest neighbours searched per shape for --grouping descriptor (default: 16).",
+    )
+    analyze_parser.add_argument(
+        "--scale-sample",
+        type=int,
+        default=None,
+        help="Estimate the median pairwise scale of each group from this many sampled pairs.",
+    )
+    analyze_parser.add_argument(
+        "--outputs",
+        type=parse_outputs,
+        default=None,
+        help=(
+            "Comma-separated list of outputs to produce, e.g. groups,table,result_image "
+            f"(choose from: {', '.join(ANALYZE_OUTPUTS)}, all, none; default: every output the "
+            "mode supports except labels and histogram_data)."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--format",
+        choices=EXPORT_FORMATS,
+        default="text",
+        help=(
+            "Format of the table output: text writes the human-readable results_table.txt "
+            "(default); jsonl, csv and npz write one record per object (index, group, ratio, "
+            "area, perimeter, bounding box) to results.jsonl, results.csv or results.npz."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--export-contours",
+        action="store_true",
+        help="Include each object's contour points in jsonl, csv and npz results.",
+    )
+    analyze_parser.add_argument(
+        "--workers",
+        type=parse_positive_int,
+        default=None,
+        help="Number of worker processes for batch analysis (default: CPU count).",
+    )
+    analyze_parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help=(
+            "Analyze a batch in one process while thread pools decode the next images and "
+            "encode and write the outputs of the previous ones."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=PREFETCH_DEPTH,
+        help=f"Images decoded ahead of the analysis with --pipeline (default: {PREFETCH_DEPTH}).",
+    )
+    analyze_parser.add_argument(
+        "--decode-threads",
+        type=int,
+        default=DECODE_THREADS,
+        help=f"Decode threads with --pipeline (default: {DECODE_THREADS}).",
+    )
+    analyze_parser.add_argument(
+        "--write-queue",
+        type=int,
+        default=WRITE_QUEUE_DEPTH,
+        help=(
+            "Output writes that may wait for a writer thread before the analysis pauses "
+            f"(default: {WRITE_QUEUE_DEPTH}); process-pool batches keep one queue per image."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--write-threads",
+        type=int,
+        default=WRITER_THREADS,
+        help=f"Threads encoding and writing outputs (default: {WRITER_THREADS}).",
+    )
+    analyze_parser.add_argument(
+        "--render-size",
+        type=parse_positive_int,
+        default=None,
+        metavar="PX",
+        help=(
+            "Write result_image.png, labels.png and edges.png downscaled so that their longer "
+            "side is at most PX pixels; rendering then costs the same for any input size "
+            "(default: full resolution)."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--render-tiles",
+        type=parse_positive_int,
+        default=None,
+        metavar="PX",
+        help=(
+            "Write the full-resolution result image as PX x PX tiles in result_tiles/ "
+            "instead of one result_image.png."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--png-compression",
+        type=int,
+        choices=range(10),
+        default=None,
+        metavar="0-9",
+        help=(
+            "zlib level for result_image.png and edges.png: 0 writes fastest, 9 smallest "
+            "(default: OpenCV's setting)."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--tile-size",
+        type=parse_tile_size,
+        default=None,
+        help=(
+            "Analyze large images in overlapping square tiles of this size in pixels, "
+            f"at least {TILE_OVERLAP}, to bound memory use (default: whole image in memory). "
+            "Raw .npy inputs are memory-mapped in this mode. Only the groups, table and "
+            "histogram outputs are supported."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--engine",
+        choices=DETECTION_ENGINES,
+        default="canny",
+        help=(
+            "Object detection engine: canny (blur, Canny edges and a morphological close; "
+            "default) or components (threshold the difference to the background color and "
+            "trace the connected components; faster for flat-colored objects on a plain "
+            "background, such as generated images)."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--pyramid",
+        type=int,
+        default=None,
+        metavar="LEVELS",
+        help=(
+            "Find candidate regions on an image downscaled LEVELS times by 2 and run the "
+            "full-resolution edge pipeline only inside padded regions around them. Faster on "
+            "large images with sparse objects (default: full image)."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--decode",
+        choices=DECODE_MODES,
+        default="color",
+        help=(
+            "Decode the input as color (default) or directly as grayscale. Grayscale decoding "
+            "skips the color planes and the conversion and is much faster for JPEG; pixels may "
+            "differ slightly from a color decode, and histograms then only cover gray."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--reduce",
+        type=int,
+        choices=REDUCE_FACTORS,
+        default=1,
+        help=(
+            "Decode the input downscaled by this factor and report contours, areas and "
+            "perimeters in full-resolution pixels. JPEG decodes at the reduced size; small "
+            "objects may be lost. Only the groups, table and ratio_histogram outputs are "
+            "supported (default: 1)."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--raw-shape",
+        type=parse_shape,
+        default=None,
+        metavar="HxW[x3]",
+        help=(
+            "Shape of headerless 8-bit .raw/.bin inputs: HEIGHTxWIDTH for gray frames, "
+            "HEIGHTxWIDTHx3 for BGR frames. Raw and .npy inputs are memory-mapped, not read."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the analysis cache.",
+    )
+    analyze_parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=CACHE_MAX_BYTES // (1024 * 1024),
+        help=(
+            "Maximum size of the analysis cache in MB; least recently used entries are evicted "
+            f"(default: {CACHE_MAX_BYTES // (1024 * 1024)})."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--index",
+        action="store_true",
+        help=(
+            "Record the analyzed shapes in the persistent shape index used by query; this also "
+            "measures the multi-descriptor signature of every shape."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--metrics",
+        choices=METRICS_FORMATS,
+        default=None,
+        help=(
+            "Record stage durations, contour and group counts and memory figures for every "
+            "image: jsonl appends one JSON line per run to metrics.jsonl, prometheus writes "
+            "metrics.prom in the Prometheus text format."
+        ),
+    )
+    analyze_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Run the analysis under cProfile and save profile.prof next to the metrics.",
+    )
+    analyze_parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Track Python/NumPy allocations per stage with tracemalloc (slower).",
+    )
     analyze_parser.set_defaults(func=analyze_cmd)
 
+    # --- subcommand: sweep ---
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        help="Compare grouping results across many thresholds.",
+        description=(
+            "Extract shapes from an image once and report group counts and statistics "
+            "for every threshold."
+        ),
+        parents=[common_parser],
+    )
+    sweep_parser.add_argument(
+        "-i", "--input",
+        type=Path,
+        required=True,
+        help="Path to the input image file.",
+    )
+    sweep_parser.add_argument(
+        "--thresholds",
+        type=parse_thresholds,
+        default=parse_thresholds("0.25:3:0.25"),
+        help="Thresholds as start:stop:step or a comma-separated list (default: 0.25:3:0.25).",
+    )
+    sweep_parser.add_argument(
+        "--grouping",
+        choices=RATIO_GROUPING_METHODS,
+        default="running-mean",
+        help=(
+            "Grouping algorithm for P²/A ratios (see analyze --help). Only gap covers every "
+            "threshold in one pass; running-mean and density regroup once per threshold."
+        ),
+    )
+    sweep_parser.add_argument(
+        "--groups",
+        type=int,
+        default=None,
+        help="Number of groups for --grouping kseg.",
+    )
+    sweep_parser.add_argument(
+        "--min-samples",
+        type=int,
+        default=3,
+        help="Minimum neighbours of a core shape for --grouping density (default: 3).",
+    )
+    sweep_parser.add_argument(
+        "--tile-size",
+        type=parse_tile_size,
+        default=None,
+        help="Extract contours in overlapping tiles of this size (see analyze --help).",
+    )
+    sweep_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the analysis cache.",
+    )
+    sweep_parser.set_defaults(func=sweep_cmd)
+
+    # --- subcommand: stream ---
+    stream_parser = subparsers.add_parser(
+        "stream",
+        help="Analyze a video file or camera feed frame by frame.",
+        description=(
+            "Detect shapes in every frame of a video or camera feed, track them across frames "
+            "and update similarity groups incrementally. No plots are produced."
+        ),
+        parents=[common_parser],
+    )
+    stream_parser.add_argument(
+        "-i", "--input",
+        required=True,
+        help="Video file, stream URL or camera index (e.g. 0).",
+    )
+    stream_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.0,
+        help="Threshold for creating groups.",
+    )
+    stream_parser.add_argument(
+        "--max-frames",
+        type=int,
+        default=None,
+        help="Stop after this many frames (default: until the stream ends).",
+    )
+    stream_parser.add_argument(
+        "--max-distance",
+        type=float,
+        default=STREAM_MAX_DISTANCE,
+        help=(
+            "Largest centroid movement in pixels between frames for a shape to keep its track "
+            f"(default: {STREAM_MAX_DISTANCE:g})."
+        ),
+    )
+    stream_parser.add_argument(
+        "--ratio-tolerance",
+        type=float,
+        default=STREAM_RATIO_TOLERANCE,
+        help=(
+            "Largest relative P²/A change between frames for a shape to keep its track "
+            f"(default: {STREAM_RATIO_TOLERANCE:g})."
+        ),
+    )
+    stream_parser.add_argument(
+        "--max-missed",
+        type=int,
+        default=STREAM_MAX_MISSED,
+        help=(
+            "Frames a track survives without a matching shape before it leaves its group "
+            f"(default: {STREAM_MAX_MISSED})."
+        ),
+    )
+    stream_parser.set_defaults(func=stream_cmd)
+
+    # --- subcommand: serve ---
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Run a local analysis service with warm worker processes.",
+        description=(
+            "Keep a pool of worker processes with OpenCV and NumPy loaded and analyze images "
+            "sent over a local HTTP or Unix-socket API. POST /analyze accepts raw image bytes "
+            "(parameters in the query string, e.g. ?threshold=1.0) or JSON with a \"path\" "
+            "field; GET /health reports the queue state."
+        ),
+        parents=[common_parser],
+    )
+    serve_parser.add_argument(
+        "--host",
+        default=SERVE_HOST,
+        help=f"Address to listen on (default: {SERVE_HOST}).",
+    )
+    serve_parser.add_argument(
+        "--port",
+        type=int,
+        default=SERVE_PORT,
+        help=f"TCP port to listen on (default: {SERVE_PORT}).",
+    )
+    serve_parser.add_argument(
+        "--socket",
+        type=Path,
+        default=None,
+        help="Listen on this Unix socket instead of TCP.",
+    )
+    serve_parser.add_argument(
+        "--workers",
+        type=parse_positive_int,
+        default=None,
+        help="Number of worker processes (default: CPU count).",
+    )
+    serve_parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=SERVE_QUEUE_SIZE,
+        help=(
+            "Jobs allowed to wait for a free worker; further requests get HTTP 503 "
+            f"(default: {SERVE_QUEUE_SIZE})."
+        ),
+    )
+    serve_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=SERVE_TIMEOUT,
+        help=f"Seconds to wait for a job before answering HTTP 504 (default: {SERVE_TIMEOUT:g}).",
+    )
+    serve_parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Log every request.",
+    )
+    serve_parser.set_defaults(func=serve_cmd)
+
+    # --- subcommand: query ---
+    query_parser = subparsers.add_parser(
+        "query",
+        help="Find the most similar shapes across all indexed images.",
+        description=(
+            "Look up the k shapes with the closest P²/A ratio in the persistent shape index "
+            "built by analyze --index."
+        ),
+        parents=[common_parser],
+    )
+    query_target = query_parser.add_mutually_exclusive_group(required=True)
+    query_target.add_argument(
+        "--ratio",
+        type=float,
+        nargs="+",
+        help="P²/A ratio(s) to search for.",
+    )
+    query_target.add_argument(
+        "--image",
+        type=Path,
+        help="Image of an indexed shape to search around (use with --object).",
+    )
+    query_parser.add_argument(
+        "--object",
+        type=int,
+        default=None,
+        help="Object index of the shape within --image, as listed in results_table.txt.",
+    )
+    query_parser.add_argument(
+        "--match",
+        choices=("ratio", "descriptor"),
+        default="ratio",
+        help=(
+            "Similarity used for --image: ratio (closest P²/A, default) or descriptor "
+            "(closest multi-descriptor signature: Hu moments, solidity, convexity, extent, vertices)."
+        ),
+    )
+    query_parser.add_argument(
+        "-k",
+        type=int,
+        default=10,
+        help="Number of similar shapes to return (default: 10).",
+    )
+    query_parser.set_defaults(func=query_cmd)
+
+    # --- subcommand: bench ---
+    bench_parser = subparsers.add_parser(
+        "bench",
+        help="Benchmark the detection pipeline stage by stage.",
+        description=(
+            "Generate synthetic images across a matrix of sizes and object densities, time "
+            "every ShapeDetector stage and record peak memory. Results are saved as JSON "
+            "and can be compared against an earlier run."
+        ),
+        parents=[common_parser],
+    )
+    bench_parser.add_argument(
+        "--sizes",
+        type=parse_int_list,
+        default=list(BENCH_SIZES),
+        help=f"Comma-separated square image sizes (default: {','.join(map(str, BENCH_SIZES))}).",
+    )
+    bench_parser.add_argument(
+        "--densities",
+        type=parse_int_list,
+        default=list(BENCH_DENSITIES),
+        help=(
+            "Comma-separated object counts per 512x512 area "
+            f"(default: {','.join(map(str, BENCH_DENSITIES))})."
+        ),
+    )
+    bench_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Runs per case; the best time of every stage is kept (default: 3).",
+    )
+    bench_parser.add_argument(
+        "--engine",
+        choices=DETECTION_ENGINES,
+        default="canny",
+        help="Detection engine to benchmark (see analyze --help; default: canny).",
+    )
+    bench_parser.add_argument(
+        "--pyramid",
+        type=int,
+        default=None,
+        metavar="LEVELS",
+        help=(
+            "Benchmark the coarse-to-fine detector (see analyze --pyramid) and check its "
+            "P²/A ratios against the full-resolution path."
+        ),
+    )
+    bench_parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed for the generated images (default: 0).",
+    )
+    bench_parser.add_argument(
+        "-o", "--output",
+        type=Path,
+        default=None,
+        help="Path of the results JSON file (default: outputs/bench/bench_<timestamp>.json).",
+    )
+    bench_parser.add_argument(
+        "--compare",
+        type=Path,
+        default=None,
+        help="Baseline results JSON file to compare against.",
+    )
+    bench_parser.add_argument(
+        "--results",
+        type=Path,
+        default=None,
+        help="Compare this existing results file with --compare instead of running the benchmark.",
+    )
+    bench_parser.add_argument(
+        "--regression",
+        type=float,
+        default=0.1,
+        help="Relative slowdown reported as a regression, e.g. 0.1 for 10%% (default: 0.1).",
+    )
+    bench_parser.set_defaults(func=bench_cmd)
+
     # --- subcommand: generate ---
     generate_parser = subparsers.add_parser(
         "generate",
         help="Generate a sample image.",
+        parents=[common_parser],
         description="Generate a sample image using predefined presets.",
     )
     generate_parser.add_argument(
@@ -75,6 +699,56 @@ def build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Random seed for reproducible results (default: none).",
     )
+    generate_parser.add_argument(
+        "--count",
+        type=int,
+        default=None,
+        help=(
+            "Generate a dataset of this many images with ground-truth annotations instead of "
+            "a single image. The dataset is written to a directory named after --output."
+        ),
+    )
+    generate_parser.add_argument(
+        "--workers",
+        type=parse_positive_int,
+        default=None,
+        help="Number of worker processes for --count (default: CPU count).",
+    )
+    generate_parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=256,
+        help="Images per annotation shard for --count (default: 256).",
+    )
+    generate_parser.add_argument(
+        "--frames",
+        type=int,
+        default=None,
+        help=(
+            "Generate a video of this many frames panning across a wide scene instead of "
+            "a single image. The video is written as MJPG with the .avi suffix."
+        ),
+    )
+    generate_parser.add_argument(
+        "--speed",
+        type=int,
+        default=4,
+        help="Pan speed of --frames in pixels per frame (default: 4).",
+    )
+    generate_parser.add_argument(
+        "--fps",
+        type=int,
+        default=30,
+        help="Frame rate of --frames (default: 30).",
+    )
+    generate_parser.add_argument(
+        "--sample-free",
+        action="store_true",
+        help=(
+            "Draw candidate positions only from still-free areas of the image instead of "
+            "uniformly at random. Use for dense layouts with many objects."
+        ),
+    )
     generate_parser.add_argument(
         "-o", "--output",
         type=Path,
@@ -1,12 +1,251 @@
-from generate_image.generate_image import generate_image
+from generate_image.generate_image import generate_image, generate_video
+from generate_image.dataset import generate_dataset
 from analyze_image.shape_detector import ShapeDetector
+from analyze_image.tiling import TiledShapeDetector
+from analyze_image.pyramid import PyramidShapeDetector
+from analyze_image.batch import collect_images, create_detector, analyze_batch, analyze_pipelined
+from analyze_image.loader import RAW_EXTENSIONS
+from analyze_image.writer import AsyncImageWriter
+from analyze_image.cache import AnalysisCache
+from analyze_image.sweep import sweep_image
+from analyze_image.shape_index import ShapeIndex
+from analyze_image.metrics import PipelineMetrics
+from analyze_image.stream import ShapeTracker, StreamAnalyzer, open_capture
+from analyze_image.service import serve
+from analyze_image.benchmark import (
+  compare_results, load_results, print_comparison, run_benchmarks, save_results
+)
+from config.constants import BENCH_DIR, GENERATE_DIR
+import os
+import time
 import argparse
 
+def _grouping_options(args: argparse.Namespace) -> dict:
+  if args.grouping == "kseg":
+    return {"n_groups": args.groups}
+  if args.grouping == "density":
+    return {"min_samples": args.min_samples}
+  if args.grouping == "descriptor":
+    return {"neighbours": args.neighbours}
+  return {}
+
 def analyze_cmd(args: argparse.Namespace):
-  detector = ShapeDetector(args.input)
-  detector.process(args.threshold)
+  images = collect_images(args.input)
+  if not images:
+    raise SystemExit(f"No images found for input: {' '.join(map(str, args.input))}")
+
+  grouping_options = _grouping_options(args)
+  if args.tile_size and args.pyramid:
+    raise SystemExit("--tile-size and --pyramid cannot be combined")
+  if args.engine != "canny" and (args.tile_size or args.pyramid):
+    raise SystemExit("--tile-size and --pyramid only support --engine canny")
+  if args.pipeline and args.tile_size:
+    raise SystemExit("--pipeline cannot be combined with --tile-size")
+  if args.pipeline and args.workers:
+    raise SystemExit("--pipeline analyzes in one process and cannot be combined with --workers")
+  if args.render_size and args.render_tiles:
+    raise SystemExit("--render-size and --render-tiles cannot be combined")
+  if args.raw_shape is None and any(os.path.splitext(path)[1].lower() in RAW_EXTENSIONS for path in images):
+    raise SystemExit("Raw .raw/.bin inputs need --raw-shape")
+  if args.reduce > 1 and args.tile_size:
+    raise SystemExit("--reduce cannot be combined with --tile-size")
+
+  if args.tile_size:
+    detector_class = TiledShapeDetector
+  elif args.pyramid:
+    detector_class = PyramidShapeDetector
+  else:
+    detector_class = ShapeDetector
+  supported = detector_class.supported_outputs(args.reduce)
+  outputs = detector_class.default_outputs(args.reduce) if args.outputs is None else args.outputs
+  unsupported = [name for name in outputs if name not in supported]
+  if unsupported:
+    raise SystemExit(
+      f"{'--tile-size' if args.tile_size else '--reduce'} cannot produce: {', '.join(unsupported)} "
+      f"(supported: {', '.join(supported)})"
+    )
+  if min(args.prefetch, args.decode_threads, args.write_queue, args.write_threads) < 1:
+    raise SystemExit("--prefetch, --decode-threads, --write-queue and --write-threads must be at least 1")
+
+  cache = None
+  if not args.no_cache:
+    cache = AnalysisCache(max_bytes=args.cache_size * 1024 * 1024)
+
+  index = ShapeIndex() if args.index else None
+
+  metrics = None
+  if args.metrics or args.profile or args.trace_memory:
+    metrics = PipelineMetrics(args.metrics or "jsonl", args.trace_memory, args.profile)
+
+  detector_options = dict(
+    outputs=outputs, cache=cache, index=index, metrics=metrics, export_format=args.format,
+    export_contours=args.export_contours, engine=args.engine, render_size=args.render_size,
+    render_tiles=args.render_tiles, decode=args.decode, reduce=args.reduce, raw_shape=args.raw_shape,
+    tile_size=args.tile_size, pyramid_levels=args.pyramid,
+  )
+
+  if images == [str(args.input[0])]:
+    # Outputs are encoded on writer threads while the rest of the analysis runs
+    with AsyncImageWriter(args.png_compression, args.write_threads, args.write_queue) as writer:
+      detector = create_detector(images[0], writer=writer, **detector_options)
+      detector.process(args.threshold, args.grouping, args.scale_sample, **grouping_options)
+  elif args.pipeline:
+    analyze_pipelined(
+      images, args.threshold,
+      grouping=args.grouping,
+      grouping_options=grouping_options,
+      scale_sample=args.scale_sample,
+      png_compression=args.png_compression,
+      prefetch=args.prefetch,
+      decode_threads=args.decode_threads,
+      write_threads=args.write_threads,
+      write_queue=args.write_queue,
+      detector_options=detector_options,
+    )
+  else:
+    analyze_batch(
+      images, args.threshold, args.workers,
+      grouping=args.grouping,
+      grouping_options=grouping_options,
+      scale_sample=args.scale_sample,
+      png_compression=args.png_compression,
+      write_threads=args.write_threads,
+      write_queue=args.write_queue,
+      detector_options=detector_options,
+    )
+
+def sweep_cmd(args: argparse.Namespace):
+  cache = None if args.no_cache else AnalysisCache()
+  outputs = ("table",)
+
+  if args.tile_size:
+    detector = TiledShapeDetector(str(args.input), outputs=outputs, tile_size=args.tile_size, cache=cache)
+  else:
+    detector = ShapeDetector(str(args.input), outputs=outputs, cache=cache)
+
+  sweep_image(detector, args.thresholds, args.grouping, **_grouping_options(args))
+
+def stream_cmd(args: argparse.Namespace):
+  try:
+    capture = open_capture(args.input)
+  except ValueError as e:
+    raise SystemExit(str(e))
+
+  tracker = ShapeTracker(args.threshold, args.max_distance, args.ratio_tolerance, args.max_missed)
+  StreamAnalyzer(args.input, tracker=tracker, max_frames=args.max_frames).run(capture)
+
+def serve_cmd(args: argparse.Namespace):
+  serve(args.host, args.port, args.socket, args.workers, args.queue_size, args.timeout, args.verbose)
+
+def query_cmd(args: argparse.Namespace):
+  index = ShapeIndex()
+  images, shapes = index.count()
+  print(f"Shape index: {shapes} shapes from {images} images")
+
+  if args.match == "descriptor":
+    if args.image is None or args.object is None:
+      raise SystemExit("--match descriptor requires --image and --object")
+    found = index.find_shape(args.image, args.object)
+    if found is None:
+      raise SystemExit(f"Object {args.object} of {args.image} is not in the shape index")
+    shape_id, ratio = found
+
+    index.descriptor_tree()
+    start = time.perf_counter()
+    shape_ids = index.nearest_descriptor(shape_id, args.k)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nNearest {len(shape_ids)} shapes by descriptor to object {args.object} (lookup: {elapsed * 1000:.3f} ms):")
+    for rank, shape in enumerate(index.fetch(shape_ids), start=1):
+      print(
+        f"  {rank:>3}. ratio={shape['ratio']:.2f} (query {ratio:.2f}), "
+        f"area={shape['area']:.0f}px², perimeter={shape['perimeter']:.1f}px, "
+        f"group {shape['group_index'] + 1}, object {shape['object_index']}, "
+        f"bbox=({shape['x']}, {shape['y']}, {shape['w']}, {shape['h']}) in {shape['path']}"
+      )
+    return
+
+  exclude_id = None
+  if args.image is not None:
+    if args.object is None:
+      raise SystemExit("--image requires --object")
+    found = index.find_shape(args.image, args.object)
+    if found is None:
+      raise SystemExit(f"Object {args.object} of {args.image} is not in the shape index")
+    exclude_id, ratio = found
+    targets = [ratio]
+  else:
+    targets = args.ratio
+
+  index.sorted_ratios()
+
+  for target in targets:
+    start = time.perf_counter()
+    shape_ids = index.nearest(target, args.k, exclude_id)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nNearest {len(shape_ids)} shapes to P²/A ratio {target:.2f} (lookup: {elapsed * 1000:.3f} ms):")
+    for rank, shape in enumerate(index.fetch(shape_ids), start=1):
+      print(
+        f"  {rank:>3}. ratio={shape['ratio']:.2f} (Δ {abs(shape['ratio'] - target):.3f}), "
+        f"area={shape['area']:.0f}px², perimeter={shape['perimeter']:.1f}px, "
+        f"group {shape['group_index'] + 1}, object {shape['object_index']}, "
+        f"bbox=({shape['x']}, {shape['y']}, {shape['w']}, {shape['h']}) in {shape['path']}"
+      )
+
+def bench_cmd(args: argparse.Namespace):
+  if args.results is not None:
+    if args.compare is None:
+      raise SystemExit("--results requires --compare")
+    results = load_results(args.results)
+  else:
+    if args.pyramid and args.engine != "canny":
+      raise SystemExit("--pyramid only supports --engine canny")
+    results = run_benchmarks(
+      args.sizes, args.densities, args.repeat, args.seed, pyramid_levels=args.pyramid, engine=args.engine
+    )
+    output = args.output or os.path.join(BENCH_DIR, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    save_results(results, str(output))
+
+  if args.compare is not None:
+    rows = compare_results(load_results(args.compare), results, args.regression)
+    print()
+    if print_comparison(rows, args.regression):
+      raise SystemExit(1)
 
 def generate_cmd(args: argparse.Namespace):
+  if args.count is not None:
+    generate_dataset(
+      args.count,
+      os.path.join(GENERATE_DIR, args.output.stem),
+      args.width,
+      args.height,
+      args.Nci,
+      args.Nsq,
+      args.Ntri,
+      args.seed,
+      args.workers,
+      args.shard_size,
+      args.sample_free,
+    )
+    return
+
+  if args.frames is not None:
+    generate_video(
+      args.width,
+      args.height,
+      args.output.with_suffix(".avi").name,
+      args.frames,
+      args.speed,
+      args.fps,
+      args.Nci,
+      args.Nsq,
+      args.Ntri,
+      args.seed,
+      args.sample_free,
+    )
+    return
+
   generate_image(
     args.width,
     args.height,
@@ -15,4 +254,5 @@ def generate_cmd(args: argparse.Namespace):
     args.Nsq,
     args.Ntri,
     args.seed,
+    args.sample_free,
   )
@@ -3,6 +3,33 @@ import os
 OUTPUTS_DIR="outputs"
 GENERATE_DIR=f"{OUTPUTS_DIR}/generate"
 ANALYZE_DIR=f"{OUTPUTS_DIR}/analyze"
+CACHE_DIR=f"{OUTPUTS_DIR}/cache"
+INDEX_DIR=f"{OUTPUTS_DIR}/index"
+BENCH_DIR=f"{OUTPUTS_DIR}/bench"
+
+CACHE_MAX_BYTES=512 * 1024 * 1024
+
+BLUR_KERNEL_SIZE=9
+CANNY_LOW_THRESHOLD=50
+CANNY_HIGH_THRESHOLD=120
+CLOSE_KERNEL_SIZE=3
+MIN_CONTOUR_AREA=300
+# Gray-level distance from the background above which a pixel belongs to an object
+FOREGROUND_THRESHOLD=16
+
+ANALYZE_OUTPUTS=(
+    "groups",
+    "table",
+    "result_image",
+    "labels",
+    "edges",
+    "histograms",
+    "histogram_data",
+    "ratio_histogram",
+    "visualization",
+)
+# Outputs written when --outputs is not given; the rest are opt-in
+DEFAULT_OUTPUTS=tuple(name for name in ANALYZE_OUTPUTS if name not in ("labels", "histogram_data"))
 
 os.makedirs(GENERATE_DIR, exist_ok=True)
 os.makedirs(ANALYZE_DIR, exist_ok=True)
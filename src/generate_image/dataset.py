@@ -0,0 +1,150 @@
+import cv2
+import json
+import numpy as np
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from generate_image.generate_image import render_shapes
+
+SHAPE_TYPES = ('circle', 'square', 'triangle')
+
+ANNOTATION_DTYPE = np.dtype([
+    ('image', np.int32),
+    ('type', np.int8),
+    ('cx', np.int32),
+    ('cy', np.int32),
+    ('size', np.int32),
+    ('angle', np.int16),
+    ('x1', np.int32),
+    ('y1', np.int32),
+    ('x2', np.int32),
+    ('y2', np.int32),
+])
+
+def image_seeds(seed, count):
+    # Each image gets its own seed, so any image can be regenerated without the others
+    sequence = np.random.SeedSequence(seed)
+    return sequence.entropy, sequence.generate_state(count, dtype=np.uint32)
+
+def annotation_array(rows, image_index):
+    annotations = np.zeros(len(rows), dtype=ANNOTATION_DTYPE)
+    if rows:
+        shape_types, *columns = zip(*rows)
+        annotations['image'] = image_index
+        annotations['type'] = [SHAPE_TYPES.index(t) for t in shape_types]
+        for name, column in zip(('cx', 'cy', 'size', 'angle', 'x1', 'y1', 'x2', 'y2'), columns):
+            annotations[name] = column
+    return annotations
+
+def generate_shard(shard_index, image_indices, seeds, output_dir, width, height,
+                   num_circles, num_squares, num_triangles, sample_free=False):
+    names = []
+    shard = []
+
+    for image_index, seed in zip(image_indices, seeds):
+        random.seed(int(seed))
+        np.random.seed(int(seed))
+
+        rows = []
+        image, _ = render_shapes(
+            width, height, num_circles, num_squares, num_triangles, sample_free, rows
+        )
+
+        name = f"{image_index:06d}.png"
+        cv2.imwrite(os.path.join(output_dir, 'images', name), image)
+        names.append(name)
+        shard.append(annotation_array(rows, image_index))
+
+    annotations = np.concatenate(shard) if shard else np.zeros(0, dtype=ANNOTATION_DTYPE)
+    shard_name = f"shard_{shard_index:05d}.npz"
+
+    path = os.path.join(output_dir, 'annotations', shard_name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            annotations=annotations,
+            images=np.array(names),
+            seeds=np.asarray(seeds, dtype=np.uint32),
+        )
+    os.replace(tmp_path, path)
+
+    return shard_name, len(names), len(annotations)
+
+def generate_dataset(count, output_dir, width=800, height=600, num_circles=5, num_squares=5,
+                     num_triangles=5, seed=None, workers=None, shard_size=256, sample_free=False):
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    os.makedirs(os.path.join(output_dir, 'images'), exist_ok=True)
+    os.makedirs(os.path.join(output_dir, 'annotations'), exist_ok=True)
+
+    base_seed, seeds = image_seeds(seed, count)
+    starts = range(0, count, shard_size)
+
+    print("=" * 60)
+    print("SYNTHETIC DATASET GENERATOR")
+    print("=" * 60)
+    print(f"Images: {count} ({width}x{height})")
+    print(f"Shards: {len(starts)} of up to {shard_size} images")
+    print(f"Workers: {workers}")
+    print(f"Seed: {base_seed}\n")
+
+    shards = [None] * len(starts)
+    total_objects = 0
+    done = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                generate_shard, shard_index, range(start, min(start + shard_size, count)),
+                seeds[start:start + shard_size], output_dir, width, height,
+                num_circles, num_squares, num_triangles, sample_free
+            ): shard_index
+            for shard_index, start in enumerate(starts)
+        }
+
+        for future in as_completed(futures):
+            shard_index = futures[future]
+            shard_name, images, objects = future.result()
+            shards[shard_index] = {'file': shard_name, 'images': images, 'objects': objects}
+            total_objects += objects
+            done += images
+            print(f"[{done}/{count}] {shard_name}: {images} images, {objects} objects")
+
+    manifest = {
+        'count': count,
+        'width': width,
+        'height': height,
+        'circles': num_circles,
+        'squares': num_squares,
+        'triangles': num_triangles,
+        'seed': base_seed,
+        'sample_free': sample_free,
+        'shape_types': list(SHAPE_TYPES),
+        'annotation_fields': list(ANNOTATION_DTYPE.names),
+        'shards': shards,
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    print("\n" + "=" * 60)
+    print("COMPLETED SUCCESSFULLY")
+    print(f"Generated {total_objects} objects in {count} images")
+    print(f"All outputs saved to: {output_dir}/")
+    print("=" * 60)
+
+    return manifest
+
+def load_annotations(dataset_dir):
+    with open(os.path.join(dataset_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    shards = []
+    for shard in manifest['shards']:
+        with np.load(os.path.join(dataset_dir, 'annotations', shard['file'])) as data:
+            shards.append(data['annotations'])
+
+    if not shards:
+        return np.zeros(0, dtype=ANNOTATION_DTYPE)
+    return np.concatenate(shards)
@@ -2,32 +2,26 @@ import cv2
 import numpy as np
 import random
 import os
+from generate_image.placement import PlacementGrid
 from config.constants import GENERATE_DIR
 
-def generate_random_color():
-    return (random.randint(50, 255), random.randint(50, 255), random.randint(50, 255))
-
-def check_collision(occupied_areas, new_bbox, margin=10):
-    x1_new, y1_new, x2_new, y2_new = new_bbox
-
-    x1_new -= margin
-    y1_new -= margin
-    x2_new += margin
-    y2_new += margin
-
-    for (x1, y1, x2, y2) in occupied_areas:
-        if not (x2_new < x1 or x1_new > x2 or y2_new < y1 or y1_new > y2):
-            return True
-
-    return False
-
 def find_free_position(
     occupied_areas, width, height, obj_width, obj_height,
-    margin_border=80, margin_objects=10, max_attempts=100
+    margin_border=80, margin_objects=10, max_attempts=100, sample_free=False
 ):
+    lo_x, hi_x = margin_border + obj_width // 2, width - margin_border - obj_width // 2
+    lo_y, hi_y = margin_border + obj_height // 2, height - margin_border - obj_height // 2
+
     for _ in range(max_attempts):
-        cx = random.randint(margin_border + obj_width // 2, width - margin_border - obj_width // 2)
-        cy = random.randint(margin_border + obj_height // 2, height - margin_border - obj_height // 2)
+        if sample_free:
+            point = occupied_areas.sample_free_point()
+            if point is None:
+                return None
+            cx = min(max(point[0], lo_x), hi_x)
+            cy = min(max(point[1], lo_y), hi_y)
+        else:
+            cx = random.randint(lo_x, hi_x)
+            cy = random.randint(lo_y, hi_y)
 
         bbox = (
             cx - obj_width // 2,
@@ -36,131 +30,150 @@ def find_free_position(
             cy + obj_height // 2
         )
 
-        if not check_collision(occupied_areas, bbox, margin_objects):
+        if not occupied_areas.collides(bbox, margin_objects):
             return cx, cy, bbox
 
     return None
 
-def rotate_points(points, angle, center):
-    angle_rad = np.radians(angle)
-    cos_angle = np.cos(angle_rad)
-    sin_angle = np.sin(angle_rad)
-
-    rotated = []
-    for point in points:
-        x, y = point
-        x -= center[0]
-        y -= center[1]
-
-        x_new = x * cos_angle - y * sin_angle
-        y_new = x * sin_angle + y * cos_angle
+def random_colors(count):
+    return np.random.randint(50, 256, (count, 3))
 
-        x_new += center[0]
-        y_new += center[1]
+def place_objects(occupied_areas, width, height, extents, sample_free=False):
+    # Placement stays sequential, as every object depends on the ones placed before it
+    placed = []
+    centers = []
+    bboxes = []
 
-        rotated.append([int(x_new), int(y_new)])
-
-    return np.array(rotated)
-
-def generate_circles(image, width, height, occupied_areas, count=5):
-    total_circles = 0
-    skipped = 0
-
-    for _ in range(count):
-        color = generate_random_color()
-        radius = random.randint(20, 60)
-
-        result = find_free_position(occupied_areas, width, height, radius*2, radius*2, margin_objects=15)
+    for i, extent in enumerate(extents.tolist()):
+        result = find_free_position(
+            occupied_areas, width, height, extent, extent, margin_objects=15, sample_free=sample_free
+        )
 
         if result is None:
-            skipped += 1
             continue
 
         cx, cy, bbox = result
+        occupied_areas.add(bbox)
+
+        placed.append(i)
+        centers.append((cx, cy))
+        bboxes.append(bbox)
+
+    return (
+        np.array(placed, dtype=np.intp),
+        np.array(centers, dtype=np.float64).reshape(-1, 2),
+        bboxes,
+    )
+
+def rotate_points(points, angles, centers):
+    # points: (n, k, 2) vertices of n shapes, rotated about their centers in one product
+    angles_rad = np.radians(angles)
+    cos_angle = np.cos(angles_rad)
+    sin_angle = np.sin(angles_rad)
+    rotation = np.stack([
+        np.stack([cos_angle, -sin_angle], axis=-1),
+        np.stack([sin_angle, cos_angle], axis=-1),
+    ], axis=-2)
+
+    offsets = points - centers[:, None, :]
+    rotated = np.einsum('nij,nkj->nki', rotation, offsets) + centers[:, None, :]
+
+    return np.rint(rotated).astype(np.int32)
+
+def fill_polygons(image, polygons, colors):
+    # Every shape has its own random color, so each polygon needs its own fillPoly call
+    for polygon, color in zip(polygons, colors.tolist()):
+        cv2.fillPoly(image, [polygon], tuple(color))
+
+def annotate(annotations, shape_type, centers, sizes, angles, bboxes):
+    if annotations is None:
+        return
+
+    annotations.extend(
+        (shape_type, cx, cy, size, angle, *bbox)
+        for (cx, cy), size, angle, bbox in zip(
+            centers.astype(int).tolist(), sizes.tolist(), angles.tolist(), bboxes
+        )
+    )
 
-        cv2.circle(image, (cx, cy), radius, color, -1)
-
-        occupied_areas.append(bbox)
-        total_circles += 1
-
-    return total_circles
+def generate_circles(image, width, height, occupied_areas, count=5, sample_free=False, annotations=None):
+    colors = random_colors(count)
+    radii = np.random.randint(20, 61, count)
 
-def generate_squares(image, width, height, occupied_areas, count=5):
-    total_squares = 0
-    skipped = 0
+    placed, centers, bboxes = place_objects(occupied_areas, width, height, radii * 2, sample_free)
+    colors, radii = colors[placed], radii[placed]
 
-    for _ in range(count):
-        color = generate_random_color()
-        size = random.randint(40, 80)
+    for (cx, cy), radius, color in zip(centers.astype(int).tolist(), radii.tolist(), colors.tolist()):
+        cv2.circle(image, (cx, cy), radius, tuple(color), -1)
 
-        diag = int(np.sqrt(2 * size**2))
-        result = find_free_position(occupied_areas, width, height, diag, diag, margin_objects=15)
+    annotate(annotations, 'circle', centers, radii * 2, np.zeros_like(radii), bboxes)
 
-        if result is None:
-            skipped += 1
-            continue
+    return len(placed)
 
-        cx, cy, bbox = result
+def generate_squares(image, width, height, occupied_areas, count=5, sample_free=False, annotations=None):
+    colors = random_colors(count)
+    sizes = np.random.randint(40, 81, count)
+    angles = np.random.randint(0, 361, count)
 
-        angle = random.randint(0, 360)
+    diags = np.sqrt(2 * sizes**2).astype(int)
+    placed, centers, bboxes = place_objects(occupied_areas, width, height, diags, sample_free)
+    colors, sizes, angles = colors[placed], sizes[placed], angles[placed]
 
-        x = cx - size // 2
-        y = cy - size // 2
-        points = [
-            [x, y],
-            [x + size, y],
-            [x + size, y + size],
-            [x, y + size]
-        ]
+    corners = np.array([[0, 0], [1, 0], [1, 1], [0, 1]])
+    points = (centers - (sizes // 2)[:, None])[:, None, :] + corners * sizes[:, None, None]
 
-        rotated_points = rotate_points(points, angle, (cx, cy))
+    fill_polygons(image, rotate_points(points, angles, centers), colors)
 
-        cv2.fillPoly(image, [rotated_points], color)
+    annotate(annotations, 'square', centers, sizes, angles, bboxes)
 
-        occupied_areas.append(bbox)
-        total_squares += 1
+    return len(placed)
 
-    return total_squares
+def generate_triangles(image, width, height, occupied_areas, count=5, sample_free=False, annotations=None):
+    colors = random_colors(count)
+    side_lengths = np.random.randint(40, 81, count)
+    angles = np.random.randint(0, 361, count)
 
-def generate_triangles(image, width, height, occupied_areas, count=5):
-    total_triangles = 0
-    skipped = 0
+    heights = (side_lengths * np.sqrt(3) / 2).astype(int)
+    diags = np.sqrt(side_lengths**2 + heights**2).astype(int)
+    placed, centers, bboxes = place_objects(occupied_areas, width, height, diags, sample_free)
+    colors, side_lengths, heights, angles = colors[placed], side_lengths[placed], heights[placed], angles[placed]
 
-    for _ in range(count):
-        color = generate_random_color()
-        side_length = random.randint(40, 80)
+    offsets = np.stack([
+        np.stack([np.zeros_like(heights), -(2 * heights // 3)], axis=-1),
+        np.stack([-(side_lengths // 2), heights // 3], axis=-1),
+        np.stack([side_lengths // 2, heights // 3], axis=-1),
+    ], axis=1)
+    points = centers[:, None, :] + offsets
 
-        height_triangle = int(side_length * np.sqrt(3) / 2)
-
-        diag = int(np.sqrt(side_length**2 + height_triangle**2))
-        result = find_free_position(occupied_areas, width, height, diag, diag, margin_objects=15)
-
-        if result is None:
-            skipped += 1
-            continue
+    fill_polygons(image, rotate_points(points, angles, centers), colors)
 
-        cx, cy, bbox = result
-        angle = random.randint(0, 360)
+    annotate(annotations, 'triangle', centers, side_lengths, angles, bboxes)
 
-        h = height_triangle
-        pts = [
-            [cx, cy - int(2*h/3)],
-            [cx - side_length//2, cy + int(h/3)],
-            [cx + side_length//2, cy + int(h/3)]
-        ]
+    return len(placed)
 
-        rotated_pts = rotate_points(pts, angle, (cx, cy))
+def render_shapes(
+        width=800, height=600, num_circles=5, num_squares=5, num_triangles=5,
+        sample_free=False, annotations=None):
+    image = np.ones((height, width, 3), dtype=np.uint8) * 255
 
-        cv2.fillPoly(image, [rotated_pts], color)
+    occupied_areas = PlacementGrid(width, height)
+    stats = {}
 
-        occupied_areas.append(bbox)
-        total_triangles += 1
+    stats['circles'] = generate_circles(
+        image, width, height, occupied_areas, num_circles, sample_free, annotations
+    )
+    stats['squares'] = generate_squares(
+        image, width, height, occupied_areas, num_squares, sample_free, annotations
+    )
+    stats['triangles'] = generate_triangles(
+        image, width, height, occupied_areas, num_triangles, sample_free, annotations
+    )
 
-    return total_triangles
+    return image, stats
 
 def generate_image(
         width=800, height=600, filename='image.png',
-        num_circles=5, num_squares=5, num_triangles=5, seed=None):
+        num_circles=5, num_squares=5, num_triangles=5, seed=None, sample_free=False):
 
     print("=" * 60)
     print("RANDOM IMAGE WITH FIGURES GENERATOR")
@@ -170,22 +183,18 @@ def generate_image(
         random.seed(seed)
         np.random.seed(seed)
 
-    image = np.ones((height, width, 3), dtype=np.uint8) * 255
-
-    occupied_areas = []
-    stats = {}
-
     print(f"Generating image {width}x{height}...")
 
-    stats['circles'] = generate_circles(image, width, height, occupied_areas, num_circles)
-    print(f"Circles: {stats['circles']}")
+    image, stats = render_shapes(width, height, num_circles, num_squares, num_triangles, sample_free)
 
-    stats['squares'] = generate_squares(image, width, height, occupied_areas, num_squares)
+    print(f"Circles: {stats['circles']}")
     print(f"Squares: {stats['squares']}")
-
-    stats['triangles'] = generate_triangles(image, width, height, occupied_areas, num_triangles)
     print(f"Triangles: {stats['triangles']}")
 
+    requested = num_circles + num_squares + num_triangles
+    if sum(stats.values()) < requested:
+        print(f"Skipped: {requested - sum(stats.values())} (no free position found)")
+
     cv2.imwrite(os.path.join(GENERATE_DIR, filename), image)
 
     total = sum(stats.values())
@@ -198,5 +207,48 @@ def generate_image(
 
     return image, stats
 
+def generate_video(
+        width=800, height=600, filename='video.avi', frames=300, speed=4, fps=30,
+        num_circles=5, num_squares=5, num_triangles=5, seed=None, sample_free=False):
+
+    print("=" * 60)
+    print("RANDOM VIDEO WITH FIGURES GENERATOR")
+    print("=" * 60 + "\n")
+
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    # One wide scene is rendered and a camera window pans across it, so every shape
+    # moves by the same known offset between frames
+    scene_width = width + (frames - 1) * speed
+    print(f"Generating {frames} frames {width}x{height} from a {scene_width}x{height} scene...")
+
+    scene, stats = render_shapes(scene_width, height, num_circles, num_squares, num_triangles, sample_free)
+
+    print(f"Circles: {stats['circles']}")
+    print(f"Squares: {stats['squares']}")
+    print(f"Triangles: {stats['triangles']}")
+
+    path = os.path.join(GENERATE_DIR, filename)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    if not writer.isOpened():
+        raise ValueError(f"Cannot write video: {path}")
+
+    try:
+        for frame in range(frames):
+            x = frame * speed
+            writer.write(np.ascontiguousarray(scene[:, x:x + width]))
+    finally:
+        writer.release()
+
+    print("\n" + "=" * 60)
+    print("COMPLETED SUCCESSFULLY")
+    print(f"Generated {frames} frames with {sum(stats.values())} objects in the scene")
+    print(f"All outputs saved to: {GENERATE_DIR}/")
+    print("=" * 60)
+
+    return stats
+
 if __name__ == "__main__":
     generate_image()
@@ -0,0 +1,87 @@
+import random
+import numpy as np
+
+class PlacementGrid:
+    # Placed bounding boxes are bucketed into a uniform grid, so a collision check only
+    # looks at the boxes registered in the few cells the candidate box overlaps. A finer
+    # occupancy bitmap tracks which cells no box touches yet, for sampling free space.
+    def __init__(self, width, height, cell_size=64, free_cell_size=16):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.free_cell_size = free_cell_size
+
+        self.boxes = []
+        self.buckets = {}
+        self.columns = width // cell_size + 1
+
+        self.occupied = np.zeros(
+            (height // free_cell_size + 1, width // free_cell_size + 1), dtype=bool
+        )
+        self.free_cells = list(range(self.occupied.size))
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __iter__(self):
+        return iter(self.boxes)
+
+    def _cells(self, x1, y1, x2, y2):
+        size = self.cell_size
+        for row in range(max(y1, 0) // size, max(y2, 0) // size + 1):
+            for column in range(max(x1, 0) // size, max(x2, 0) // size + 1):
+                yield row * self.columns + column
+
+    def collides(self, bbox, margin=10):
+        x1_new, y1_new, x2_new, y2_new = bbox
+
+        x1_new -= margin
+        y1_new -= margin
+        x2_new += margin
+        y2_new += margin
+
+        checked = set()
+        for cell in self._cells(x1_new, y1_new, x2_new, y2_new):
+            for box_id in self.buckets.get(cell, ()):
+                if box_id in checked:
+                    continue
+                checked.add(box_id)
+
+                x1, y1, x2, y2 = self.boxes[box_id]
+                if not (x2_new < x1 or x1_new > x2 or y2_new < y1 or y1_new > y2):
+                    return True
+
+        return False
+
+    def add(self, bbox):
+        box_id = len(self.boxes)
+        self.boxes.append(bbox)
+
+        x1, y1, x2, y2 = bbox
+        for cell in self._cells(x1, y1, x2, y2):
+            self.buckets.setdefault(cell, []).append(box_id)
+
+        size = self.free_cell_size
+        self.occupied[max(y1, 0) // size:max(y2, 0) // size + 1, max(x1, 0) // size:max(x2, 0) // size + 1] = True
+
+    def sample_free_point(self):
+        # Occupied cells are dropped from the free list lazily, when they are drawn
+        rows, columns = self.occupied.shape
+        size = self.free_cell_size
+
+        while self.free_cells:
+            i = random.randrange(len(self.free_cells))
+            cell = self.free_cells[i]
+
+            if self.occupied.flat[cell]:
+                self.free_cells[i] = self.free_cells[-1]
+                self.free_cells.pop()
+                continue
+
+            row, column = divmod(cell, columns)
+            return (
+                column * size + random.randrange(size),
+                row * size + random.randrange(size),
+            )
+
+        return None
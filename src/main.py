@@ -1,3 +1,4 @@
+import sys
 from cli.parser import build_parser
 
 def main():
@@ -5,7 +6,8 @@ def main():
     args = parser.parse_args()
     args.func(args)
 
-    input("Press Enter to continue...")
+    if not args.no_interactive and sys.stdin.isatty():
+        input("Press Enter to continue...")
 
 if __name__ == "__main__":
     main()
@@ -1,63 +1,123 @@
 import cv2
-import matplotlib.pyplot as plt
 import os
+import numpy as np
 from config.constants import ANALYZE_DIR
+from utils.plotting import new_figure
 
-def plot_histogram(image, title, filename):
-    plt.figure(figsize=(10, 5))
+HISTOGRAM_BINS = 256
+# Rows of a pixel histogram; single-plane images leave the color rows empty
+HISTOGRAM_CHANNELS = ('blue', 'green', 'red', 'gray')
+RATIO_HISTOGRAM_BINS = 20
+# cv2.calcHist counts in float32, which is exact only up to 2**24 per bin
+HISTOGRAM_EXACT_PIXELS = 1 << 24
 
-    if len(image.shape) == 3:
+def _plane_histogram(image, channel):
+    rows = max(HISTOGRAM_EXACT_PIXELS // image.shape[1], 1)
+    hist = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+    for y in range(0, image.shape[0], rows):
+        strip = cv2.calcHist([image[y:y + rows]], [channel], None, [HISTOGRAM_BINS], [0, 256])
+        hist += strip.ravel().astype(np.int64)
+    return hist
+
+def compute_histograms(image, gray=None):
+    # Raw counts rather than frequencies, so histograms of strips or images add up exactly
+    hist = np.zeros((len(HISTOGRAM_CHANNELS), HISTOGRAM_BINS), dtype=np.int64)
+
+    if image.ndim == 3:
+        if gray is None:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        for channel in range(3):
+            hist[channel] = _plane_histogram(image, channel)
+    else:
+        gray = image
+
+    hist[3] = _plane_histogram(gray, 0)
+    return hist
+
+def merge_histograms(histograms):
+    merged = np.zeros((len(HISTOGRAM_CHANNELS), HISTOGRAM_BINS), dtype=np.int64)
+    for hist in histograms:
+        if hist is not None:
+            merged += hist
+    return merged
+
+def normalize_histogram(hist):
+    return hist / np.maximum(hist.sum(axis=-1, keepdims=True), 1)
+
+def ratio_histogram(features, groups, bins=RATIO_HISTOGRAM_BINS):
+    counts, edges = np.histogram(features['ratio'], bins=bins)
+
+    # Groups are consecutive slices of features, so one reduceat per bound covers them all
+    starts = np.cumsum([0] + [len(group) for group in groups[:-1]])
+    return {
+        'ratio_counts': counts,
+        'ratio_edges': edges,
+        'group_min': np.minimum.reduceat(features['ratio'], starts),
+        'group_max': np.maximum.reduceat(features['ratio'], starts),
+    }
+
+def save_histograms(path, hist, ratio_hist=None):
+    arrays = {'pixels': hist, 'channels': np.array(HISTOGRAM_CHANNELS)}
+    if ratio_hist is not None:
+        arrays.update(ratio_hist)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    print(f"Saved histogram data: {os.path.basename(path)}")
+
+def plot_pixel_histograms(hist, output_dir=ANALYZE_DIR, prefix='histogram', label='Image'):
+    if hist[:3].any():
+        plot_histogram_data(
+            hist[:3], f'Original {label} - Normalized Histogram', f'{prefix}_original.png', output_dir
+        )
+    plot_histogram_data(hist[3:], f'Grayscale {label} - Normalized Histogram', f'{prefix}_grayscale.png', output_dir)
+
+def plot_histogram_data(hists, title, filename, output_dir=ANALYZE_DIR):
+    fig = new_figure(figsize=(10, 5))
+    ax = fig.subplots()
+    hists = normalize_histogram(hists)
+
+    if len(hists) == 3:
         colors = ('b', 'g', 'r')
         color_names = ('Blue', 'Green', 'Red')
 
-        for i, (color, name) in enumerate(zip(colors, color_names)):
-            hist = cv2.calcHist([image], [i], None, [256], [0, 256])
-            hist = hist / hist.sum()
-            plt.plot(hist, color=color, linewidth=2, label=name)
-
-        plt.xlim([0, 256])
-        plt.xlabel('Pixel value')
-        plt.ylabel('Normalized frequency')
-        plt.title(title)
-        plt.legend()
-        plt.grid(True, alpha=0.3)
+        for hist, color, name in zip(hists, colors, color_names):
+            ax.plot(hist, color=color, linewidth=2, label=name)
+
+        ax.legend()
     else:
-        hist = cv2.calcHist([image], [0], None, [256], [0, 256])
-        hist = hist / hist.sum()
-
-        plt.plot(hist, color='black', linewidth=2)
-        plt.xlim([0, 256])
-        plt.xlabel('Pixel value')
-        plt.ylabel('Normalized frequency')
-        plt.title(title)
-        plt.grid(True, alpha=0.3)
-
-    plt.savefig(os.path.join(ANALYZE_DIR, filename), dpi=150, bbox_inches='tight')
-    plt.close()
+        ax.plot(hists[0], color='black', linewidth=2)
+
+    ax.set_xlim([0, 256])
+    ax.set_xlabel('Pixel value')
+    ax.set_ylabel('Normalized frequency')
+    ax.set_title(title)
+    ax.grid(True, alpha=0.3)
+
+    fig.savefig(os.path.join(output_dir, filename), dpi=150, bbox_inches='tight')
     print(f"Saved histogram: {filename}")
 
-def plot_ratio_histogram(shape_info, groups, output_dir):
-    ratios = [s['ratio'] for s in shape_info]
+def plot_ratio_histogram(ratio_hist, output_dir):
+    fig = new_figure(figsize=(12, 6))
+    ax = fig.subplots()
 
-    plt.figure(figsize=(12, 6))
-    plt.hist(ratios, bins=20, color='steelblue', edgecolor='black', alpha=0.7)
+    counts, edges = ratio_hist['ratio_counts'], ratio_hist['ratio_edges']
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', color='steelblue', edgecolor='black', alpha=0.7)
 
     colors = ['red', 'green', 'blue', 'orange', 'purple', 'cyan', 'magenta', 'lime', 'pink', 'brown']
 
-    for group_idx, group in enumerate(groups):
-        group_ratios = [s['ratio'] for s in group]
-        min_ratio = min(group_ratios)
-        max_ratio = max(group_ratios)
+    for group_idx, (min_ratio, max_ratio) in enumerate(zip(ratio_hist['group_min'], ratio_hist['group_max'])):
         color = colors[group_idx % len(colors)]
 
-        plt.axvline(min_ratio, color=color, linestyle='--', linewidth=2, label=f'Group {group_idx+1}')
-        plt.axvline(max_ratio, color=color, linestyle='--', linewidth=2)
+        ax.axvline(min_ratio, color=color, linestyle='--', linewidth=2, label=f'Group {group_idx+1}')
+        ax.axvline(max_ratio, color=color, linestyle='--', linewidth=2)
 
-    plt.xlabel('P²/A Ratio', fontsize=12)
-    plt.ylabel('Count', fontsize=12)
-    plt.title('Distribution of Shape Ratios with Group Boundaries', fontsize=14)
-    plt.legend()
-    plt.grid(axis='y', alpha=0.3)
-    plt.savefig(os.path.join(output_dir, 'ratio_histogram.png'), dpi=150)
+    ax.set_xlabel('P²/A Ratio', fontsize=12)
+    ax.set_ylabel('Count', fontsize=12)
+    ax.set_title('Distribution of Shape Ratios with Group Boundaries', fontsize=14)
+    ax.legend()
+    ax.grid(axis='y', alpha=0.3)
+    fig.savefig(os.path.join(output_dir, 'ratio_histogram.png'), dpi=150)
     print(f"Saved ratio histogram: ratio_histogram.png")
-    plt.close()
@@ -0,0 +1,4 @@
+def new_figure(**kwargs):
+    # Figures made without pyplot share no global state, so they can be drawn on any thread
+    from matplotlib.figure import Figure
+    return Figure(**kwargs)
@@ -0,0 +1,95 @@
+import os
+import random
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from analyze_image import writer
+from analyze_image.cache import AnalysisCache
+from analyze_image.batch import analyze_batch, analyze_one, analyze_pipelined
+from generate_image.generate_image import render_shapes
+
+OUTPUTS = ('groups', 'table', 'result_image', 'labels', 'edges', 'histograms', 'histogram_data', 'ratio_histogram')
+
+@pytest.fixture(scope="module")
+def images(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("images")
+    paths = []
+    for seed in range(4):
+        random.seed(seed)
+        np.random.seed(seed)
+        image, _ = render_shapes(700, 500, 4, 4, 4)
+        path = directory / f"image_{seed}.png"
+        cv2.imwrite(str(path), image)
+        paths.append(str(path))
+    return paths
+
+def read_tree(base_dir):
+    files = {}
+    for root, _, names in os.walk(base_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                # The batch summary names the output directories, which differ between the runs
+                files[os.path.relpath(path, base_dir)] = f.read().replace(os.fsencode(base_dir), b'')
+    return files
+
+def comparable(summaries, base_dir):
+    return [
+        dict(summary, output_dir=os.path.relpath(summary['output_dir'], base_dir), histogram=None)
+        for summary in summaries
+    ]
+
+@pytest.mark.parametrize("prefetch, write_queue", [(1, 1), (3, 2)])
+def test_pipelined_matches_sequential(images, tmp_path, prefetch, write_queue):
+    sequential_dir = str(tmp_path / "sequential")
+    pipelined_dir = str(tmp_path / "pipelined")
+    options = {'outputs': OUTPUTS}
+
+    sequential = analyze_batch(images, 1.0, 1, sequential_dir, detector_options=options)
+    pipelined = analyze_pipelined(
+        images, 1.0, pipelined_dir, prefetch=prefetch, decode_threads=2, write_threads=2,
+        write_queue=write_queue, detector_options=options,
+    )
+
+    assert all(summary['error'] is None and summary['objects'] > 0 for summary in pipelined)
+    assert comparable(pipelined, pipelined_dir) == comparable(sequential, sequential_dir)
+    for reference, summary in zip(sequential, pipelined):
+        np.testing.assert_array_equal(summary['histogram'], reference['histogram'])
+
+    sequential_files = read_tree(sequential_dir)
+    assert len(sequential_files) > len(images) * 5
+    assert read_tree(pipelined_dir) == sequential_files
+
+def test_analyze_one_writes_in_background(images, tmp_path, monkeypatch):
+    threads = set()
+    write_image = writer.ImageWriter.write_image
+
+    def record(self, path, image):
+        threads.add(threading.current_thread().name)
+        write_image(self, path, image)
+
+    monkeypatch.setattr(writer.ImageWriter, 'write_image', record)
+    summary = analyze_one(images[0], str(tmp_path), 1.0, detector_options={'outputs': OUTPUTS})
+
+    assert summary['error'] is None
+    assert threads and all(name.startswith('writer') for name in threads)
+    assert os.path.exists(tmp_path / "result_image.png")
+
+def test_analyze_one_reports_failed_writes(images, tmp_path, monkeypatch):
+    def fail(self, path, image):
+        raise ValueError(f"Cannot write image: {path}")
+
+    monkeypatch.setattr(writer.ImageWriter, 'write_image', fail)
+    summary = analyze_one(images[0], str(tmp_path), 1.0, detector_options={'outputs': OUTPUTS})
+
+    assert summary['error'].startswith("Cannot write image")
+
+def test_batch_keeps_shared_cache_within_limit(images, tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache"), max_bytes=20000)
+    analyze_batch(images, 1.0, 2, str(tmp_path / "out"), detector_options={'outputs': ('table',), 'cache': cache})
+
+    cache_dir = tmp_path / "cache"
+    assert sum(os.path.getsize(cache_dir / name) for name in os.listdir(cache_dir)) <= cache.max_bytes
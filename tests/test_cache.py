@@ -0,0 +1,84 @@
+import os
+import pickle
+
+import cv2
+import numpy as np
+import pytest
+
+from analyze_image import shape_detector
+from analyze_image.cache import AnalysisCache
+from analyze_image.features import SHAPE_DTYPE
+from analyze_image.shape_detector import ShapeDetector
+
+def features(count):
+    return np.zeros(count, dtype=SHAPE_DTYPE)
+
+def cache_size(cache_dir):
+    return sum(os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir))
+
+def test_writes_below_the_limit_do_not_scan(tmp_path, monkeypatch):
+    cache = AnalysisCache(str(tmp_path), max_bytes=1 << 20)
+    cache.save_features('first', features(10))
+
+    scans = []
+    listdir = os.listdir
+    monkeypatch.setattr(os, 'listdir', lambda path: scans.append(path) or listdir(path))
+    for i in range(20):
+        cache.save_features(f"entry{i}", features(10))
+    cache.save_features('entry0', features(100))
+
+    assert scans == []
+    assert cache._size == cache_size(str(tmp_path))
+
+def test_evicts_least_recently_used_once_over_the_limit(tmp_path):
+    entry_size = len(features(100).tobytes())
+    cache = AnalysisCache(str(tmp_path), max_bytes=int(entry_size * 3.5))
+
+    for i in range(6):
+        cache.save_features(f"entry{i}", features(100))
+        os.utime(cache._path(f"entry{i}", 'features'), (i, i))
+
+    assert cache_size(str(tmp_path)) <= cache.max_bytes
+    assert cache.load_features('entry5') is not None
+    assert cache.load_features('entry0') is None
+
+def test_parent_eviction_bounds_worker_copies(tmp_path):
+    entry_size = len(features(100).tobytes())
+    cache = AnalysisCache(str(tmp_path), max_bytes=entry_size * 5)
+    cache.evict()
+
+    # Process-pool workers each get a copy that only counts its own writes
+    workers = [pickle.loads(pickle.dumps(cache)) for _ in range(3)]
+    for n, worker in enumerate(workers):
+        for i in range(4):
+            worker.save_features(f"worker{n}_{i}", features(100))
+    assert cache_size(str(tmp_path)) > cache.max_bytes
+
+    cache.evict()
+    assert cache_size(str(tmp_path)) <= cache.max_bytes
+
+def test_cache_hit_skips_edges_for_histogram_outputs(tmp_path, monkeypatch):
+    image = np.full((240, 320, 3), 230, dtype=np.uint8)
+    cv2.rectangle(image, (40, 40), (160, 120), (20, 60, 20), -1)
+    cv2.circle(image, (240, 160), 40, (90, 20, 20), -1)
+    path = str(tmp_path / "image.png")
+    cv2.imwrite(path, image)
+
+    outputs = ('table', 'histogram_data')
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    first = ShapeDetector(path, str(tmp_path / "first"), outputs, cache=cache)
+    first.process(1.0)
+
+    def fail(gray):
+        raise AssertionError("edges computed on a cache hit")
+
+    monkeypatch.setattr(shape_detector, 'detect_edges', fail)
+    second = ShapeDetector(path, str(tmp_path / "second"), outputs, cache=cache)
+    _, groups = second.process(1.0)
+
+    assert len(groups) > 0
+    np.testing.assert_array_equal(second.histograms, first.histograms)
+
+    # Outputs that show the edges still run the pipeline
+    with pytest.raises(AssertionError, match="edges computed"):
+        ShapeDetector(path, str(tmp_path / "third"), ('edges',), cache=cache).process(1.0)
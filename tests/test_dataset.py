@@ -0,0 +1,65 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from generate_image.dataset import generate_dataset, load_annotations
+
+def read_images(dataset_dir):
+    images_dir = os.path.join(dataset_dir, 'images')
+    images = {}
+    for name in sorted(os.listdir(images_dir)):
+        with open(os.path.join(images_dir, name), 'rb') as f:
+            images[name] = f.read()
+    return images
+
+def read_shard_seeds(dataset_dir):
+    with open(os.path.join(dataset_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    seeds = []
+    for shard in manifest['shards']:
+        with np.load(os.path.join(dataset_dir, 'annotations', shard['file'])) as data:
+            seeds.append(data['seeds'])
+    return manifest, np.concatenate(seeds)
+
+@pytest.mark.parametrize("workers, shard_size", [(2, 2), (3, 1), (1, 4)])
+def test_dataset_does_not_depend_on_workers_or_shards(tmp_path, workers, shard_size):
+    options = dict(width=500, height=400, num_circles=4, num_squares=4, num_triangles=4, seed=11)
+    reference_dir = str(tmp_path / "reference")
+    dataset_dir = str(tmp_path / "dataset")
+
+    generate_dataset(6, reference_dir, workers=1, shard_size=6, **options)
+    generate_dataset(6, dataset_dir, workers=workers, shard_size=shard_size, **options)
+
+    reference_images = read_images(reference_dir)
+    assert len(reference_images) == 6
+    assert read_images(dataset_dir) == reference_images
+
+    reference_annotations = load_annotations(reference_dir)
+    assert len(reference_annotations) > 0
+    np.testing.assert_array_equal(load_annotations(dataset_dir), reference_annotations)
+
+    reference_manifest, reference_seeds = read_shard_seeds(reference_dir)
+    manifest, seeds = read_shard_seeds(dataset_dir)
+    np.testing.assert_array_equal(seeds, reference_seeds)
+    assert manifest['seed'] == reference_manifest['seed']
+    assert len(manifest['shards']) == -(-6 // shard_size)
+
+def read_tree(base_dir):
+    files = {}
+    for root, _, names in os.walk(base_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, base_dir)] = f.read()
+    return files
+
+def test_same_sharding_gives_identical_trees(tmp_path):
+    options = dict(width=400, height=300, num_circles=3, num_squares=3, num_triangles=3, seed=5, shard_size=2)
+    generate_dataset(5, str(tmp_path / "one"), workers=1, **options)
+    generate_dataset(5, str(tmp_path / "two"), workers=2, **options)
+
+    files = read_tree(tmp_path / "one")
+    assert len(files) == 5 + 3 + 1
+    assert read_tree(tmp_path / "two") == files
@@ -0,0 +1,74 @@
+import csv
+import json
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+from analyze_image.contours import PackedContours
+from analyze_image.shape_detector import ShapeDetector
+from generate_image.generate_image import render_shapes
+
+@pytest.fixture(scope="module")
+def image_path(tmp_path_factory):
+    random.seed(5)
+    np.random.seed(5)
+    image, _ = render_shapes(900, 700, 6, 6, 6)
+    path = tmp_path_factory.mktemp("export") / "image.png"
+    cv2.imwrite(str(path), image)
+    return str(path)
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    return {
+        name: [record[name] for record in records]
+        for name in ('index', 'group', 'ratio', 'area', 'perimeter', 'x', 'y', 'w', 'h', 'contour')
+    }
+
+def read_csv(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    columns = {name: [int(row[name]) for row in rows] for name in ('index', 'group', 'x', 'y', 'w', 'h')}
+    columns.update({name: [float(row[name]) for row in rows] for name in ('ratio', 'area', 'perimeter')})
+    columns['contour'] = [
+        [[int(value) for value in pair.split(',')] for pair in row['contour'].split(' ')] for row in rows
+    ]
+    return columns
+
+def read_npz(path):
+    with np.load(path) as data:
+        columns = {name: data[name] for name in ('index', 'group', 'ratio', 'area', 'perimeter')}
+        for column, name in enumerate(('x', 'y', 'w', 'h')):
+            columns[name] = data['bbox'][:, column]
+        packed = PackedContours(data['contour_points'], data['contour_offsets'])
+        columns['contour'] = [contour.reshape(-1, 2) for contour in packed]
+    return columns
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv, 'npz': read_npz}
+
+@pytest.mark.parametrize("format", sorted(READERS))
+def test_export_round_trip(image_path, tmp_path, format):
+    detector = ShapeDetector(
+        image_path, str(tmp_path), ('table',), export_format=format, export_contours=True
+    )
+    _, groups = detector.process(1.0)
+    contours, _ = detector.extract_contours()
+
+    exported = READERS[format](str(tmp_path / f"results.{format}"))
+    features = np.concatenate(groups)
+    group_ids = np.repeat(np.arange(1, len(groups) + 1), [len(group) for group in groups])
+
+    assert len(features) > 10
+    np.testing.assert_array_equal(exported['index'], features['index'])
+    np.testing.assert_array_equal(exported['group'], group_ids)
+    for name in ('ratio', 'area', 'perimeter'):
+        # JSON and CSV write the shortest repr, which reads back as the same double
+        np.testing.assert_array_equal(np.asarray(exported[name], dtype=np.float64), features[name])
+    for name in ('x', 'y', 'w', 'h'):
+        np.testing.assert_array_equal(exported[name], features[name])
+
+    assert len(exported['contour']) == len(features)
+    for index, points in zip(features['index'], exported['contour']):
+        np.testing.assert_array_equal(np.asarray(points), contours[index].reshape(-1, 2))
@@ -0,0 +1,138 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from analyze_image.grouping import group_density, group_k_segments, group_ratios, group_running_mean
+
+def running_mean_loop(ratios, threshold):
+    # The original per-shape loop the vectorized pass has to reproduce
+    bounds = [0]
+    for i in range(1, len(ratios)):
+        if abs(ratios[i] - np.mean(ratios[bounds[-1]:i])) > threshold:
+            bounds.append(i)
+
+    labels = np.zeros(len(ratios), dtype=np.int32)
+    labels[bounds[1:]] = 1
+    return np.cumsum(labels, dtype=np.int32)
+
+def segmentation_cost(ratios, labels):
+    return sum(((ratios[labels == g] - ratios[labels == g].mean()) ** 2).sum() for g in np.unique(labels))
+
+def brute_force_cost(ratios, n_groups):
+    best = np.inf
+    for splits in itertools.combinations(range(1, len(ratios)), n_groups - 1):
+        labels = np.zeros(len(ratios), dtype=np.int32)
+        labels[list(splits)] = 1
+        best = min(best, segmentation_cost(ratios, np.cumsum(labels)))
+    return best
+
+def density_reference(ratios, eps, min_samples):
+    count = len(ratios)
+    # Neighbours lie in [ratio - eps, ratio + eps], bounds included
+    core = [
+        i for i in range(count)
+        if np.sum((ratios >= ratios[i] - eps) & (ratios <= ratios[i] + eps)) >= min_samples
+    ]
+
+    core_cluster = {}
+    for position, i in enumerate(core):
+        if position == 0:
+            core_cluster[i] = 0
+        else:
+            previous = core[position - 1]
+            core_cluster[i] = core_cluster[previous] + (ratios[i] - ratios[previous] > eps)
+
+    labels = []
+    previous = None
+    for i in range(count):
+        cluster = -1
+        if core:
+            # Nearest core shape; on a tie the lower one, as in the vectorized version
+            distance, nearest = min((abs(ratios[i] - ratios[j]), j) for j in core)
+            if distance <= eps:
+                cluster = core_cluster[nearest]
+        if not labels:
+            labels.append(0)
+        elif cluster == -1 or cluster != previous:
+            labels.append(labels[-1] + 1)
+        else:
+            labels.append(labels[-1])
+        previous = cluster
+
+    return np.array(labels, dtype=np.int32)
+
+@pytest.mark.parametrize("seed", range(50))
+def test_running_mean_matches_loop(seed):
+    rng = np.random.default_rng(seed)
+    # Ratios rounded to one decimal put many shapes exactly on the threshold
+    ratios = np.sort(np.round(rng.uniform(12, 40, rng.integers(1, 2000)), int(rng.integers(0, 3))))
+    threshold = float(rng.choice([0.1, 0.5, 1.0, 2.0]))
+
+    np.testing.assert_array_equal(group_running_mean(ratios, threshold), running_mean_loop(ratios, threshold))
+
+def test_running_mean_matches_loop_on_ties():
+    ratios = np.array([16.1] * 1000 + [17.1])
+    np.testing.assert_array_equal(group_running_mean(ratios, 1.0), running_mean_loop(ratios, 1.0))
+
+def test_running_mean_matches_loop_on_feature_column():
+    # Detectors pass the strided ratio column of the feature table
+    features = np.zeros(500, dtype=[('index', np.int32), ('ratio', np.float64)])
+    features['ratio'] = np.sort(np.round(np.random.default_rng(7).uniform(12, 20, 500), 1))
+
+    np.testing.assert_array_equal(
+        group_running_mean(features['ratio'], 0.5), running_mean_loop(features['ratio'], 0.5)
+    )
+
+@pytest.mark.parametrize("seed", range(30))
+def test_k_segments_is_optimal(seed):
+    rng = np.random.default_rng(seed)
+    ratios = np.sort(rng.uniform(12, 40, rng.integers(1, 11)))
+    n_groups = int(rng.integers(1, len(ratios) + 1))
+
+    labels = group_k_segments(ratios, n_groups)
+
+    assert labels[-1] + 1 == n_groups
+    assert np.all(np.diff(labels) >= 0)
+    assert segmentation_cost(ratios, labels) == pytest.approx(brute_force_cost(ratios, n_groups), abs=1e-9)
+
+def k_segments_reference_cost(ratios, n_groups):
+    # Plain O(k n²) dynamic program over the full table
+    count = len(ratios)
+    cumsum = np.concatenate(([0.0], np.cumsum(ratios)))
+    cumsum_sq = np.concatenate(([0.0], np.cumsum(ratios * ratios)))
+
+    def cost(start, end):
+        total = cumsum[end] - cumsum[start]
+        return cumsum_sq[end] - cumsum_sq[start] - total * total / (end - start)
+
+    best = [cost(0, end) for end in range(1, count + 1)]
+    for k in range(1, n_groups):
+        best = [
+            min(best[start - 1] + cost(start, end) for start in range(k, end)) if end > k else np.inf
+            for end in range(1, count + 1)
+        ]
+    return best[-1]
+
+@pytest.mark.parametrize("n_groups", [2, 5, 10, 17, 40])
+def test_k_segments_matches_full_table(n_groups):
+    # Enough layers for several recomputed blocks, including a partial last one
+    ratios = np.sort(np.random.default_rng(n_groups).uniform(12, 40, 120))
+
+    labels = group_k_segments(ratios, n_groups)
+
+    assert labels[-1] + 1 == n_groups
+    assert segmentation_cost(ratios, labels) == pytest.approx(k_segments_reference_cost(ratios, n_groups), abs=1e-9)
+
+@pytest.mark.parametrize("seed", range(30))
+def test_density_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    ratios = np.sort(np.round(rng.uniform(12, 30, rng.integers(1, 120)), 1))
+    eps = float(rng.choice([0.1, 0.3, 1.0]))
+    min_samples = int(rng.integers(1, 6))
+
+    np.testing.assert_array_equal(group_density(ratios, eps, min_samples), density_reference(ratios, eps, min_samples))
+
+def test_group_ratios_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        group_ratios([1.0, 2.0], 1.0, 'unknown')
@@ -0,0 +1,115 @@
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+from analyze_image.shape_detector import ShapeDetector
+from generate_image.generate_image import render_shapes
+
+# Largest relative P²/A difference between a reduced decode and the full-resolution one;
+# the smallest generated shapes are only about 10 pixels across at a quarter of the size
+REDUCED_RATIO_TOLERANCE = {2: 0.1, 4: 0.25}
+
+@pytest.fixture(scope="module")
+def image_files(tmp_path_factory):
+    random.seed(4)
+    np.random.seed(4)
+    image, _ = render_shapes(1200, 1000, 6, 6, 6)
+    directory = tmp_path_factory.mktemp("loader")
+
+    png_path = directory / "image.png"
+    cv2.imwrite(str(png_path), image)
+    np.save(directory / "image.npy", image)
+    image.tofile(directory / "image.raw")
+    cv2.cvtColor(image, cv2.COLOR_BGR2GRAY).tofile(directory / "gray.raw")
+
+    return directory, image
+
+def detect(path, tmp_path, **options):
+    detector = ShapeDetector(str(path), str(tmp_path / "out"), ('table',), **options)
+    _, groups = detector.process(1.0)
+    contours, _ = detector.extract_contours()
+    return np.concatenate(groups), contours
+
+def assert_same_detection(result, reference):
+    features, contours = result
+    reference_features, reference_contours = reference
+
+    np.testing.assert_array_equal(features, reference_features)
+    assert len(contours) == len(reference_contours)
+    for contour, reference_contour in zip(contours, reference_contours):
+        np.testing.assert_array_equal(contour.reshape(-1, 2), reference_contour.reshape(-1, 2))
+
+@pytest.fixture(scope="module")
+def reference(image_files, tmp_path_factory):
+    directory, _ = image_files
+    return detect(directory / "image.png", tmp_path_factory.mktemp("reference"))
+
+def match_by_center(features, reference_features, max_distance):
+    # Index into features of the object nearest to every reference object, -1 if none is close
+    centers = np.column_stack((features['x'] + features['w'] / 2, features['y'] + features['h'] / 2))
+    reference_centers = np.column_stack((
+        reference_features['x'] + reference_features['w'] / 2,
+        reference_features['y'] + reference_features['h'] / 2,
+    ))
+    distances = np.linalg.norm(reference_centers[:, None, :] - centers[None, :, :], axis=2)
+    nearest = np.argmin(distances, axis=1)
+    return np.where(distances[np.arange(len(nearest)), nearest] <= max_distance, nearest, -1)
+
+@pytest.mark.parametrize("name, options", [
+    ("image.npy", {}),
+    ("image.npy", {'decode': 'gray'}),
+    ("image.raw", {'raw_shape': (1000, 1200, 3)}),
+    ("gray.raw", {'raw_shape': (1000, 1200)}),
+])
+def test_memory_mapped_inputs_match_imread(image_files, reference, tmp_path, name, options):
+    directory, _ = image_files
+
+    assert_same_detection(detect(directory / name, tmp_path, **options), reference)
+
+@pytest.mark.parametrize("decode", ['color', 'gray'])
+def test_encoded_bytes_match_file_decode(image_files, tmp_path, decode):
+    directory, _ = image_files
+    path = directory / "image.png"
+
+    assert_same_detection(
+        detect(path, tmp_path / "bytes", image=path.read_bytes(), decode=decode),
+        detect(path, tmp_path / "file", decode=decode),
+    )
+
+def test_gray_decode_stays_within_tolerance(image_files, reference, tmp_path):
+    directory, image = image_files
+    reference_features, _ = reference
+
+    # The PNG decoder converts to gray with its own rounding
+    gray = cv2.imread(str(directory / "image.png"), cv2.IMREAD_GRAYSCALE)
+    assert np.abs(gray.astype(np.int16) - cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)).max() <= 1
+
+    features, _ = detect(directory / "image.png", tmp_path, decode='gray')
+    matched = match_by_center(features, reference_features, 1)
+    found = matched >= 0
+
+    # Only shapes whose edges sit right at the Canny thresholds can come and go
+    assert found.sum() >= len(reference_features) - 1
+    assert len(features) <= len(reference_features) + 1
+    np.testing.assert_allclose(features['ratio'][matched[found]], reference_features['ratio'][found], rtol=0.01)
+
+@pytest.mark.parametrize("name", ["image.png", "image.npy"])
+@pytest.mark.parametrize("reduce", [2, 4])
+def test_reduced_decode_stays_within_tolerance(image_files, reference, tmp_path, name, reduce):
+    directory, _ = image_files
+    reference_features, _ = reference
+
+    features, _ = detect(directory / name, tmp_path, reduce=reduce)
+    matched = match_by_center(features, reference_features, 2 * reduce)
+    found = matched >= 0
+
+    # Objects near the minimum area may be lost, and a reduced decode can close a few
+    # outlines that stay open at full resolution
+    assert found.sum() >= len(reference_features) - 2
+    assert len(np.unique(matched[found])) == found.sum()
+    assert len(features) <= len(reference_features) + 2
+    np.testing.assert_allclose(
+        features['ratio'][matched[found]], reference_features['ratio'][found], rtol=REDUCED_RATIO_TOLERANCE[reduce]
+    )
@@ -0,0 +1,48 @@
+import os
+import sys
+import tracemalloc
+
+import cv2
+import numpy as np
+import pytest
+
+from analyze_image.metrics import PipelineMetrics
+from analyze_image.shape_detector import ShapeDetector
+
+@pytest.fixture
+def image_path(tmp_path):
+    image = np.full((200, 200, 3), 230, dtype=np.uint8)
+    cv2.rectangle(image, (40, 40), (120, 100), (20, 20, 20), -1)
+    path = tmp_path / "image.png"
+    cv2.imwrite(str(path), image)
+    return str(path)
+
+def test_abort_releases_profiler_and_tracemalloc():
+    metrics = PipelineMetrics(trace_memory=True, profile=True)
+    metrics.start("image.png")
+    metrics.abort()
+
+    assert sys.getprofile() is None
+    assert not tracemalloc.is_tracing()
+
+def test_failed_run_does_not_break_the_next_one(image_path, tmp_path, monkeypatch):
+    metrics = PipelineMetrics(trace_memory=True, profile=True)
+
+    def fail(self, edges):
+        raise RuntimeError("detection failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ShapeDetector, 'find_contours', fail)
+        detector = ShapeDetector(image_path, str(tmp_path / "failed"), ('table',), metrics=metrics)
+        with pytest.raises(RuntimeError):
+            detector.process()
+
+    assert sys.getprofile() is None
+    assert not tracemalloc.is_tracing()
+    assert not os.path.exists(tmp_path / "failed" / "metrics.jsonl")
+
+    output_dir = tmp_path / "next"
+    ShapeDetector(image_path, str(output_dir), ('table',), metrics=metrics).process()
+
+    assert os.path.exists(output_dir / "metrics.jsonl")
+    assert os.path.exists(output_dir / "profile.prof")
@@ -0,0 +1,46 @@
+import os
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+from analyze_image.pyramid import PyramidShapeDetector
+from analyze_image.shape_detector import ShapeDetector
+from analyze_image.tiling import TiledShapeDetector
+from cli.parser import build_parser
+from config.constants import DEFAULT_OUTPUTS
+from generate_image.generate_image import render_shapes
+
+@pytest.fixture
+def image_path(tmp_path):
+    random.seed(1)
+    np.random.seed(1)
+    image, _ = render_shapes(600, 450, 3, 3, 3)
+    path = tmp_path / "image.png"
+    cv2.imwrite(str(path), image)
+    return str(path)
+
+def test_default_outputs_are_pinned():
+    assert DEFAULT_OUTPUTS == (
+        "groups", "table", "result_image", "edges", "histograms", "ratio_histogram", "visualization",
+    )
+    assert ShapeDetector.default_outputs() == DEFAULT_OUTPUTS
+    assert PyramidShapeDetector.default_outputs() == DEFAULT_OUTPUTS
+    assert TiledShapeDetector.default_outputs() == ("groups", "table", "histograms", "ratio_histogram")
+    assert ShapeDetector.default_outputs(2) == ("groups", "table", "ratio_histogram")
+
+def test_plain_analyze_writes_baseline_artifacts(image_path, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    args = build_parser().parse_args(["analyze", "-i", image_path, "--no-cache", "--no-interactive"])
+    args.func(args)
+
+    assert sorted(os.listdir(tmp_path / "outputs" / "analyze")) == [
+        "edges.png",
+        "histogram_grayscale.png",
+        "histogram_original.png",
+        "ratio_histogram.png",
+        "result_image.png",
+        "results_table.txt",
+        "visualization.png",
+    ]
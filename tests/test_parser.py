@@ -0,0 +1,43 @@
+import pytest
+
+from analyze_image.tiling import TILE_OVERLAP
+from cli.parser import build_parser
+
+def parse(*argv):
+    return build_parser().parse_args(list(argv))
+
+@pytest.mark.parametrize("command", [
+    ["analyze", "-i", "image.png"],
+    ["serve"],
+    ["generate", "--count", "4"],
+])
+def test_workers_must_be_positive(command, capsys):
+    assert parse(*command, "--workers", "3").workers == 3
+    assert parse(*command).workers is None
+
+    for value in ("0", "-2", "two"):
+        with pytest.raises(SystemExit):
+            parse(*command, "--workers", value)
+        assert "positive integer" in capsys.readouterr().err
+
+@pytest.mark.parametrize("option", ["--render-size", "--render-tiles"])
+def test_render_sizes_must_be_positive(option, capsys):
+    args = parse("analyze", "-i", "image.png", option, "512")
+    assert getattr(args, option[2:].replace("-", "_")) == 512
+
+    for value in ("0", "-64", "1.5"):
+        with pytest.raises(SystemExit):
+            parse("analyze", "-i", "image.png", option, value)
+        assert "positive integer" in capsys.readouterr().err
+
+@pytest.mark.parametrize("command", [
+    ["analyze", "-i", "image.png"],
+    ["sweep", "-i", "image.png", "--thresholds", "1,2"],
+])
+def test_tile_size_must_cover_the_overlap(command, capsys):
+    assert parse(*command, "--tile-size", str(TILE_OVERLAP)).tile_size == TILE_OVERLAP
+
+    for value in ("0", "-512", str(TILE_OVERLAP - 1)):
+        with pytest.raises(SystemExit):
+            parse(*command, "--tile-size", value)
+        assert "--tile-size" in capsys.readouterr().err
@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+import pytest
+
+from generate_image.placement import PlacementGrid
+
+def check_collision(occupied_areas, new_bbox, margin=10):
+    # The linear scan PlacementGrid replaced
+    x1_new, y1_new, x2_new, y2_new = new_bbox
+
+    x1_new -= margin
+    y1_new -= margin
+    x2_new += margin
+    y2_new += margin
+
+    for (x1, y1, x2, y2) in occupied_areas:
+        if not (x2_new < x1 or x1_new > x2 or y2_new < y1 or y1_new > y2):
+            return True
+
+    return False
+
+def random_box(rng, width, height, max_size):
+    # Boxes may stick out of the image on any side
+    x1 = rng.randint(-max_size, width)
+    y1 = rng.randint(-max_size, height)
+    return x1, y1, x1 + rng.randint(0, max_size), y1 + rng.randint(0, max_size)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_collides_matches_linear_scan(seed):
+    rng = random.Random(seed)
+    width, height = rng.randint(100, 1500), rng.randint(100, 1500)
+    grid = PlacementGrid(width, height, cell_size=rng.choice([16, 64, 200]))
+    occupied_areas = []
+    hits = 0
+
+    for _ in range(400):
+        bbox = random_box(rng, width, height, rng.choice([10, 60, 300]))
+        margin = rng.choice([0, 10, 15, 40])
+
+        collides = check_collision(occupied_areas, bbox, margin)
+        assert grid.collides(bbox, margin) == collides
+        hits += collides
+
+        # Placing only free boxes, as the generator does, keeps the grid sparse
+        if not collides or rng.random() < 0.2:
+            grid.add(bbox)
+            occupied_areas.append(bbox)
+
+    assert 0 < hits < 400
+    assert list(grid) == occupied_areas
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sampled_points_lie_in_free_cells(seed):
+    random.seed(seed)
+    rng = random.Random(seed)
+    grid = PlacementGrid(640, 480)
+    for _ in range(30):
+        grid.add(random_box(rng, 640, 480, 120))
+
+    for _ in range(200):
+        x, y = grid.sample_free_point()
+        size = grid.free_cell_size
+        assert not grid.occupied[y // size, x // size]
+
+def test_sampling_stops_when_full():
+    grid = PlacementGrid(100, 100)
+    grid.add((0, 0, 200, 200))
+
+    assert grid.sample_free_point() is None
+    assert np.all(grid.occupied)
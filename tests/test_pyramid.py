@@ -0,0 +1,39 @@
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+from analyze_image.loader import to_gray
+from analyze_image.pyramid import (
+    PYRAMID_MAX_COVERAGE, PYRAMID_RATIO_TOLERANCE, PyramidShapeDetector, coarse_regions, compare_detections
+)
+from analyze_image.shape_detector import ShapeDetector
+from generate_image.generate_image import render_shapes
+
+def sparse_image(tmp_path, seed, size=2500, count=8):
+    random.seed(seed)
+    np.random.seed(seed)
+    image, _ = render_shapes(size, size, count, count, count)
+    path = tmp_path / "image.png"
+    cv2.imwrite(str(path), image)
+    return str(path), image
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("levels", [1, 2])
+def test_pyramid_matches_full_resolution(tmp_path, seed, levels):
+    path, image = sparse_image(tmp_path, seed)
+
+    # The image is sparse enough that only the candidate regions are searched
+    regions = coarse_regions(to_gray(image), levels)
+    assert sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions) < PYRAMID_MAX_COVERAGE * image.size / 3
+
+    _, full_groups = ShapeDetector(path, str(tmp_path / "full"), ('table',)).process(1.0)
+    _, pyramid_groups = PyramidShapeDetector(path, str(tmp_path / "pyramid"), ('table',), levels).process(1.0)
+
+    comparison = compare_detections(np.concatenate(full_groups), np.concatenate(pyramid_groups))
+
+    assert comparison['reference_objects'] > 10
+    assert comparison['matched'] == comparison['reference_objects'] == comparison['objects']
+    assert comparison['max_ratio_error'] <= PYRAMID_RATIO_TOLERANCE
+    assert len(pyramid_groups) == len(full_groups)
@@ -0,0 +1,66 @@
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+from analyze_image.render import GROUP_COLORS, compose_labels, iter_tiles, label_mask, render_groups
+from analyze_image.shape_detector import ShapeDetector
+from generate_image.generate_image import render_shapes
+
+@pytest.fixture(scope="module")
+def detection(tmp_path_factory):
+    random.seed(2)
+    np.random.seed(2)
+    image, _ = render_shapes(1100, 900, 12, 12, 12)
+    path = tmp_path_factory.mktemp("render") / "image.png"
+    cv2.imwrite(str(path), image)
+
+    detector = ShapeDetector(str(path), str(path.parent), ('table',))
+    contours, areas = detector.extract_contours()
+    # A small threshold gives more groups than colors, so the palette wraps around
+    groups, _ = detector.group_by_similarity(contours, 0.2, areas)
+    return detector.load_image(), groups, contours
+
+def draw_per_shape(image, groups, contours):
+    # The per-shape loop render_groups replaced
+    result_image = image.copy()
+    for group_idx, group in enumerate(groups):
+        color = GROUP_COLORS[group_idx % len(GROUP_COLORS)]
+        for index in group['index']:
+            cv2.drawContours(result_image, [contours[index]], -1, color, -1)
+    return result_image
+
+def test_render_groups_matches_per_shape_drawing(detection):
+    image, groups, contours = detection
+    assert len(groups) > len(GROUP_COLORS)
+
+    result_image = render_groups(image, groups, contours)
+
+    np.testing.assert_array_equal(result_image, draw_per_shape(image, groups, contours))
+    assert result_image is not image
+
+def test_labels_compose_to_rendered_image(detection):
+    image, groups, contours = detection
+
+    composed = compose_labels(image, label_mask(image.shape, groups, contours))
+
+    np.testing.assert_array_equal(composed, draw_per_shape(image, groups, contours))
+
+@pytest.mark.parametrize("tile_size", [256, 400, 2048])
+def test_tiles_assemble_to_rendered_image(detection, tile_size):
+    image, groups, contours = detection
+    assembled = np.zeros_like(image)
+
+    for y, x, tile in iter_tiles(image, label_mask(image.shape, groups, contours), tile_size):
+        assembled[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+
+    np.testing.assert_array_equal(assembled, draw_per_shape(image, groups, contours))
+
+def test_reduced_render_fits_max_size(detection):
+    image, groups, contours = detection
+
+    result_image = render_groups(image, groups, contours, max_size=550)
+
+    assert max(result_image.shape[:2]) == 550
+    assert label_mask(image.shape, groups, contours, 550).shape == result_image.shape[:2]
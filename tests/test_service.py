@@ -0,0 +1,62 @@
+import json
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import cv2
+import numpy as np
+import pytest
+
+from analyze_image.service import AnalysisHTTPServer, AnalysisService
+
+@pytest.fixture(scope='module')
+def server():
+    service = AnalysisService(workers=1, queue_size=1, timeout=30)
+    service.start()
+    server = AnalysisHTTPServer(('127.0.0.1', 0), service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/analyze"
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+@pytest.fixture(scope='module')
+def image_bytes():
+    image = np.full((200, 200), 230, dtype=np.uint8)
+    for x in range(20, 180, 40):
+        cv2.circle(image, (x, 60), 12, 30, -1)
+        cv2.rectangle(image, (x - 10, 120), (x + 10, 150), 30, -1)
+    return cv2.imencode('.png', image)[1].tobytes()
+
+def post(url, grouping, options, body):
+    query = urllib.parse.urlencode({'grouping': grouping, 'options': json.dumps(options)})
+    try:
+        with urllib.request.urlopen(urllib.request.Request(f"{url}?{query}", body)) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+@pytest.mark.parametrize("grouping, options", [
+    ('kseg', {'n_groups': 2}),
+    ('density', {'min_samples': 2}),
+    ('descriptor', {'neighbours': 4}),
+    ('running-mean', {}),
+])
+def test_accepts_the_method_options(server, image_bytes, grouping, options):
+    status, result = post(server, grouping, options, image_bytes)
+    assert status == 200
+    assert result['objects'] > 0
+
+@pytest.mark.parametrize("grouping, options", [
+    ('kseg', {'min_samples': 2}),
+    ('running-mean', {'n_groups': 2}),
+    ('density', {'bogus': 1}),
+    ('kseg', {'n_groups': 'two'}),
+    ('descriptor', {'neighbours': 0}),
+])
+def test_rejects_other_options_with_400(server, image_bytes, grouping, options):
+    status, result = post(server, grouping, options, image_bytes)
+    assert status == 400
+    assert 'error' in result
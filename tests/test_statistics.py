@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from analyze_image.statistics import sample_scale_ratios, scale_statistics
+
+def pairwise_scales(areas):
+    # The pairwise loop the closed form replaces
+    scales = []
+    for i in range(len(areas)):
+        for j in range(i + 1, len(areas)):
+            scales.append(np.sqrt(max(areas[i], areas[j]) / min(areas[i], areas[j])))
+    return scales
+
+def pairwise_statistics(areas):
+    scales = pairwise_scales(areas)
+    return {
+        'avg_scale': np.mean(scales) if scales else 1.0,
+        'min_scale': np.min(scales) if scales else 1.0,
+        'max_scale': np.max(scales) if scales else 1.0,
+    }
+
+def assert_statistics_equal(areas):
+    stats = scale_statistics(areas)
+    expected = pairwise_statistics(areas)
+
+    assert stats.keys() == expected.keys()
+    for name, value in expected.items():
+        assert stats[name] == pytest.approx(value, rel=1e-12)
+
+@pytest.mark.parametrize("seed", range(30))
+def test_scale_statistics_match_pairwise_loop(seed):
+    rng = np.random.default_rng(seed)
+    areas = rng.uniform(300, 20000, rng.integers(2, 200))
+    # Rounded areas repeat, so some pairs have a scale of exactly 1
+    if seed % 2:
+        areas = np.round(areas, -2)
+
+    assert_statistics_equal(areas)
+
+@pytest.mark.parametrize("areas", [[1500.0], [800.0, 800.0], [2500.0] * 50, [400.0, 400.0, 1600.0]])
+def test_scale_statistics_edge_cases(areas):
+    assert_statistics_equal(areas)
+
+def test_scale_sample_is_exact_for_few_pairs():
+    areas = np.random.default_rng(0).uniform(300, 20000, 40)
+
+    np.testing.assert_allclose(np.sort(sample_scale_ratios(areas, 1000)), np.sort(pairwise_scales(areas)))
@@ -0,0 +1,136 @@
+import argparse
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+import generate_image.generate_image as generator
+from analyze_image.features import SHAPE_DTYPE
+from analyze_image.shape_detector import ShapeDetector
+from analyze_image.stream import ShapeTracker, StreamAnalyzer, open_capture
+from commands.commands import stream_cmd
+
+FRAMES = 12
+SPEED = 4
+
+@pytest.fixture(scope="module")
+def video_path(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("video")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(generator, 'GENERATE_DIR', str(directory))
+        generator.generate_video(800, 600, 'video.avi', FRAMES, SPEED, 30, 4, 4, 4, seed=1)
+    return str(directory / 'video.avi')
+
+def read_frames(path):
+    capture = open_capture(path)
+    frames = []
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return frames
+            frames.append(frame)
+    finally:
+        capture.release()
+
+def centers(features):
+    return np.column_stack((features['x'] + features['w'] / 2, features['y'] + features['h'] / 2))
+
+def test_track_ids_follow_moving_shapes(video_path):
+    analyzer = StreamAnalyzer(video_path, tracker=ShapeTracker(1.0))
+    previous = None
+    followed = 0
+
+    for frame in read_frames(video_path):
+        features, track_ids, _, _ = analyzer.process_frame(frame)
+        current = centers(features)
+
+        if previous is not None:
+            # The camera pans right, so every shape moves SPEED pixels to the left
+            distances = np.linalg.norm(current[:, None, :] + (SPEED, 0) - previous[0][None, :, :], axis=2)
+            nearest = np.argmin(distances, axis=1)
+            same_shape = distances[np.arange(len(current)), nearest] <= 2
+            assert np.array_equal(track_ids[same_shape], previous[1][nearest[same_shape]])
+            followed += int(same_shape.sum())
+
+        previous = current, track_ids
+
+    assert followed >= (FRAMES - 1) * 5
+
+def test_group_counts_match_shape_detector(video_path, tmp_path):
+    # Without missed frames the active groups are exactly those of the current detections
+    analyzer = StreamAnalyzer(video_path, str(tmp_path / "stream"), ShapeTracker(1.0, max_missed=0))
+    assert analyzer.run() == FRAMES
+
+    with open(tmp_path / "stream" / "stream.jsonl", encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+
+    frame_path = str(tmp_path / "frame.png")
+    for record, frame in zip(records, read_frames(video_path), strict=True):
+        cv2.imwrite(frame_path, frame)
+        _, groups = ShapeDetector(frame_path, str(tmp_path / "frame"), ('table',)).process(1.0)
+
+        assert record['objects'] == sum(len(group) for group in groups)
+        assert len(record['groups']) == len(groups)
+
+def test_max_missed_drops_tracks(video_path):
+    tracker = ShapeTracker(1.0, max_missed=2)
+    analyzer = StreamAnalyzer(video_path, tracker=tracker)
+    features, track_ids, _, _ = analyzer.process_frame(read_frames(video_path)[0])
+    assert len(track_ids) > 0
+
+    for _ in range(2):
+        tracker.update(features[:0])
+        assert np.array_equal(np.sort(tracker.track_ids), np.sort(track_ids))
+
+    tracker.update(features[:0])
+    assert len(tracker.track_ids) == 0
+    assert len(tracker.active_groups()[0]) == 0
+
+    # Shapes seen again after their tracks expired start new ones
+    new_ids, _, new_tracks = tracker.update(features)
+    assert new_tracks == len(features)
+    assert not np.isin(new_ids, track_ids).any()
+
+def synthetic_features(rng, count):
+    features = np.zeros(count, dtype=SHAPE_DTYPE)
+    features['x'] = rng.uniform(0, 2000, count)
+    features['y'] = rng.uniform(0, 2000, count)
+    features['w'] = features['h'] = 20
+    features['ratio'] = rng.uniform(12, 40, count)
+    return features
+
+def test_group_state_stays_bounded_on_long_feed():
+    # Shapes come and go in bursts, so groups keep emptying while new ones start
+    rng = np.random.default_rng(3)
+    tracker = ShapeTracker(1.0, max_missed=2)
+    most_live = 0
+
+    for frame in range(3000):
+        features = synthetic_features(rng, int(rng.integers(0, 12)) if frame % 50 < 40 else 0)
+        before = tracker.groups
+        _, groups, _ = tracker.update(features)
+
+        # Tracks expire after the new shapes are grouped, so both count towards the peak
+        most_live = max(most_live, len(np.union1d(before, groups)))
+        live = np.unique(tracker.groups)
+        assert np.all(tracker.group_counts[groups] > 0)
+        assert np.array_equal(tracker.active_groups()[0], live)
+
+        counts = np.bincount(tracker.groups, minlength=len(tracker.group_counts))
+        sums = np.bincount(tracker.groups, tracker.ratios, minlength=len(tracker.group_counts))
+        np.testing.assert_array_equal(tracker.group_counts, counts)
+        np.testing.assert_allclose(tracker.group_sums[live], sums[live])
+
+    assert tracker.next_track > 10000
+    assert len(tracker.group_counts) == len(tracker.group_sums) <= most_live
+
+def test_unreadable_video_exits_with_message(tmp_path):
+    args = argparse.Namespace(
+        input=str(tmp_path / "missing.avi"), threshold=1.0, max_distance=40.0, ratio_tolerance=0.15,
+        max_missed=5, max_frames=None,
+    )
+
+    with pytest.raises(SystemExit, match="Cannot open video"):
+        stream_cmd(args)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from analyze_image.grouping import group_ratios
+from analyze_image.sweep import summarize_labels, sweep_thresholds
+
+def per_threshold_rows(ratios, thresholds, method, **options):
+    ratios = np.sort(np.asarray(ratios, dtype=np.float64), kind='stable')
+    rows = []
+    for threshold in thresholds:
+        row = {'threshold': threshold}
+        row.update(summarize_labels(ratios, group_ratios(ratios, threshold, method, **options)))
+        rows.append(row)
+    return rows
+
+def assert_rows_equal(rows, expected):
+    assert len(rows) == len(expected)
+    for row, reference in zip(rows, expected):
+        pooled_std = row.pop('pooled_std')
+        assert pooled_std == pytest.approx(reference.pop('pooled_std'), rel=1e-9, abs=1e-9)
+        assert row == reference
+
+@pytest.mark.parametrize("seed", range(30))
+def test_gap_sweep_matches_per_threshold_grouping(seed):
+    rng = np.random.default_rng(seed)
+    # Rounded ratios put gaps exactly on the thresholds
+    ratios = np.round(rng.uniform(12, 40, rng.integers(1, 500)), int(rng.integers(0, 3)))
+    thresholds = [float(t) for t in rng.choice([0.0, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 50.0], 6)]
+
+    assert_rows_equal(sweep_thresholds(ratios, thresholds, 'gap'), per_threshold_rows(ratios, thresholds, 'gap'))
+
+@pytest.mark.parametrize("options", [{}, {'n_groups': 4}])
+def test_kseg_sweep_matches_per_threshold_grouping(options):
+    ratios = np.random.default_rng(3).uniform(12, 40, 300)
+    thresholds = [0.25, 0.5, 0.75, 1.0, 2.0, 3.0]
+
+    assert_rows_equal(
+        sweep_thresholds(ratios, thresholds, 'kseg', **options),
+        per_threshold_rows(ratios, thresholds, 'kseg', **options),
+    )
@@ -0,0 +1,118 @@
+import cv2
+import numpy as np
+import pytest
+
+from analyze_image.shape_detector import detect_edges, find_external_contours
+from analyze_image.tiling import TILE_OVERLAP, TiledShapeDetector, _merge_regions, find_contours_tiled
+
+def synthetic_image(seed, width=1300, height=1100, count=60):
+    # Overlapping circles, rectangles and triangles, many of them across tile seams
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width), 230, dtype=np.uint8)
+
+    for _ in range(count):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        size = int(rng.integers(15, 80))
+        color = int(rng.integers(0, 120))
+        kind = rng.integers(0, 3)
+
+        if kind == 0:
+            cv2.circle(image, (x, y), size, color, -1)
+        elif kind == 1:
+            cv2.rectangle(image, (x, y), (x + size, y + int(size * 0.6)), color, -1)
+        else:
+            points = np.array([[x, y], [x + size, y + size // 3], [x + size // 2, y + size]], np.int32)
+            cv2.fillPoly(image, [points], color)
+
+    return image
+
+def contour_keys(contours, areas):
+    return sorted((cv2.boundingRect(contour), float(area)) for contour, area in zip(contours, areas))
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("tile_size", [256, 300, 512])
+def test_tiled_contours_match_full_image(seed, tile_size):
+    image = synthetic_image(seed)
+
+    full = contour_keys(*find_external_contours(detect_edges(image)))
+    tiled = contour_keys(*find_contours_tiled(image, tile_size))
+
+    assert len(full) > 0
+    assert tiled == full
+
+def test_tiled_contours_of_color_memory_map(tmp_path):
+    # Color .npy sources are converted one window at a time
+    image = synthetic_image(0)
+    path = tmp_path / "image.npy"
+    np.save(path, cv2.cvtColor(image, cv2.COLOR_GRAY2BGR))
+
+    tiled = contour_keys(*find_contours_tiled(np.load(path, mmap_mode='r'), 512))
+
+    assert tiled == contour_keys(*find_external_contours(detect_edges(image)))
+
+def merge_pairwise(boxes):
+    # Compares every pair of regions until none touch
+    regions = [tuple(box) for box in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                if a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]:
+                    regions[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return sorted(regions, key=lambda b: (b[1], b[0]))
+
+@pytest.mark.parametrize("seed", range(5))
+def test_merge_regions_of_many_overlapping_seam_boxes(seed):
+    # Contours cut by the seams of 64 pixel tiles: thin boxes straddling every seam line
+    rng = np.random.default_rng(seed)
+    boxes = []
+    for _ in range(600):
+        seam = int(rng.integers(1, 20)) * 64
+        along = int(rng.integers(0, 1300))
+        across, length = int(rng.integers(1, 30)), int(rng.integers(5, 120))
+        box = (seam - across, along, seam + across, along + length)
+        boxes.append(box if rng.random() < 0.5 else (box[1], box[0], box[3], box[2]))
+
+    merged = _merge_regions(boxes)
+
+    assert len(merged) < len(boxes)
+    assert merged == merge_pairwise(boxes)
+
+def test_merge_regions_of_spiral():
+    # Every bar touches only the bounding box of the bars before it, so each repeated
+    # sweep joins one more of them
+    boxes = [(0, 0, 10, 1), (9, 0, 10, 10)]
+    for step in range(60):
+        x0, y0 = min(b[0] for b in boxes), min(b[1] for b in boxes)
+        x1, y1 = max(b[2] for b in boxes), max(b[3] for b in boxes)
+        length = step + 5
+        boxes.append([
+            (x0, y1, x0 + 1, y1 + length),
+            (x1, y1 - 1, x1 + length, y1),
+            (x1 - 1, y0 - length, x1, y0),
+            (x0 - length, y0, x0, y0 + 1),
+        ][step % 4])
+
+    merged = _merge_regions(boxes)
+
+    assert len(merged) == 1
+    assert merged == merge_pairwise(boxes)
+
+def test_tiled_contours_with_small_tiles():
+    # Tiles barely larger than their overlap put most objects on a seam
+    image = synthetic_image(4, width=700, height=600, count=80)
+
+    tiled = contour_keys(*find_contours_tiled(image, 48))
+
+    assert tiled == contour_keys(*find_external_contours(detect_edges(image)))
+
+def test_tile_size_below_overlap_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="at least"):
+        TiledShapeDetector(str(tmp_path / "image.npy"), str(tmp_path), tile_size=TILE_OVERLAP - 1)